@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
 
 class User(AbstractUser):
     """Custom User model with role-based access"""
@@ -27,4 +28,9 @@ class User(AbstractUser):
     
     class Meta:
         verbose_name = "User"
-        verbose_name_plural = "Users"
\ No newline at end of file
+        verbose_name_plural = "Users"
+        indexes = [
+            # Trigram indexes used by duplicate detection on parcel owners
+            GinIndex(fields=['first_name'], name='user_first_name_trgm', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['last_name'], name='user_last_name_trgm', opclasses=['gin_trgm_ops']),
+        ]
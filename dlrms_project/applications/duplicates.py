@@ -0,0 +1,187 @@
+# applications/duplicates.py
+"""
+Duplicate and conflicting application detection.
+
+Candidates are selected with trigram similarity on the property address and
+the owner names (served by the pg_trgm GIN indexes on ParcelApplication,
+LandParcel and User) and, when coordinates are known, a bounding-box check on
+the indexed latitude/longitude columns. Only the small candidate set that
+survives those indexed filters is scored and ranked in Python.
+"""
+import math
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.functions import Concat, Greatest
+
+from land_management.models import LandParcel
+from .models import ParcelApplication
+
+# Applications in these states can no longer conflict with a new submission
+CLOSED_STATUSES = ['rejected']
+
+# Roughly 111 km per degree of latitude
+METERS_PER_DEGREE = 111320.0
+
+
+def _as_float(value):
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _distance_meters(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in meters"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = math.radians(lat2 - lat1)
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * 6371000.0 * math.asin(math.sqrt(a))
+
+
+def _bounding_box_q(lat, lng, radius_m):
+    """Q object selecting rows whose coordinates fall in a box around a point"""
+    d_lat = radius_m / METERS_PER_DEGREE
+    d_lng = radius_m / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    return Q(
+        latitude__gte=Decimal(str(round(lat - d_lat, 7))),
+        latitude__lte=Decimal(str(round(lat + d_lat, 7))),
+        longitude__gte=Decimal(str(round(lng - d_lng, 7))),
+        longitude__lte=Decimal(str(round(lng + d_lng, 7))),
+    )
+
+
+def _ranked_rows(queryset, address_field, first_name_field, last_name_field,
+                 address, first_name, last_name, lat, lng, radius_m, limit):
+    """
+    Filter a queryset down to rows that share an address, an owner name or a
+    location with the submission, and order them by their strongest signal.
+    """
+    match = Q(**{f'{address_field}__trigram_similar': address}) if address else Q(pk__in=[])
+    if first_name and last_name:
+        match |= Q(**{
+            f'{first_name_field}__trigram_similar': first_name,
+            f'{last_name_field}__trigram_similar': last_name,
+        })
+
+    nearby = Value(0.0)
+    if lat is not None and lng is not None:
+        in_box = _bounding_box_q(lat, lng, radius_m)
+        match |= in_box
+        nearby = Case(When(in_box, then=Value(1.0)), default=Value(0.0), output_field=FloatField())
+
+    owner_name = f'{first_name} {last_name}'.strip()
+    return queryset.filter(match).annotate(
+        owner_full_name=Concat(first_name_field, Value(' '), last_name_field),
+    ).annotate(
+        address_similarity=TrigramSimilarity(address_field, address),
+        name_similarity=TrigramSimilarity('owner_full_name', owner_name),
+        nearby=nearby,
+    ).annotate(
+        best_signal=Greatest('address_similarity', 'name_similarity', 'nearby'),
+    ).order_by('-best_signal')[:limit]
+
+
+def _build_candidate(kind, pk, reference, owner_name, address, status, row_lat, row_lng,
+                     address_similarity, name_similarity, lat, lng, threshold, radius_m):
+    distance_m = None
+    if None not in (lat, lng, row_lat, row_lng):
+        distance_m = _distance_meters(lat, lng, float(row_lat), float(row_lng))
+
+    address_similarity = round(address_similarity or 0.0, 4)
+    name_similarity = round(name_similarity or 0.0, 4)
+    proximity = 0.0
+    if distance_m is not None and distance_m <= radius_m:
+        proximity = 1.0 - (distance_m / radius_m)
+
+    reasons = []
+    if address_similarity >= threshold:
+        reasons.append('address')
+    if name_similarity >= threshold:
+        reasons.append('owner')
+    if distance_m is not None and distance_m <= radius_m:
+        reasons.append('location')
+
+    return {
+        'kind': kind,
+        'id': pk,
+        'reference': reference,
+        'owner_name': owner_name,
+        'address': address,
+        'status': status,
+        'address_similarity': address_similarity,
+        'name_similarity': name_similarity,
+        'distance_m': round(distance_m, 1) if distance_m is not None else None,
+        'reasons': reasons,
+        'score': round(0.5 * address_similarity + 0.3 * name_similarity + 0.2 * proximity, 4),
+    }
+
+
+def find_duplicate_candidates(property_address, owner_first_name='', owner_last_name='',
+                              latitude=None, longitude=None, exclude_pk=None,
+                              include_parcels=True, limit=None):
+    """
+    Return ranked candidate duplicates for the given application data.
+
+    Both open applications and registered parcels are searched. Each candidate
+    is a dict describing the matched record, the similarity signals, the
+    distance in meters (when both sides have coordinates), the reasons that
+    matched and a combined 0..1 score. Candidates are sorted best first.
+    """
+    threshold = getattr(settings, 'DUPLICATE_SIMILARITY_THRESHOLD', 0.3)
+    radius_m = getattr(settings, 'DUPLICATE_PROXIMITY_METERS', 50)
+    if limit is None:
+        limit = getattr(settings, 'DUPLICATE_MAX_CANDIDATES', 10)
+
+    address = (property_address or '').strip()
+    first_name = (owner_first_name or '').strip()
+    last_name = (owner_last_name or '').strip()
+    lat = _as_float(latitude)
+    lng = _as_float(longitude)
+
+    if not address and not (first_name and last_name) and (lat is None or lng is None):
+        return []
+
+    candidates = []
+
+    applications = ParcelApplication.objects.exclude(status__in=CLOSED_STATUSES)
+    if exclude_pk:
+        applications = applications.exclude(pk=exclude_pk)
+    for app in _ranked_rows(applications, 'property_address', 'owner_first_name', 'owner_last_name',
+                            address, first_name, last_name, lat, lng, radius_m, limit):
+        candidates.append(_build_candidate(
+            'application', app.id, app.application_number, app.owner_full_name,
+            app.property_address, app.status, app.latitude, app.longitude,
+            app.address_similarity, app.name_similarity, lat, lng, threshold, radius_m,
+        ))
+
+    if include_parcels:
+        for parcel in _ranked_rows(LandParcel.objects.all(), 'location', 'owner__first_name', 'owner__last_name',
+                                   address, first_name, last_name, lat, lng, radius_m, limit):
+            candidates.append(_build_candidate(
+                'parcel', parcel.id, parcel.parcel_id, parcel.owner_full_name,
+                parcel.location, parcel.status, parcel.latitude, parcel.longitude,
+                parcel.address_similarity, parcel.name_similarity, lat, lng, threshold, radius_m,
+            ))
+
+    candidates = [candidate for candidate in candidates if candidate['reasons']]
+    candidates.sort(key=lambda candidate: candidate['score'], reverse=True)
+    return candidates[:limit]
+
+
+def find_duplicates_for_application(application, **kwargs):
+    """Run the detector for a saved ParcelApplication, excluding itself"""
+    return find_duplicate_candidates(
+        property_address=application.property_address,
+        owner_first_name=application.owner_first_name,
+        owner_last_name=application.owner_last_name,
+        latitude=application.latitude,
+        longitude=application.longitude,
+        exclude_pk=application.pk,
+        **kwargs
+    )
@@ -0,0 +1,354 @@
+# applications/intake.py
+"""
+Bulk intake of parcel applications for notaries and partner offices.
+
+A batch is a manifest (CSV or JSON, one row per application) plus an optional
+zip archive holding the documents referenced by each row. Every row is
+validated before anything is written; a batch either imports completely or not
+at all. Application numbers are allocated per prefix in one step, applications
+and documents are written with bulk_create, and each officer receives a single
+notification summarising the batch.
+"""
+import csv
+import hashlib
+import io
+import json
+import os
+import zipfile
+from collections import Counter
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.core.files.base import File
+from django.db import connection, transaction
+from django.db.models import Q
+
+from accounts.models import User
+from core.hashing import sha256_file
+from notifications.broadcasts import notify_roles
+from .models import ParcelApplication, ParcelDocument
+
+PROPERTY_TYPES = ['residential', 'commercial', 'agricultural', 'industrial', 'mixed']
+APPLICATION_TYPES = [choice[0] for choice in ParcelApplication.APPLICATION_TYPE_CHOICES]
+
+# Manifest column -> ParcelDocument.document_type
+DOCUMENT_COLUMNS = ['owner_id', 'sale_deed', 'previous_contract']
+REQUIRED_DOCUMENTS = ['owner_id', 'sale_deed']
+REQUIRED_FIELDS = ['owner_first_name', 'owner_last_name', 'property_address', 'property_type', 'application_type']
+
+MAX_BATCH_SIZE = 500
+
+
+class IntakeError(Exception):
+    """Raised when a batch cannot be imported; carries the per-row errors"""
+
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors or []
+
+
+def parse_manifest(content, filename=''):
+    """
+    Parse a CSV or JSON manifest into a list of row dicts.
+
+    JSON manifests may be a list of objects or an object with an
+    "applications" list. Anything else is read as CSV with a header row.
+    """
+    if isinstance(content, bytes):
+        try:
+            content = content.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise IntakeError('Manifest must be UTF-8 encoded')
+
+    if filename.lower().endswith('.json') or content.lstrip().startswith(('[', '{')):
+        try:
+            data = json.loads(content)
+        except json.JSONDecodeError as e:
+            raise IntakeError(f'Invalid JSON manifest: {e}')
+        if isinstance(data, dict):
+            data = data.get('applications', [])
+        if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+            raise IntakeError('JSON manifest must be a list of application objects')
+        rows = data
+    else:
+        rows = list(csv.DictReader(io.StringIO(content)))
+
+    return [
+        {str(key).strip(): (value.strip() if isinstance(value, str) else value) for key, value in row.items() if key}
+        for row in rows
+    ]
+
+
+def _parse_coordinate(value, lower, upper):
+    if value in (None, ''):
+        return None
+    try:
+        number = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError('must be a number')
+    if not lower <= number <= upper:
+        raise ValueError(f'must be between {lower} and {upper}')
+    return number.quantize(Decimal('0.0000001'))
+
+
+def _resolve_applicants(rows):
+    """Map every applicant reference in the manifest to a user with one query"""
+    references = {str(row.get('applicant')) for row in rows if row.get('applicant')}
+    if not references:
+        return {}
+
+    applicants = {}
+    for user in User.objects.filter(
+        Q(username__in=references) | Q(national_id__in=references) | Q(email__in=references),
+        is_active=True
+    ):
+        for key in (user.username, user.national_id, user.email):
+            if key in references:
+                applicants[key] = user
+    return applicants
+
+
+def validate_manifest(rows, archive=None):
+    """
+    Validate every manifest row and return (cleaned_rows, errors).
+
+    Errors are (row_number, message) tuples with 1-based row numbers. Cleaned
+    rows hold the model values, the resolved applicant (or None for the
+    submitting user) and the archive member name for each document.
+    """
+    errors = []
+    if not rows:
+        return [], [(0, 'Manifest contains no applications')]
+    if len(rows) > MAX_BATCH_SIZE:
+        return [], [(0, f'Manifest contains {len(rows)} applications; the limit is {MAX_BATCH_SIZE} per batch')]
+
+    archive_members = set(archive.namelist()) if archive else set()
+    applicants = _resolve_applicants(rows)
+    cleaned_rows = []
+
+    for row_number, row in enumerate(rows, start=1):
+        row_errors = []
+
+        for field in REQUIRED_FIELDS:
+            if not row.get(field):
+                row_errors.append(f'{field} is required')
+
+        property_type = (row.get('property_type') or '').lower()
+        if property_type and property_type not in PROPERTY_TYPES:
+            row_errors.append(f'property_type must be one of {", ".join(PROPERTY_TYPES)}')
+
+        application_type = (row.get('application_type') or '').lower()
+        if application_type and application_type not in APPLICATION_TYPES:
+            row_errors.append(f'application_type must be one of {", ".join(APPLICATION_TYPES)}')
+
+        for field, limit in (('owner_first_name', 100), ('owner_last_name', 100), ('property_address', 255)):
+            if len(str(row.get(field) or '')) > limit:
+                row_errors.append(f'{field} must be at most {limit} characters')
+
+        coordinates = {}
+        for field, lower, upper in (('latitude', -90, 90), ('longitude', -180, 180)):
+            try:
+                coordinates[field] = _parse_coordinate(row.get(field), lower, upper)
+            except ValueError as e:
+                row_errors.append(f'{field} {e}')
+
+        applicant = None
+        if row.get('applicant'):
+            applicant = applicants.get(str(row['applicant']))
+            if applicant is None:
+                row_errors.append(f'Unknown applicant "{row["applicant"]}"')
+
+        documents = {}
+        for document_type in DOCUMENT_COLUMNS:
+            member = row.get(document_type)
+            if not member:
+                if document_type in REQUIRED_DOCUMENTS:
+                    row_errors.append(f'{document_type} document is required')
+                continue
+            if member not in archive_members:
+                row_errors.append(f'{document_type} file "{member}" not found in archive')
+                continue
+            documents[document_type] = member
+
+        for message in row_errors:
+            errors.append((row_number, message))
+
+        if not row_errors:
+            cleaned_rows.append({
+                'owner_first_name': row['owner_first_name'],
+                'owner_last_name': row['owner_last_name'],
+                'property_address': row['property_address'],
+                'property_type': property_type,
+                'application_type': application_type,
+                'latitude': coordinates['latitude'],
+                'longitude': coordinates['longitude'],
+                'applicant': applicant,
+                'documents': documents,
+            })
+
+    return cleaned_rows, errors
+
+
+def _prefix_for(application_type):
+    return "PC" if application_type == "property_contract" else "PCA"
+
+
+def _lock_number_sequence(prefix, year):
+    """
+    Serialise number allocation for a prefix and year until the transaction ends.
+
+    A PostgreSQL advisory lock is used rather than locking the latest row:
+    the first batch of a year has no row to lock.
+    """
+    if connection.vendor != 'postgresql':
+        # Development databases (SQLite) have no advisory locks
+        return
+    digest = hashlib.sha256(f'application-number:{prefix}-{year}'.encode()).digest()
+    key = int.from_bytes(digest[:8], 'big', signed=True)
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', [key])
+
+
+def allocate_application_numbers(prefix, count):
+    """
+    Reserve `count` sequential application numbers for a prefix.
+
+    Numbers are PREFIX-YEAR-NNNNNN. Batch imports and ParcelApplication.save()
+    both allocate here, serialising on a lock per prefix and year that is
+    held until the transaction commits; must be called inside a transaction.
+    """
+    year = datetime.now().year
+    _lock_number_sequence(prefix, year)
+    last_application = ParcelApplication.objects.filter(
+        application_number__startswith=f"{prefix}-{year}"
+    ).order_by('-id').first()
+
+    last_seq = 0
+    if last_application:
+        try:
+            last_seq = int(last_application.application_number.split('-')[-1])
+        except (ValueError, IndexError):
+            last_seq = 0
+
+    return [f"{prefix}-{year}-{seq:06d}" for seq in range(last_seq + 1, last_seq + count + 1)]
+
+
+def _store_documents(applications, cleaned_rows, archive):
+    """Write archive members to storage and build unsaved ParcelDocument rows"""
+    file_field = ParcelDocument._meta.get_field('file')
+    documents = []
+    stored_names = []
+
+    try:
+        for application, row in zip(applications, cleaned_rows):
+            for document_type, member in row['documents'].items():
+                filename = f"{application.application_number}_{document_type}_{os.path.basename(member)}"
+                name = file_field.generate_filename(None, filename)
+                # Streamed in chunks (hashed, then stored) rather than read into memory
+                with archive.open(member) as source:
+                    content_hash, _ = sha256_file(source)
+                    stored_name = file_field.storage.save(name, File(source))
+                stored_names.append(stored_name)
+                documents.append(ParcelDocument(
+                    application=application,
+                    document_type=document_type,
+                    file=stored_name,
+                    content_hash=content_hash
+                ))
+    except Exception:
+        _delete_stored_files(stored_names)
+        raise
+
+    return documents, stored_names
+
+
+def _delete_stored_files(names):
+    storage = ParcelDocument._meta.get_field('file').storage
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception:
+            pass
+
+
+def _notify_officers(applications, submitted_by):
+    """Send one aggregated notification to the registry officers for the batch"""
+    numbers = [application.application_number for application in applications]
+    listed = ', '.join(numbers[:10])
+    if len(numbers) > 10:
+        listed += f' and {len(numbers) - 10} more'
+
+    notify_roles(
+        ['registry_officer', 'admin'],
+        title='Batch of Applications Submitted',
+        message=f'{len(numbers)} parcel applications submitted by {submitted_by.get_full_name() or submitted_by.username}: {listed}',
+        notification_type='application_status',
+        sender=submitted_by
+    )
+
+
+def import_applications(rows, submitted_by, archive=None, dry_run=False):
+    """
+    Validate and import a batch of applications.
+
+    `rows` is the parsed manifest, `archive` an open zipfile.ZipFile (or None
+    when no row references documents). Rows without an applicant are filed
+    under `submitted_by`. Raises IntakeError with the collected row errors if
+    any row is invalid; otherwise returns a summary dict.
+    """
+    cleaned_rows, errors = validate_manifest(rows, archive)
+    if errors:
+        raise IntakeError(f'{len(errors)} validation errors in manifest', errors)
+
+    if dry_run:
+        return {'created': 0, 'validated': len(cleaned_rows), 'application_numbers': [], 'documents': 0}
+
+    stored_names = []
+    try:
+        with transaction.atomic():
+            prefix_counts = Counter(_prefix_for(row['application_type']) for row in cleaned_rows)
+            numbers_by_prefix = {
+                prefix: iter(allocate_application_numbers(prefix, count))
+                for prefix, count in sorted(prefix_counts.items())
+            }
+
+            applications = []
+            for row in cleaned_rows:
+                applications.append(ParcelApplication(
+                    application_number=next(numbers_by_prefix[_prefix_for(row['application_type'])]),
+                    applicant=row['applicant'] or submitted_by,
+                    owner_first_name=row['owner_first_name'],
+                    owner_last_name=row['owner_last_name'],
+                    property_address=row['property_address'],
+                    property_type=row['property_type'],
+                    application_type=row['application_type'],
+                    latitude=row['latitude'],
+                    longitude=row['longitude'],
+                ))
+
+            applications = ParcelApplication.objects.bulk_create(applications)
+
+            documents = []
+            if archive is not None:
+                documents, stored_names = _store_documents(applications, cleaned_rows, archive)
+                ParcelDocument.objects.bulk_create(documents)
+
+            _notify_officers(applications, submitted_by)
+    except Exception:
+        _delete_stored_files(stored_names)
+        raise
+
+    return {
+        'created': len(applications),
+        'validated': len(cleaned_rows),
+        'application_numbers': [application.application_number for application in applications],
+        'documents': len(documents),
+    }
+
+
+def open_archive(fileobj):
+    """Open an uploaded or on-disk zip archive, raising IntakeError if invalid"""
+    try:
+        return zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile:
+        raise IntakeError('Document archive must be a valid zip file')
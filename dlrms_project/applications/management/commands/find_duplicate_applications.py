@@ -0,0 +1,94 @@
+import csv
+
+from django.core.management.base import BaseCommand
+
+from applications.duplicates import CLOSED_STATUSES, find_duplicates_for_application
+from applications.models import ParcelApplication
+
+
+class Command(BaseCommand):
+    help = 'Scan open parcel applications for likely duplicates of each other or of registered parcels'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--status',
+            action='append',
+            help='Only scan applications with this status (can be repeated)',
+        )
+        parser.add_argument(
+            '--min-score',
+            type=float,
+            default=0.5,
+            help='Minimum combined score for a pair to be reported (default: 0.5)',
+        )
+        parser.add_argument(
+            '--no-parcels',
+            action='store_true',
+            help='Only compare applications with each other, not with registered parcels',
+        )
+        parser.add_argument(
+            '--output',
+            help='Write the duplicate pairs to this CSV file',
+        )
+    
+    def handle(self, *args, **options):
+        applications = ParcelApplication.objects.exclude(status__in=CLOSED_STATUSES)
+        if options['status']:
+            applications = applications.filter(status__in=options['status'])
+        
+        applications = applications.only(
+            'id', 'application_number', 'property_address', 'owner_first_name',
+            'owner_last_name', 'latitude', 'longitude'
+        ).order_by('id')
+        
+        self.stdout.write(f'Scanning {applications.count()} applications for duplicates...')
+        
+        seen_pairs = set()
+        rows = []
+        for application in applications.iterator(chunk_size=500):
+            candidates = find_duplicates_for_application(
+                application,
+                include_parcels=not options['no_parcels']
+            )
+            for candidate in candidates:
+                if candidate['score'] < options['min_score']:
+                    continue
+                
+                # Application pairs are found from both sides, report them once
+                if candidate['kind'] == 'application':
+                    pair = ('application', min(application.id, candidate['id']), max(application.id, candidate['id']))
+                else:
+                    pair = ('parcel', application.id, candidate['id'])
+                if pair in seen_pairs:
+                    continue
+                seen_pairs.add(pair)
+                
+                rows.append([
+                    application.application_number,
+                    candidate['kind'],
+                    candidate['reference'],
+                    candidate['score'],
+                    candidate['address_similarity'],
+                    candidate['name_similarity'],
+                    candidate['distance_m'] if candidate['distance_m'] is not None else '',
+                    ' '.join(candidate['reasons']),
+                ])
+        
+        rows.sort(key=lambda row: row[3], reverse=True)
+        
+        if options['output']:
+            with open(options['output'], 'w', newline='') as csv_file:
+                writer = csv.writer(csv_file)
+                writer.writerow([
+                    'Application Number', 'Match Type', 'Match Reference', 'Score',
+                    'Address Similarity', 'Name Similarity', 'Distance (m)', 'Reasons'
+                ])
+                writer.writerows(rows)
+            self.stdout.write(f'Wrote {len(rows)} pairs to {options["output"]}')
+        else:
+            for row in rows:
+                self.stdout.write(f'{row[0]} <-> {row[1]} {row[2]} (score {row[3]}, {row[7]})')
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Found {len(rows)} possible duplicate pairs')
+        )
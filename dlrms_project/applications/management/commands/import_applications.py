@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+
+from applications.intake import IntakeError, import_applications, open_archive, parse_manifest
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Import a batch of parcel applications from a CSV/JSON manifest and a zip of documents'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('manifest', help='Path to the CSV or JSON manifest')
+        parser.add_argument(
+            '--archive',
+            help='Path to the zip archive holding the documents referenced by the manifest',
+        )
+        parser.add_argument(
+            '--submitted-by',
+            required=True,
+            help='Username of the notary or officer submitting the batch',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate the manifest without importing anything',
+        )
+    
+    def handle(self, *args, **options):
+        try:
+            submitted_by = User.objects.get(username=options['submitted_by'])
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["submitted_by"]}" does not exist')
+        
+        with open(options['manifest'], 'rb') as manifest_file:
+            content = manifest_file.read()
+        
+        try:
+            rows = parse_manifest(content, options['manifest'])
+            archive = open_archive(options['archive']) if options['archive'] else None
+            result = import_applications(rows, submitted_by, archive=archive, dry_run=options['dry_run'])
+        except IntakeError as e:
+            for row, message in e.errors:
+                self.stderr.write(f'Row {row}: {message}')
+            raise CommandError(str(e))
+        
+        if options['dry_run']:
+            self.stdout.write(
+                self.style.SUCCESS(f'{result["validated"]} applications validated, nothing was imported')
+            )
+            return
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Imported {result["created"]} applications with {result["documents"]} documents'
+            )
+        )
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:12
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0008_parcelapplication_latitude_and_more'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='parcelapplication',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['property_address'], name='parcelapp_address_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='parcelapplication',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['owner_first_name'], name='parcelapp_first_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='parcelapplication',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['owner_last_name'], name='parcelapp_last_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='parcelapplication',
+            index=models.Index(fields=['latitude', 'longitude'], name='parcelapp_lat_lng_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('applications', '0009_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='parcelapplication',
+            name='claim_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='parcelapplication',
+            name='claimed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='claimed_applications', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='parcelapplication',
+            name='priority',
+            field=models.CharField(choices=[('low', 'Low'), ('normal', 'Normal'), ('high', 'High'), ('urgent', 'Urgent')], default='normal', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='parcelapplication',
+            index=models.Index(fields=['status', 'priority', 'submitted_at'], name='parcelapp_queue_idx'),
+        ),
+    ]
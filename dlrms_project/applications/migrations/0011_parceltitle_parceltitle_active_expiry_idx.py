@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0010_parcelapplication_work_queue'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='parceltitle',
+            index=models.Index(fields=['is_active', 'expiry_date'], name='parceltitle_active_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0011_parceltitle_parceltitle_active_expiry_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='parceldocument',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 of the file', max_length=64),
+        ),
+    ]
@@ -1,7 +1,10 @@
 # File: applications/models.py (Updated with fixes)
-from django.db import models
+from django.db import models, transaction
+from django.contrib.postgres.indexes import GinIndex
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from land_management.models import LandParcel
+from core.hashing import sha256_fieldfile
 import uuid
 from datetime import datetime
 
@@ -75,6 +78,13 @@ class ParcelApplication(models.Model):
         ('parcel_certificate', 'Parcel Certificate'),
     ]
     
+    PRIORITY_CHOICES = [
+        ('low', 'Low'),
+        ('normal', 'Normal'),
+        ('high', 'High'),
+        ('urgent', 'Urgent'),
+    ]
+    
     # Basic Information
     application_number = models.CharField(max_length=50, unique=True, blank=True)
     applicant = models.ForeignKey(User, on_delete=models.CASCADE, related_name='parcel_applications')
@@ -99,6 +109,11 @@ class ParcelApplication(models.Model):
     # Status and Processing
     status = models.CharField(max_length=20, choices=APPLICATION_STATUS_CHOICES, default='submitted')
     field_agent = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='assigned_applications')
+    priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES, default='normal')
+    
+    # Work queue claim (see applications/workqueue.py)
+    claimed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='claimed_applications')
+    claim_expires_at = models.DateTimeField(blank=True, null=True)
     
     # Review Information
     reviewed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='reviewed_parcel_applications')
@@ -114,33 +129,37 @@ class ParcelApplication(models.Model):
     
     def save(self, *args, **kwargs):
         if not self.application_number:
-            # Generate a unique application number
-            prefix = "PC" if self.application_type == "property_contract" else "PCA"
-            year = datetime.now().year
-            
-            # Find the last application for this year and type
-            last_application = ParcelApplication.objects.filter(
-                application_number__startswith=f"{prefix}-{year}"
-            ).order_by('-id').first()
-            
-            if last_application:
-                # Extract the sequential number from the last application
-                try:
-                    last_seq = int(last_application.application_number.split('-')[-1])
-                    new_seq = last_seq + 1
-                except (ValueError, IndexError):
-                    new_seq = 1
-            else:
-                new_seq = 1
-            
-            self.application_number = f"{prefix}-{year}-{new_seq:06d}"
+            from .intake import _prefix_for, allocate_application_numbers
+
+            # Allocated under the same lock as batch imports, held until the row is inserted
+            with transaction.atomic():
+                self.application_number = allocate_application_numbers(_prefix_for(self.application_type), 1)[0]
+                super().save(*args, **kwargs)
+            return
         
         super().save(*args, **kwargs)
     
+    def is_claimed_by_other(self, user):
+        """True if another officer holds an unexpired claim on this application"""
+        return (
+            self.claimed_by_id is not None
+            and self.claimed_by_id != user.id
+            and self.claim_expires_at is not None
+            and self.claim_expires_at > timezone.now()
+        )
+    
     class Meta:
         verbose_name = "Parcel Application"
         verbose_name_plural = "Parcel Applications"
         ordering = ['-submitted_at']
+        indexes = [
+            # Trigram indexes used by duplicate detection (applications/duplicates.py)
+            GinIndex(fields=['property_address'], name='parcelapp_address_trgm', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['owner_first_name'], name='parcelapp_first_name_trgm', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['owner_last_name'], name='parcelapp_last_name_trgm', opclasses=['gin_trgm_ops']),
+            models.Index(fields=['latitude', 'longitude'], name='parcelapp_lat_lng_idx'),
+            models.Index(fields=['status', 'priority', 'submitted_at'], name='parcelapp_queue_idx'),
+        ]
 
 
 class ParcelDocument(models.Model):
@@ -155,11 +174,25 @@ class ParcelDocument(models.Model):
     application = models.ForeignKey(ParcelApplication, on_delete=models.CASCADE, related_name='documents')
     document_type = models.CharField(max_length=30, choices=DOCUMENT_TYPE_CHOICES)
     file = models.FileField(upload_to='parcel_applications/documents/')
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True, help_text="SHA-256 of the file")
     uploaded_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
         return f"{self.get_document_type_display()} for {self.application.application_number}"
     
+    def save(self, *args, **kwargs):
+        # Hash a new upload once, in chunks, as it is stored
+        if self.file and not self.file._committed:
+            self.content_hash, _ = sha256_fieldfile(self.file)
+        super().save(*args, **kwargs)
+    
+    def get_content_hash(self):
+        """SHA-256 of the file, computed and recorded on first use for files stored without one"""
+        if not self.content_hash and self.file:
+            self.content_hash, _ = sha256_fieldfile(self.file)
+            type(self).objects.filter(pk=self.pk).update(content_hash=self.content_hash)
+        return self.content_hash
+    
     class Meta:
         verbose_name = "Parcel Document"
         verbose_name_plural = "Parcel Documents"
@@ -216,4 +249,7 @@ class ParcelTitle(models.Model):
     
     class Meta:
         verbose_name = "Parcel Title"
-        verbose_name_plural = "Parcel Titles"
\ No newline at end of file
+        verbose_name_plural = "Parcel Titles"
+        indexes = [
+            models.Index(fields=['is_active', 'expiry_date'], name='parceltitle_active_expiry_idx'),
+        ]
\ No newline at end of file
@@ -5,7 +5,8 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST, require_http_methods
 from django.contrib import messages
-from django.db.models import Q, Count, Avg
+from django.db.models import Q, Count, Avg, Case, When, Value, TextField
+from django.db.models.functions import Concat
 from django.utils import timezone
 from django.core.paginator import Paginator
 from django.db import transaction
@@ -18,9 +19,13 @@ from notifications.models import Notification
 
 from .models import ParcelApplication, ParcelDocument, ParcelTitle
 from .forms import ParcelApplicationForm, ApplicationAssignmentForm, ApplicationReviewForm
+from .duplicates import find_duplicates_for_application
+from .workqueue import QUEUE_STATUSES, claim_next, lock_application, queue_statuses, release_claim, renew_claim
 from land_management.models import LandParcel
 from accounts.models import User
 from core.mixins import RoleRequiredMixin
+from core.models import AuditLog
+from core.utils import parse_flag
 
 
 class ApplicationsReviewDashboardView(RoleRequiredMixin, LoginRequiredMixin, TemplateView):
@@ -100,7 +105,7 @@ def applications_api_list(request):
     
     # Base queryset
     applications = ParcelApplication.objects.select_related(
-        'applicant', 'field_agent', 'reviewed_by'
+        'applicant', 'field_agent', 'reviewed_by', 'claimed_by'
     ).prefetch_related('documents')
     
     # Single application lookup
@@ -172,6 +177,9 @@ def applications_api_list(request):
             priority = 'high'
         elif app.application_type == 'parcel_certificate':
             priority = 'medium'
+        # An explicit priority set by an officer overrides a lower computed one
+        if app.priority in ['high', 'urgent'] and priority != 'urgent':
+            priority = app.priority
         
         # Get document count
         doc_count = app.documents.count()
@@ -193,6 +201,7 @@ def applications_api_list(request):
             'field_agent': app.field_agent.get_full_name() if app.field_agent else None,
             'reviewed_by': app.reviewed_by.get_full_name() if app.reviewed_by else None,
             'document_count': doc_count,
+            'claimed_by': app.claimed_by.get_full_name() if app.is_claimed_by_other(request.user) else None,
         })
     
     return JsonResponse({
@@ -223,6 +232,7 @@ def assign_field_agent_bulk(request):
         priority = data.get('priority', 'normal')
         deadline = data.get('deadline')
         notes = data.get('notes', '')
+        dry_run = parse_flag(data.get('dry_run', False))
         
         if not application_ids or not agent_id:
             return JsonResponse({'error': 'Missing required fields'}, status=400)
@@ -230,53 +240,76 @@ def assign_field_agent_bulk(request):
         # Get the field agent
         field_agent = get_object_or_404(User, id=agent_id, role='surveyor')
         
-        # Update applications
         applications = ParcelApplication.objects.filter(
             id__in=application_ids,
             status='submitted'
         )
         
-        updated_count = 0
-        notifications_to_create = []
+        if dry_run:
+            updated_count = applications.count()
+            return JsonResponse({
+                'success': True,
+                'dry_run': True,
+                'message': f'{updated_count} applications would be assigned to {field_agent.get_full_name()}',
+                'updated_count': updated_count
+            })
         
         with transaction.atomic():
-            for app in applications:
-                app.field_agent = field_agent
-                app.status = 'field_inspection'
-                if notes:
-                    if app.review_notes:
-                        app.review_notes += f"\n\nBulk Assignment Note: {notes}"
-                    else:
-                        app.review_notes = f"Bulk Assignment Note: {notes}"
-                app.save()
-                
-                # Create notifications for the surveyor
-                notifications_to_create.append(
-                    Notification(
-                        recipient=field_agent,
-                        title='New Field Inspection Assignment',
-                        message=f'You have been assigned to inspect application {app.application_number}',
-                        notification_type='approval_required',
-                        priority=priority,
-                        sender=request.user
-                    )
+            # Lock the matching rows first so the notifications describe exactly what was updated
+            assigned = list(
+                applications.select_for_update().values_list('id', 'application_number', 'applicant_id')
+            )
+            assigned_ids = [app_id for app_id, _, _ in assigned]
+            
+            updates = {
+                'field_agent': field_agent,
+                'status': 'field_inspection',
+                'updated_at': timezone.now(),
+            }
+            if notes:
+                note = f"Bulk Assignment Note: {notes}"
+                updates['review_notes'] = Case(
+                    When(Q(review_notes__isnull=True) | Q(review_notes=''), then=Value(note)),
+                    default=Concat('review_notes', Value(f"\n\n{note}")),
+                    output_field=TextField()
                 )
-                
-                # Create notifications for applicants
-                notifications_to_create.append(
-                    Notification(
-                        recipient=app.applicant,
-                        title='Field Agent Assigned',
-                        message=f'Field agent {field_agent.get_full_name()} has been assigned to inspect your application {app.application_number}',
-                        notification_type='application_status',
-                        sender=request.user
-                    )
+            updated_count = ParcelApplication.objects.filter(id__in=assigned_ids).update(**updates)
+            
+            application_numbers = [number for _, number, _ in assigned]
+            listed = ', '.join(application_numbers[:10])
+            if len(application_numbers) > 10:
+                listed += f' and {len(application_numbers) - 10} more'
+            
+            # One notification for the surveyor, one for each applicant
+            notifications_to_create = [
+                Notification(
+                    recipient=field_agent,
+                    title='New Field Inspection Assignment',
+                    message=f'You have been assigned to inspect {updated_count} applications: {listed}',
+                    notification_type='approval_required',
+                    priority=priority,
+                    sender=request.user
                 )
-                
-                updated_count += 1
+            ] if updated_count else []
+            notifications_to_create.extend(
+                Notification(
+                    recipient_id=applicant_id,
+                    title='Field Agent Assigned',
+                    message=f'Field agent {field_agent.get_full_name()} has been assigned to inspect your application {number}',
+                    notification_type='application_status',
+                    sender=request.user
+                )
+                for _, number, applicant_id in assigned
+            )
+            Notification.objects.bulk_create(notifications_to_create, batch_size=1000)
             
-            # Bulk create all notifications
-            Notification.objects.bulk_create(notifications_to_create)
+            AuditLog.log_bulk_action(
+                request.user, 'update',
+                f'Assigned field agent {field_agent.username} (bulk)',
+                'ParcelApplication',
+                [(app_id, number) for app_id, number, _ in assigned],
+                new_values={'field_agent': field_agent.id, 'status': 'field_inspection'}
+            )
         
         return JsonResponse({
             'success': True,
@@ -306,12 +339,23 @@ def quick_application_review(request, application_id):
         notes = data.get('notes', '')
         
         with transaction.atomic():
+            application, claim_error = lock_application(application.pk, request.user)
+            if claim_error:
+                return JsonResponse({'success': False, 'message': claim_error}, status=409)
+            if application.status in ['approved', 'rejected']:
+                return JsonResponse({
+                    'success': False,
+                    'message': f'This application has already been processed. Current status: {application.status}'
+                }, status=409)
+            
             if action == 'approve':
                 # Quick approve - ensure we use 'approved' not 'approve'
                 application.status = 'approved'
                 application.review_notes = notes
                 application.review_date = timezone.now()
                 application.reviewed_by = request.user
+                application.claimed_by = None
+                application.claim_expires_at = None
                 application.save()
                 
                 # Get values with proper None handling
@@ -378,6 +422,8 @@ def quick_application_review(request, application_id):
                 application.review_notes = notes
                 application.review_date = timezone.now()
                 application.reviewed_by = request.user
+                application.claimed_by = None
+                application.claim_expires_at = None
                 application.save()
                 
                 # Create notification for applicant
@@ -412,6 +458,123 @@ def quick_application_review(request, application_id):
         }, status=500)
 
 
+def _serialize_claim(application):
+    return {
+        'id': application.id,
+        'application_number': application.application_number,
+        'owner_name': f"{application.owner_first_name} {application.owner_last_name}",
+        'property_address': application.property_address,
+        'application_type': application.application_type,
+        'status': application.status,
+        'status_display': application.get_status_display(),
+        'priority': application.priority,
+        'submitted_at': application.submitted_at.strftime('%Y-%m-%d'),
+        'claim_expires_at': application.claim_expires_at.isoformat(),
+    }
+
+
+@login_required
+@require_POST
+def claim_next_application(request):
+    """Claim the next application in the officer work queue"""
+    if request.user.role not in ['registry_officer', 'admin']:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    
+    statuses = None
+    if request.body:
+        try:
+            statuses = json.loads(request.body).get('statuses') or None
+        except (ValueError, AttributeError):
+            return JsonResponse({'success': False, 'message': 'Invalid request body'}, status=400)
+    if statuses is not None:
+        if not isinstance(statuses, list):
+            return JsonResponse({'success': False, 'message': '"statuses" must be a list'}, status=400)
+        statuses = queue_statuses(statuses)
+        if not statuses:
+            return JsonResponse({
+                'success': False,
+                'message': f'"statuses" must contain at least one of: {", ".join(QUEUE_STATUSES)}'
+            }, status=400)
+    
+    application = claim_next(request.user, statuses)
+    if application is None:
+        return JsonResponse({
+            'success': True,
+            'message': 'No applications are waiting for review',
+            'application': None
+        })
+    
+    return JsonResponse({
+        'success': True,
+        'message': f'Application {application.application_number} claimed',
+        'application': _serialize_claim(application)
+    })
+
+
+@login_required
+@require_POST
+def renew_application_claim(request, application_id):
+    """Extend the lease on a claimed application"""
+    if request.user.role not in ['registry_officer', 'admin']:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    
+    expires_at = renew_claim(application_id, request.user)
+    if expires_at is None:
+        return JsonResponse({
+            'success': False,
+            'message': 'You do not hold an active claim on this application'
+        }, status=409)
+    
+    return JsonResponse({'success': True, 'claim_expires_at': expires_at.isoformat()})
+
+
+@login_required
+@require_POST
+def release_application_claim(request, application_id):
+    """Return a claimed application to the work queue"""
+    if request.user.role not in ['registry_officer', 'admin']:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    
+    if not release_claim(application_id, request.user):
+        return JsonResponse({
+            'success': False,
+            'message': 'You do not hold a claim on this application'
+        }, status=409)
+    
+    return JsonResponse({'success': True, 'message': 'Application returned to the queue'})
+
+
+@login_required
+@require_http_methods(["GET"])
+def application_duplicates(request, application_id):
+    """Ranked list of applications and parcels that may duplicate this application"""
+    if request.user.role not in ['registry_officer', 'admin']:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    
+    application = get_object_or_404(ParcelApplication, pk=application_id)
+    include_parcels = request.GET.get('include_parcels', 'true').lower() != 'false'
+    
+    try:
+        limit = int(request.GET.get('limit', 10))
+    except ValueError:
+        limit = 10
+    limit = max(1, min(limit, 50))
+    
+    candidates = find_duplicates_for_application(
+        application,
+        include_parcels=include_parcels,
+        limit=limit
+    )
+    
+    return JsonResponse({
+        'success': True,
+        'application_id': application.id,
+        'application_number': application.application_number,
+        'candidates': candidates,
+        'count': len(candidates),
+    })
+
+
 @login_required
 def export_applications(request):
     """Export applications to CSV"""
@@ -631,25 +794,39 @@ def change_application_priority(request):
         data = json.loads(request.body)
         application_ids = data.get('application_ids', [])
         priority = data.get('priority', 'normal')
+        dry_run = parse_flag(data.get('dry_run', False))
         
         if not application_ids:
             return JsonResponse({'error': 'No applications selected'}, status=400)
         
-        # For now, we'll store priority in review_notes or create a separate field
-        # In a production system, you'd want a dedicated priority field
-        applications = ParcelApplication.objects.filter(id__in=application_ids)
+        if priority not in dict(ParcelApplication.PRIORITY_CHOICES):
+            return JsonResponse({'error': 'Invalid priority'}, status=400)
+        
+        # Rows already at the requested priority are left untouched
+        applications = ParcelApplication.objects.filter(id__in=application_ids).exclude(priority=priority)
+        
+        if dry_run:
+            updated_count = applications.count()
+            return JsonResponse({
+                'success': True,
+                'dry_run': True,
+                'message': f'{updated_count} applications would be set to {priority} priority',
+                'updated_count': updated_count
+            })
         
-        updated_count = 0
         with transaction.atomic():
-            for app in applications:
-                # Add priority note
-                priority_note = f"Priority set to {priority.upper()} by {request.user.get_full_name()}"
-                if app.review_notes:
-                    app.review_notes += f"\n{priority_note}"
-                else:
-                    app.review_notes = priority_note
-                app.save()
-                updated_count += 1
+            changed = list(applications.select_for_update().values_list('id', 'application_number'))
+            updated_count = ParcelApplication.objects.filter(
+                id__in=[app_id for app_id, _ in changed]
+            ).update(priority=priority, updated_at=timezone.now())
+            
+            AuditLog.log_bulk_action(
+                request.user, 'update',
+                f'Priority set to {priority.upper()} (bulk)',
+                'ParcelApplication',
+                changed,
+                new_values={'priority': priority}
+            )
         
         return JsonResponse({
             'success': True,
@@ -657,6 +834,8 @@ def change_application_priority(request):
             'updated_count': updated_count
         })
         
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON data'}, status=400)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
@@ -951,6 +1130,16 @@ def registry_approval(request, application_id):
             }, status=400)
         
         with transaction.atomic():
+            # Lock the row so two officers cannot decide the same application
+            application, claim_error = lock_application(application.pk, request.user)
+            if claim_error:
+                return JsonResponse({'success': False, 'message': claim_error}, status=409)
+            if application.status != 'inspection_completed':
+                return JsonResponse({
+                    'success': False,
+                    'message': f'This application has already been processed. Current status: {application.status}'
+                }, status=409)
+            
             # Update application status
             if decision == 'approve':
                 application.status = 'approved'
@@ -967,6 +1156,8 @@ def registry_approval(request, application_id):
             # Save the application with updated status
             application.reviewed_by = request.user
             application.review_date = timezone.now()
+            application.claimed_by = None
+            application.claim_expires_at = None
             application.save()
             
             print(f"Application status updated to: {application.status}")
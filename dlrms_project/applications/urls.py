@@ -16,6 +16,7 @@ urlpatterns = [
     # New URLs for parcel applications
     path('parcel/', views.ParcelApplicationListView.as_view(), name='parcel_application_list'),
     path('parcel/create/', views.ParcelApplicationCreateView.as_view(), name='parcel_application_create'),
+    path('parcel/bulk-intake/', views.bulk_application_intake, name='parcel_application_bulk_intake'),
     path('parcel/<int:pk>/', views.ParcelApplicationDetailView.as_view(), name='parcel_application_detail'),
     path('parcel/<int:pk>/assign/', views.AssignFieldAgentView.as_view(), name='assign_field_agent'),
     path('parcel/<int:pk>/review/', views.ReviewApplicationView.as_view(), name='review_application'),
@@ -63,6 +64,24 @@ urlpatterns = [
         path('api/applications/<int:application_id>/registry-approval/', 
              reviewviews.registry_approval, 
              name='api_registry_approval'),
+        path('api/applications/<int:application_id>/duplicates/', 
+             reviewviews.application_duplicates, 
+             name='api_application_duplicates'),
+        path('api/queue/claim-next/', 
+             reviewviews.claim_next_application, 
+             name='api_claim_next_application'),
+        path('api/queue/<int:application_id>/renew/', 
+             reviewviews.renew_application_claim, 
+             name='api_renew_application_claim'),
+        path('api/queue/<int:application_id>/release/', 
+             reviewviews.release_application_claim, 
+             name='api_release_application_claim'),
+        path('api/applications/bulk-assign/', 
+             reviewviews.assign_field_agent_bulk, 
+             name='api_bulk_assign_field_agent'),
+        path('api/applications/change-priority/', 
+             reviewviews.change_application_priority, 
+             name='api_change_application_priority'),
         path('api/applications/export/', 
              reviewviews.export_applications, 
              name='api_export_applications'),
@@ -10,9 +10,12 @@ from django.db import transaction
 from django.contrib.auth.decorators import login_required
 
 from notifications.models import Notification
+from notifications.broadcasts import notify_roles
 
 from .models import ParcelApplication, ParcelDocument, ParcelTitle, User
 from .forms import ParcelApplicationForm, ApplicationAssignmentForm, ApplicationReviewForm
+from .duplicates import find_duplicates_for_application
+from .intake import IntakeError, import_applications, open_archive, parse_manifest
 from land_management.models import LandParcel
 from core.mixins import RoleRequiredMixin
 import json
@@ -46,26 +49,25 @@ class ParcelApplicationCreateView(LoginRequiredMixin, CreateView):
     def form_valid(self, form):
         response = super().form_valid(form)
         
+        # Check for existing applications or parcels that look like the same property
+        message = f'New parcel application {form.instance.application_number} submitted by {self.request.user.get_full_name()}'
+        priority = 'normal'
+        duplicates = find_duplicates_for_application(form.instance)
+        if duplicates:
+            references = ', '.join(candidate['reference'] for candidate in duplicates[:5])
+            message += f'. Possible duplicate of: {references}'
+            priority = 'high'
+        
         # Notify registry officers and admin about new application
-        registry_officers = User.objects.filter(
-            role__in=['registry_officer', 'admin'], 
-            is_active=True
+        notify_roles(
+            ['registry_officer', 'admin'],
+            title='New Application Submitted',
+            message=message,
+            notification_type='application_status',
+            priority=priority,
+            sender=self.request.user
         )
         
-        notifications_to_create = []
-        for officer in registry_officers:
-            notifications_to_create.append(
-                Notification(
-                    recipient=officer,
-                    title='New Application Submitted',
-                    message=f'New parcel application {form.instance.application_number} submitted by {self.request.user.get_full_name()}',
-                    notification_type='application_status',
-                    sender=self.request.user
-                )
-            )
-        
-        Notification.objects.bulk_create(notifications_to_create)
-        
         messages.success(self.request, 'Your parcel application has been submitted successfully.')
         return response
 
@@ -317,27 +319,19 @@ class ReviewApplicationView(RoleRequiredMixin, LoginRequiredMixin, View):
                     )
                 )
                 
-                # Notify registry officers and admin for final review
-                registry_officers = User.objects.filter(
-                    role__in=['registry_officer', 'admin'], 
-                    is_active=True
-                )
-                
-                for officer in registry_officers:
-                    notifications_to_create.append(
-                        Notification(
-                            recipient=officer,
-                            title='Application Ready for Final Review',
-                            message=f'Application {application.application_number} has completed field inspection and is ready for final review',
-                            notification_type='approval_required',
-                            priority='high',
-                            sender=request.user
-                        )
-                    )
-                
                 # Bulk create notifications
                 Notification.objects.bulk_create(notifications_to_create)
                 
+                # Notify registry officers and admin for final review
+                notify_roles(
+                    ['registry_officer', 'admin'],
+                    title='Application Ready for Final Review',
+                    message=f'Application {application.application_number} has completed field inspection and is ready for final review',
+                    notification_type='approval_required',
+                    priority='high',
+                    sender=request.user
+                )
+                
                 message = 'Inspection report submitted successfully. Waiting for registry officer approval.'
                 messages.success(request, message)
 
@@ -1165,20 +1159,15 @@ def complete_field_inspection(request, application_id):
                 application.save()
                 
                 # Create notification for registry officers
-                registry_officers = User.objects.filter(
-                    role__in=['registry_officer', 'admin'],
-                    is_active=True
+                notify_roles(
+                    ['registry_officer', 'admin'],
+                    title='Field Inspection Completed',
+                    message=f'Field inspection for application {application.application_number} has been completed and is ready for final review.',
+                    notification_type='application_status',
+                    sender=request.user,
+                    send_email=True
                 )
                 
-                for officer in registry_officers:
-                    Notification.objects.create(
-                        recipient=officer,
-                        title='Field Inspection Completed',
-                        message=f'Field inspection for application {application.application_number} has been completed and is ready for final review.',
-                        notification_type='application_status',
-                        sender=request.user
-                    )
-                
                 return JsonResponse({
                     'success': True,
                     'message': 'Field inspection completed successfully',
@@ -1208,4 +1197,41 @@ def complete_field_inspection(request, application_id):
         return JsonResponse({
             'success': False,
             'message': f'An error occurred: {str(e)}'
-        }, status=500)
\ No newline at end of file
+        }, status=500)
+
+@login_required
+@require_POST
+def bulk_application_intake(request):
+    """
+    Submit a batch of parcel applications in one request.
+    Expects a `manifest` file (CSV or JSON) and an optional `archive` zip
+    containing the documents referenced by the manifest rows.
+    """
+    if request.user.role not in ['notary', 'registry_officer', 'admin']:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    
+    manifest = request.FILES.get('manifest')
+    if not manifest:
+        return JsonResponse({'success': False, 'message': 'A manifest file is required'}, status=400)
+    
+    dry_run = request.POST.get('dry_run', '').lower() in ['1', 'true', 'yes']
+    
+    try:
+        rows = parse_manifest(manifest.read(), manifest.name)
+        archive = open_archive(request.FILES['archive']) if 'archive' in request.FILES else None
+        result = import_applications(rows, request.user, archive=archive, dry_run=dry_run)
+    except IntakeError as e:
+        return JsonResponse({
+            'success': False,
+            'message': str(e),
+            'errors': [{'row': row, 'message': message} for row, message in e.errors]
+        }, status=400)
+    except Exception as e:
+        return JsonResponse({'success': False, 'message': f'Error importing applications: {str(e)}'}, status=500)
+    
+    if dry_run:
+        message = f"{result['validated']} applications validated, nothing was imported"
+    else:
+        message = f"{result['created']} applications submitted successfully"
+    
+    return JsonResponse({'success': True, 'message': message, **result})
@@ -0,0 +1,118 @@
+# applications/workqueue.py
+"""
+Officer work queue for parcel applications.
+
+Officers pull the next application with claim_next(). The candidate row is
+selected with SELECT ... FOR UPDATE SKIP LOCKED, so concurrent officers never
+wait on each other and never receive the same application. A claim is a lease:
+it expires after APPLICATION_CLAIM_LEASE_MINUTES unless renewed, after which
+the application returns to the queue.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from .models import ParcelApplication
+
+# Statuses that wait on a registry officer, in the order they are served
+QUEUE_STATUSES = ['inspection_completed', 'submitted']
+
+PRIORITY_RANK = {'urgent': 0, 'high': 1, 'normal': 2, 'low': 3}
+
+
+def lease_duration():
+    return timedelta(minutes=getattr(settings, 'APPLICATION_CLAIM_LEASE_MINUTES', 15))
+
+
+def _queue_order():
+    priority_rank = Case(
+        *[When(priority=priority, then=Value(rank)) for priority, rank in PRIORITY_RANK.items()],
+        default=Value(len(PRIORITY_RANK)),
+        output_field=IntegerField()
+    )
+    status_rank = Case(
+        *[When(status=status, then=Value(rank)) for rank, status in enumerate(QUEUE_STATUSES)],
+        default=Value(len(QUEUE_STATUSES)),
+        output_field=IntegerField()
+    )
+    return [priority_rank.asc(), status_rank.asc(), 'submitted_at', 'id']
+
+
+def queue_statuses(statuses=None):
+    """The queue statuses among `statuses` (all of them when None); others are never served"""
+    if statuses is None:
+        return list(QUEUE_STATUSES)
+    return [status for status in QUEUE_STATUSES if status in statuses]
+
+
+def available_applications(user, statuses=None):
+    """Queue applications that are unclaimed, have an expired claim or are already claimed by `user`"""
+    now = timezone.now()
+    return ParcelApplication.objects.filter(
+        status__in=queue_statuses(statuses)
+    ).filter(
+        Q(claimed_by__isnull=True) | Q(claim_expires_at__lte=now) | Q(claimed_by=user)
+    )
+
+
+def claim_next(user, statuses=None):
+    """
+    Claim the next application for `user` and return it, or None if the queue is empty.
+
+    An officer who already holds a live claim gets that application back with a
+    renewed lease instead of a new one, so claims cannot be hoarded.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        current = ParcelApplication.objects.select_for_update(skip_locked=True).filter(
+            claimed_by=user,
+            claim_expires_at__gt=now,
+            status__in=queue_statuses(statuses)
+        ).first()
+        if current is None:
+            current = available_applications(user, statuses).select_for_update(
+                skip_locked=True
+            ).order_by(*_queue_order()).first()
+        if current is None:
+            return None
+
+        current.claimed_by = user
+        current.claim_expires_at = now + lease_duration()
+        current.save(update_fields=['claimed_by', 'claim_expires_at', 'updated_at'])
+    return current
+
+
+def renew_claim(application_id, user):
+    """Extend the lease on a claim held by `user`; returns the new expiry or None"""
+    expires_at = timezone.now() + lease_duration()
+    updated = ParcelApplication.objects.filter(
+        pk=application_id,
+        claimed_by=user,
+        claim_expires_at__gt=timezone.now()
+    ).update(claim_expires_at=expires_at)
+    return expires_at if updated else None
+
+
+def release_claim(application_id, user):
+    """Give up a claim held by `user`; returns True if a claim was released"""
+    return ParcelApplication.objects.filter(
+        pk=application_id,
+        claimed_by=user
+    ).update(claimed_by=None, claim_expires_at=None) > 0
+
+
+def lock_application(application_id, user):
+    """
+    Lock an application row for a review decision.
+
+    Must be called inside a transaction. Returns (application, error) where
+    error is a message when another officer holds a live claim on it.
+    """
+    application = ParcelApplication.objects.select_for_update().get(pk=application_id)
+    if application.is_claimed_by_other(user):
+        claimed_by = application.claimed_by.get_full_name() or application.claimed_by.username
+        return application, f'This application is currently claimed by {claimed_by}'
+    return application, None
@@ -1,7 +1,7 @@
 # Create this file: dlrms_project/certificates/admin.py
 
 from django.contrib import admin
-from .models import Certificate, CertificateTemplate, CertificateAuditLog
+from .models import Certificate, CertificateTemplate, CertificateAuditLog, MerkleAnchor, RevocationSnapshot
 
 
 @admin.register(Certificate)
@@ -71,4 +71,23 @@ class CertificateAuditLogAdmin(admin.ModelAdmin):
         return False
     
     def has_delete_permission(self, request, obj=None):
-        return False
\ No newline at end of file
+        return False
+
+
+@admin.register(RevocationSnapshot)
+class RevocationSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['version', 'entry_count', 'size_bytes', 'false_positive_rate', 'created_at']
+    readonly_fields = ['version', 'snapshot_file', 'sha256', 'entry_count', 'false_positive_rate', 'size_bytes', 'created_at']
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(MerkleAnchor)
+class MerkleAnchorAdmin(admin.ModelAdmin):
+    list_display = ['root', 'leaf_count', 'period_start', 'period_end', 'anchor_reference', 'created_at']
+    search_fields = ['root', 'anchor_reference']
+    readonly_fields = ['root', 'leaf_count', 'period_start', 'period_end', 'created_at']
+    
+    def has_add_permission(self, request):
+        return False
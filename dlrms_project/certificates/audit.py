@@ -0,0 +1,164 @@
+# certificates/audit.py
+"""
+Write-behind certificate audit logging.
+
+High-traffic certificate views (detail, download, verification) do not
+insert their CertificateAuditLog rows themselves. log_action_async() appends
+the entry to an in-process buffer, and a background thread writes the buffer
+with a single bulk_create when it reaches CERTIFICATE_AUDIT_BUFFER_SIZE
+entries or when the oldest entry is CERTIFICATE_AUDIT_FLUSH_SECONDS old.
+
+The buffer is flushed at interpreter exit (normal shutdown, including a
+SIGTERM handled by the application server), so only a hard kill can lose the
+last few seconds of entries. Entries are stored with the time they were
+logged, not the time of the flush. If a batch cannot be written, its entries
+are retried one at a time: an entry the database rejects (e.g. for a
+certificate deleted meanwhile) is logged and dropped, the rest are written
+or, if the database is unreachable, kept for the next flush. Set
+CERTIFICATE_AUDIT_ASYNC = False to write synchronously, e.g. in tests.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import DataError, IntegrityError, close_old_connections
+from django.utils import timezone
+
+from .models import CertificateAuditLog
+
+logger = logging.getLogger(__name__)
+
+
+def request_audit_fields(request):
+    """Who performed a request, in the shape CertificateAuditLog expects"""
+    return {
+        'performed_by_id': request.user.pk if request.user.is_authenticated else None,
+        'ip_address': request.META.get('REMOTE_ADDR'),
+        'user_agent': request.META.get('HTTP_USER_AGENT', ''),
+    }
+
+
+class AuditBuffer:
+    """Collects audit entries in memory and writes them in batches from a background thread"""
+
+    def __init__(self):
+        self._entries = []
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    @property
+    def size(self):
+        return getattr(settings, 'CERTIFICATE_AUDIT_BUFFER_SIZE', 100)
+
+    @property
+    def interval(self):
+        return getattr(settings, 'CERTIFICATE_AUDIT_FLUSH_SECONDS', 2)
+
+    def add(self, entry):
+        with self._lock:
+            self._ensure_thread()
+            if not self._entries:
+                self._oldest = time.monotonic()
+            self._entries.append(entry)
+            full = len(self._entries) >= self.size
+        if full:
+            self._wakeup.set()
+
+    def _ensure_thread(self):
+        # Called with the lock held. A forked worker inherits neither the thread nor the parent's entries.
+        if self._pid != os.getpid():
+            self._entries = []
+            self._oldest = None
+            self._pid = os.getpid()
+            self._thread = None
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='certificate-audit', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            with self._lock:
+                due = self._entries and (
+                    len(self._entries) >= self.size or time.monotonic() - self._oldest >= self.interval
+                )
+            if due:
+                self.flush()
+
+    def flush(self):
+        """Write all buffered entries now; returns the number written"""
+        with self._lock:
+            entries, self._entries = self._entries, []
+            self._oldest = None
+        if not entries:
+            return 0
+
+        try:
+            CertificateAuditLog.objects.bulk_create(
+                [CertificateAuditLog(**entry) for entry in entries],
+                batch_size=500
+            )
+        except Exception:
+            logger.warning('Could not write %s certificate audit log entries as a batch, retrying one by one',
+                           len(entries), exc_info=True)
+            return self._write_each(entries)
+        finally:
+            if threading.current_thread() is self._thread:
+                close_old_connections()
+        return len(entries)
+
+    def _write_each(self, entries):
+        """Write entries one at a time, so one bad entry does not hold back the rest"""
+        written = 0
+        for position, entry in enumerate(entries):
+            try:
+                CertificateAuditLog.objects.create(**entry)
+            except (IntegrityError, DataError, TypeError, ValueError):
+                logger.exception('Dropping certificate audit log entry the database rejected: %r', entry)
+            except Exception:
+                # Not the entry's fault (e.g. the database is unreachable): keep it and the rest for the next flush
+                logger.exception('Could not write %s certificate audit log entries', len(entries) - position)
+                self._requeue(entries[position:])
+                break
+            else:
+                written += 1
+        return written
+
+    def _requeue(self, entries):
+        # Keep failed entries for the next flush, but never let the buffer grow without bound
+        limit = self.size * 10
+        with self._lock:
+            self._entries = (entries + self._entries)[-limit:]
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+
+
+_buffer = AuditBuffer()
+
+
+def log_action_async(certificate_id, action, details=None, **fields):
+    """Record a CertificateAuditLog entry without blocking the caller"""
+    entry = dict(fields, certificate_id=certificate_id, action=action, details=details or {})
+
+    if not getattr(settings, 'CERTIFICATE_AUDIT_ASYNC', True):
+        CertificateAuditLog.objects.create(**entry)
+        return
+
+    # Keep the time of the event rather than of the flush
+    entry['timestamp'] = timezone.now()
+    _buffer.add(entry)
+
+
+def flush():
+    """Write any buffered audit entries immediately"""
+    return _buffer.flush()
+
+
+atexit.register(flush)
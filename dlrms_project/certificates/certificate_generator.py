@@ -5,29 +5,41 @@ from reportlab.pdfgen import canvas
 from reportlab.platypus import Table, TableStyle, Paragraph
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
-import qrcode
 from io import BytesIO
 from datetime import datetime
 import hashlib
 from django.conf import settings
 from django.core.files.base import ContentFile
 import os
-import tempfile
+
+from .images import qr_image
+from .templating import get_background, merge_overlay, render_overlay
 
 class TransferCertificateGenerator:
     """Generate professional PDF certificates for land ownership transfers"""
     
+    # Built once per process, shared by all generator instances
+    _styles = None
+    
     def __init__(self):
         self.page_width, self.page_height = A4
-        self.styles = getSampleStyleSheet()
-        self._setup_custom_styles()
+        self.styles = self._get_styles()
     
-    def _setup_custom_styles(self):
+    @classmethod
+    def _get_styles(cls):
+        if cls._styles is None:
+            styles = getSampleStyleSheet()
+            cls._setup_custom_styles(styles)
+            cls._styles = styles
+        return cls._styles
+    
+    @staticmethod
+    def _setup_custom_styles(styles):
         """Setup custom paragraph styles"""
         # Title style
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='TransferTitle',
-            parent=self.styles['Heading1'],
+            parent=styles['Heading1'],
             fontSize=22,
             textColor=colors.HexColor('#000080'),
             spaceAfter=30,
@@ -36,9 +48,9 @@ class TransferCertificateGenerator:
         ))
         
         # Header style
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='TransferHeader',
-            parent=self.styles['Normal'],
+            parent=styles['Normal'],
             fontSize=16,
             textColor=colors.HexColor('#000080'),
             spaceAfter=12,
@@ -47,9 +59,9 @@ class TransferCertificateGenerator:
         ))
         
         # Section header style
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='SectionHeader',
-            parent=self.styles['Normal'],
+            parent=styles['Normal'],
             fontSize=12,
             textColor=colors.HexColor('#000080'),
             spaceAfter=8,
@@ -58,11 +70,14 @@ class TransferCertificateGenerator:
     
     def generate_transfer_certificate(self, transfer, notary):
         """Generate professional PDF transfer certificate"""
-        buffer = BytesIO()
-        
-        # Create canvas
-        c = canvas.Canvas(buffer, pagesize=A4)
+        # Static layer is rendered once per process; only the transfer details are drawn per call
+        background = get_background('transfer', None, self._draw_background)
+        overlay = render_overlay(lambda c: self._draw_transfer_fields(c, transfer, notary))
         
+        return merge_overlay(background, overlay)
+    
+    def _draw_background(self, c):
+        """Draw everything that is identical on all transfer certificates"""
         # Add watermark
         self._add_watermark(c)
         
@@ -70,17 +85,26 @@ class TransferCertificateGenerator:
         self._add_border(c)
         
         # Add header with logo
-        self._add_header(c, transfer)
+        self._add_header(c)
+        
+        # Official seal below the signature lines
+        self._add_seal(c)
+        
+        # Fixed footer lines
+        self._add_footer_static(c)
+    
+    def _draw_transfer_fields(self, c, transfer, notary):
+        """Draw the transfer-specific content on the overlay page"""
+        # Certificate number
+        c.setFont("Helvetica-Bold", 14)
+        c.setFillColor(colors.black)
+        c.drawCentredString(self.page_width/2, self.page_height - 3.8*inch, 
+                            f"Certificate No: {transfer.transfer_number}")
         
         # Add QR code for verification
-        qr_image_path = self._generate_qr_code(transfer)
-        c.drawImage(qr_image_path, self.page_width - 2*inch, self.page_height - 2*inch, 
+        c.drawImage(self._generate_qr_code(transfer), self.page_width - 2*inch, self.page_height - 2*inch, 
                     width=1*inch, height=1*inch)
         
-        # Clean up temporary file
-        if os.path.exists(qr_image_path):
-            os.unlink(qr_image_path)
-        
         # Add certificate content
         self._add_transfer_content(c, transfer)
         
@@ -96,15 +120,6 @@ class TransferCertificateGenerator:
         # Add page number
         c.setFont("Helvetica", 8)
         c.drawRightString(self.page_width - 0.5*inch, 0.5*inch, "Page 1 of 1")
-        
-        # Save PDF
-        c.save()
-        
-        # Get PDF content
-        pdf_content = buffer.getvalue()
-        buffer.close()
-        
-        return pdf_content
     
     def _add_watermark(self, canvas):
         """Add watermark to the page"""
@@ -130,7 +145,7 @@ class TransferCertificateGenerator:
                    self.page_width - 1.0*inch, 
                    self.page_height - 1.0*inch)
     
-    def _add_header(self, canvas, transfer):
+    def _add_header(self, canvas):
         """Add certificate header with official styling"""
         # Government logo
         logo_path = os.path.join(settings.BASE_DIR, 'static', 'img', 'logo.png')
@@ -160,25 +175,11 @@ class TransferCertificateGenerator:
         canvas.setFont("Helvetica-Bold", 20)
         canvas.drawCentredString(self.page_width/2, self.page_height - 3.4*inch, 
                                "CERTIFICATE OF LAND OWNERSHIP TRANSFER")
-        
-        # Certificate number
-        canvas.setFont("Helvetica-Bold", 14)
-        canvas.setFillColor(colors.black)
-        canvas.drawCentredString(self.page_width/2, self.page_height - 3.8*inch, 
-                               f"Certificate No: {transfer.transfer_number}")
     
     def _generate_qr_code(self, transfer):
         """Generate QR code for certificate verification"""
-        qr = qrcode.QRCode(version=1, box_size=6, border=2)
         verification_url = f"https://dlrms.gov.cd/verify/transfer/{transfer.transfer_number}"
-        qr.add_data(verification_url)
-        qr.make(fit=True)
-        
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp_file:
-            img.save(tmp_file, format='PNG')
-            return tmp_file.name
+        return qr_image(verification_url, box_size=6, border=2)
     
     def _add_transfer_content(self, canvas, transfer):
         """Add main transfer content"""
@@ -321,8 +322,10 @@ class TransferCertificateGenerator:
         canvas.drawString(4.5*inch, y_position - 0.2*inch, "Place: Kigali")
         canvas.drawString(4.5*inch, y_position - 0.35*inch, 
                          f"Date: {datetime.now().strftime('%B %d, %Y')}")
-        
-        # Official seal image
+    
+    def _add_seal(self, canvas):
+        """Add the official seal image centered below the signatures"""
+        y_position = 2.5*inch
         seal_path = os.path.join(settings.BASE_DIR, 'static', 'img', 'seal.png')
         if os.path.exists(seal_path):
             # Position the seal centered below the signatures
@@ -351,8 +354,8 @@ class TransferCertificateGenerator:
         canvas.line(1*inch, y - 2, 1*inch + len(text) * 6, y - 2)
         canvas.setFillColor(colors.black)
     
-    def _add_footer(self, canvas, transfer):
-        """Add footer with verification info and legal text"""
+    def _add_footer_static(self, canvas):
+        """Add the fixed legal text of the footer"""
         canvas.setFont("Helvetica", 8)
         canvas.setFillColor(colors.HexColor('#666666'))
         
@@ -364,6 +367,12 @@ class TransferCertificateGenerator:
         y_position -= 0.15*inch
         canvas.drawCentredString(self.page_width/2, y_position,
                                "as per the Digital Land Registry Act of the Democratic Republic of Congo")
-        y_position -= 0.15*inch
+    
+    def _add_footer(self, canvas, transfer):
+        """Add footer with verification info"""
+        canvas.setFont("Helvetica", 8)
+        canvas.setFillColor(colors.HexColor('#666666'))
+        
+        y_position = 0.8*inch - 0.3*inch
         canvas.drawCentredString(self.page_width/2, y_position,
                                f"Verify authenticity at: dlrms.gov.cd/verify/transfer/{transfer.transfer_number}")
\ No newline at end of file
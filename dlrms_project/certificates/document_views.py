@@ -11,10 +11,21 @@ import hashlib
 from io import BytesIO
 
 from .models import Certificate, CertificateAuditLog
-from signatures.models import DigitalSignature
+from signatures.models import DigitalSignature, SignatureImage
+from signatures import pki
 from documents.models import Document
 
 
+def document_content_hash(document):
+    """
+    SHA-256 identifying a document's content for signing: a certificate's
+    document_hash, or the content hash recorded when a document was uploaded
+    """
+    if isinstance(document, Certificate):
+        return document.document_hash
+    return document.get_content_hash()
+
+
 class DocumentSigningView(LoginRequiredMixin, DetailView):
     """View for signing documents"""
     template_name = 'certificates/document_signing.html'
@@ -62,7 +73,7 @@ class DocumentSigningView(LoginRequiredMixin, DetailView):
         else:
             # For documents without direct signature relationship
             return DigitalSignature.objects.filter(
-                document_hash=self._calculate_document_hash(doc)
+                document_hash=document_content_hash(doc)
             ).select_related('signer')
     
     def _get_signature_positions(self):
@@ -80,17 +91,6 @@ class DocumentSigningView(LoginRequiredMixin, DetailView):
                 {'id': 'signer1', 'label': 'Primary Signer', 'x': 100, 'y': 600},
                 {'id': 'signer2', 'label': 'Secondary Signer', 'x': 400, 'y': 600},
             ]
-    
-    def _calculate_document_hash(self, document):
-        """Calculate SHA-256 hash of document content"""
-        if hasattr(document, 'pdf_file') and document.pdf_file:
-            content = document.pdf_file.read()
-            document.pdf_file.seek(0)  # Reset file pointer
-        else:
-            # For documents without PDF, hash the key fields
-            content = f"{document.pk}{document.created_at}".encode()
-        
-        return hashlib.sha256(content).hexdigest()
 
 
 @login_required
@@ -115,23 +115,18 @@ def sign_document_ajax(request):
             document = get_object_or_404(Document, pk=doc_id)
             document_title = document.title or f"Document {document.pk}"
         
-        # Calculate document hash
-        document_hash = hashlib.sha256(
-            f"{document.pk}{signature_data}".encode()
-        ).hexdigest()
+        # The signature covers the document's content, hashed once when it was stored
+        document_hash = document_content_hash(document)
         
-        # Create digital signature
-        signature = DigitalSignature.objects.create(
+        # Create digital signature, signed over the document hash with the signer's key
+        signature = DigitalSignature(
             signer=request.user,
             document_type='application_approval' if doc_type == 'certificate' else 'legal_document',
             document_title=document_title,
             document_hash=document_hash,
             signature_hash=hashlib.sha256(signature_data.encode()).hexdigest(),  # Store hash
-            signature_image=signature_data,  # Store actual signature image
+            image=SignatureImage.from_data_url(signature_data),  # Stored once per distinct image
             status='signed',
-            is_verified=True,
-            verification_method='Browser-based signing',
-            verification_timestamp=timezone.now(),
             signature_metadata={
                 'position': signature_position,
                 'signature_type': signature_type,
@@ -139,6 +134,8 @@ def sign_document_ajax(request):
                 'user_agent': request.META.get('HTTP_USER_AGENT', '')
             }
         )
+        pki.sign(signature)
+        signature.save()
         
         # Link signature to document if possible
         if hasattr(document, 'signatures'):
@@ -202,7 +199,9 @@ class SignedDocumentsListView(LoginRequiredMixin, ListView):
         if date_to:
             queryset = queryset.filter(signed_at__lte=date_to)
         
-        return queryset.order_by('-signed_at')
+        return queryset.select_related('related_document').defer(
+            'signature_metadata', 'signature_value'
+        ).order_by('-signed_at')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -216,31 +215,34 @@ def verify_document_signature(request, signature_id):
     """Verify a document signature"""
     signature = get_object_or_404(DigitalSignature, signature_id=signature_id)
     
-    # Perform verification
-    is_valid = signature.is_verified and signature.status == 'signed'
+    # Check the Ed25519 signature over the document hash
+    verified = pki.verify_signature(signature)
+    is_valid = bool(verified)
     
     # Check if signature hasn't been revoked
     if signature.status == 'revoked':
-        is_valid = False
         message = "This signature has been revoked."
     elif signature.status == 'invalid':
-        is_valid = False
         message = "This signature is invalid."
-    elif not signature.is_verified:
-        is_valid = False
-        message = "This signature could not be verified."
+    elif verified is None:
+        message = "This signature was made before cryptographic signing and cannot be verified."
+    elif not verified:
+        message = "This signature does not match the document."
     else:
         message = "Signature is valid and verified."
     
     return JsonResponse({
         'success': True,
         'is_valid': is_valid,
+        'verification_status': pki.verification_status(verified),
         'message': message,
         'signature': {
             'id': str(signature.signature_id),
             'signer': signature.signer.get_full_name(),
             'signed_at': signature.signed_at.strftime('%Y-%m-%d %H:%M:%S'),
             'document': signature.document_title,
-            'status': signature.get_status_display()
+            'status': signature.get_status_display(),
+            'algorithm': pki.ALGORITHM if signature.signature_value else None,
+            'key_id': signature.signer_key.key_id if signature.signer_key_id else None,
         }
     })
\ No newline at end of file
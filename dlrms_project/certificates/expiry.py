@@ -0,0 +1,173 @@
+# certificates/expiry.py
+"""
+Expiry engine for certificates and parcel titles.
+
+Run by the expire_certificates management command (e.g. hourly from cron).
+Every step selects its rows with an indexed range scan on the expiry date and
+changes them with set-based UPDATEs in chunks, writing the audit trail with
+bulk inserts. Each step only picks up rows that still need the change, so the
+engine is safe to run repeatedly or concurrently (rows locked by another run
+are skipped).
+
+- expire_certificates(): issued certificates past expiry_date become 'expired'
+- expire_titles(): active ParcelTitles past expiry_date become inactive, and
+  parcels whose active title lapsed are updated
+- send_renewal_reminders(): owners of certificates expiring within each
+  horizon in CERTIFICATE_EXPIRY_REMINDER_DAYS get one reminder per horizon
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from applications.models import ParcelTitle
+from core.models import AuditLog
+from land_management.models import LandParcel
+from notifications.models import Notification
+from .models import Certificate, CertificateAuditLog
+from .verification import verification_cache_keys
+
+BATCH_SIZE = 1000
+
+
+def reminder_horizons():
+    return sorted(set(getattr(settings, 'CERTIFICATE_EXPIRY_REMINDER_DAYS', [90, 30, 7])))
+
+
+def expire_certificates(now=None, batch_size=BATCH_SIZE, dry_run=False):
+    """Move issued certificates past their expiry date to 'expired'; returns how many"""
+    now = now or timezone.now()
+    due = Certificate.objects.filter(status='issued', expiry_date__lte=now)
+    if dry_run:
+        return due.count()
+
+    expired = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                due.select_for_update(skip_locked=True).order_by('expiry_date').values_list(
+                    'id', 'certificate_id', 'certificate_number', 'expiry_date'
+                )[:batch_size]
+            )
+            if not rows:
+                break
+
+            Certificate.objects.filter(pk__in=[row[0] for row in rows]).update(status='expired', updated_at=now)
+            CertificateAuditLog.objects.bulk_create([
+                CertificateAuditLog(
+                    certificate_id=pk,
+                    action='expired',
+                    timestamp=now,
+                    details={'expiry_date': expiry_date.isoformat(), 'automatic': True}
+                )
+                for pk, _, _, expiry_date in rows
+            ])
+
+            keys = []
+            for _, certificate_id, certificate_number, _ in rows:
+                keys.extend(verification_cache_keys(certificate_id, certificate_number))
+            transaction.on_commit(lambda keys=keys: cache.delete_many(keys))
+
+        expired += len(rows)
+    return expired
+
+
+def expire_titles(today=None, batch_size=BATCH_SIZE, dry_run=False):
+    """
+    Deactivate parcel titles past their expiry date and update the parcels
+    whose active title lapsed. Returns (titles expired, parcels updated).
+    """
+    today = today or timezone.localdate()
+    due = ParcelTitle.objects.filter(is_active=True, expiry_date__lt=today)
+    lapsed_parcels = LandParcel.objects.filter(active_title_expiry__lt=today)
+    if dry_run:
+        return due.count(), lapsed_parcels.count()
+
+    titles_expired = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                due.select_for_update(skip_locked=True).order_by('expiry_date').values_list(
+                    'id', 'title_number'
+                )[:batch_size]
+            )
+            if not rows:
+                break
+
+            ParcelTitle.objects.filter(pk__in=[row[0] for row in rows]).update(is_active=False)
+            AuditLog.log_bulk_action(
+                None, 'update', 'Title expired', 'ParcelTitle', rows,
+                old_values={'is_active': True}, new_values={'is_active': False}
+            )
+        titles_expired += len(rows)
+
+    # A parcel keeps any other active title it has (e.g. a renewal), otherwise it has none
+    active_titles = ParcelTitle.objects.filter(parcel=OuterRef('pk'), is_active=True).order_by('-issue_date', '-id')
+    with transaction.atomic():
+        replaced = lapsed_parcels.filter(Exists(active_titles)).update(
+            active_title_type=Subquery(active_titles.values('title_type')[:1]),
+            active_title_expiry=Subquery(active_titles.values('expiry_date')[:1]),
+            updated_at=timezone.now()
+        )
+        cleared = lapsed_parcels.update(active_title_type=None, active_title_expiry=None, updated_at=timezone.now())
+
+    return titles_expired, replaced + cleared
+
+
+def send_renewal_reminders(now=None, horizons=None, batch_size=BATCH_SIZE, dry_run=False):
+    """
+    Notify owners of issued certificates expiring within each horizon (days).
+
+    Certificate.expiry_reminder_days records the tightest horizon already
+    reminded, so each owner gets one reminder per horizon however often this
+    runs; a certificate first seen inside several horizons only gets the
+    tightest one. Returns the number of reminders sent per horizon.
+    """
+    now = now or timezone.now()
+    type_names = dict(Certificate.CERTIFICATE_TYPE_CHOICES)
+    sent = {}
+
+    # Tightest horizon first, so certificates it claims are excluded from the wider ones
+    tighter = Q(pk__in=[])
+    for days in sorted(horizons or reminder_horizons()):
+        due_q = Q(
+            Q(expiry_reminder_days__isnull=True) | Q(expiry_reminder_days__gt=days),
+            status='issued',
+            expiry_date__gt=now,
+            expiry_date__lte=now + timedelta(days=days),
+        )
+        due = Certificate.objects.filter(due_q)
+        if dry_run:
+            sent[days] = due.exclude(tighter).count()
+            tighter |= due_q
+            continue
+
+        sent[days] = 0
+        while True:
+            with transaction.atomic():
+                rows = list(
+                    due.select_for_update(skip_locked=True).order_by('expiry_date').values_list(
+                        'id', 'owner_id', 'certificate_number', 'certificate_type', 'expiry_date'
+                    )[:batch_size]
+                )
+                if not rows:
+                    break
+
+                Certificate.objects.filter(pk__in=[row[0] for row in rows]).update(expiry_reminder_days=days)
+                notifications = []
+                for _, owner_id, number, certificate_type, expiry_date in rows:
+                    days_left = max((expiry_date - now).days, 0)
+                    notifications.append(Notification(
+                        recipient_id=owner_id,
+                        title='Certificate Expiring Soon',
+                        message=f'Your {type_names.get(certificate_type, "")} certificate {number} will expire in {days_left} days on {expiry_date.strftime("%B %d, %Y")}. Please renew it before expiration.',
+                        notification_type='deadline_reminder',
+                        priority='urgent' if days_left <= 7 else 'high'
+                    ))
+                Notification.objects.bulk_create(notifications, batch_size=batch_size)
+            sent[days] += len(rows)
+
+    return sent
@@ -7,31 +7,54 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
-import qrcode
 from io import BytesIO
 from datetime import datetime
 import hashlib
+import json
+import pypdf
+import reportlab
 from django.conf import settings
 from django.core.files.base import ContentFile
 import os
 from PIL import Image
-import tempfile
-import base64
+
+from .models import CertificateTemplate
+from .images import qr_image, signature_image
+from .offline import qr_data
+from .templating import get_background, merge_overlay, render_overlay
+
+DEFAULT_PRIMARY_COLOR = '#000080'
+
+# Part of every render fingerprint: bump it whenever the layout, wording or
+# artwork changes, so regeneration re-renders certificates drawn the old way
+RENDER_VERSION = 1
+
 
 class CertificateGenerator:
     """Generate PDF certificates for land parcels"""
     
+    # Built once per process, shared by all generator instances
+    _styles = None
+    
     def __init__(self):
         self.page_width, self.page_height = A4
-        self.styles = getSampleStyleSheet()
-        self._setup_custom_styles()
+        self.styles = self._get_styles()
     
-    def _setup_custom_styles(self):
+    @classmethod
+    def _get_styles(cls):
+        if cls._styles is None:
+            styles = getSampleStyleSheet()
+            cls._setup_custom_styles(styles)
+            cls._styles = styles
+        return cls._styles
+    
+    @staticmethod
+    def _setup_custom_styles(styles):
         """Setup custom paragraph styles"""
         # Title style
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='CertificateTitle',
-            parent=self.styles['Heading1'],
+            parent=styles['Heading1'],
             fontSize=24,
             textColor=colors.HexColor('#000080'),
             spaceAfter=30,
@@ -39,9 +62,9 @@ class CertificateGenerator:
         ))
         
         # Header style
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='Header',
-            parent=self.styles['Normal'],
+            parent=styles['Normal'],
             fontSize=16,
             textColor=colors.HexColor('#000080'),
             spaceAfter=12,
@@ -50,16 +73,16 @@ class CertificateGenerator:
         ))
         
         # Legal text style
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='LegalText',
-            parent=self.styles['Normal'],
+            parent=styles['Normal'],
             fontSize=10,
             alignment=TA_JUSTIFY,
             spaceAfter=12,
             leading=14
         ))
     
-    def _add_official_seal_overlay(self, canvas, certificate):
+    def _add_official_seal_overlay(self, canvas):
         """Add official seal as an overlay on the certificate"""
         seal_path = os.path.join(settings.BASE_DIR, 'static', 'img', 'armoiries_rdc.png')
         official_seal_path = os.path.join(settings.BASE_DIR, 'static', 'img', 'seal.png')
@@ -99,56 +122,114 @@ class CertificateGenerator:
 
     def generate_certificate(self, certificate, signature_data=None, signer_name=None, sign_date=None):
         """Generate PDF certificate with optional embedded signature and official seal"""
-        buffer = BytesIO()
+        template = self._get_template(certificate)
+        
+        # Static layer: rendered once per certificate type and template version
+        background = get_background(
+            f'certificate:{certificate.certificate_type}',
+            template.updated_at if template else None,
+            lambda c: self._draw_background(c, certificate.certificate_type, template)
+        )
+        
+        # Variable layer: only what differs between certificates
+        overlay = render_overlay(
+            lambda c: self._draw_certificate_fields(c, certificate, signature_data, signer_name, sign_date)
+        )
+        
+        pdf_content = merge_overlay(background, overlay, {
+            '/Title': f'Certificate {certificate.certificate_number}',
+            '/Author': 'DRC Land Registry',
+            '/Producer': 'DLRMS',
+        })
+    
+    # Calculate document hash
+        document_hash = hashlib.sha256(pdf_content).hexdigest()
+    
+        return pdf_content, document_hash
+    
+    def _get_template(self, certificate):
+        return CertificateTemplate.objects.filter(
+            certificate_type=certificate.certificate_type, is_active=True
+        ).only('primary_color', 'logo_image', 'updated_at').first()
     
-    # Create canvas
-        c = canvas.Canvas(buffer, pagesize=A4)
+    def render_fingerprint(self, certificate, signature_data=None, signer_name=None, sign_date=None):
+        """
+        SHA-256 over everything that goes into the certificate PDF.
+        
+        Rendering is deterministic, so two renders with the same fingerprint
+        produce the same bytes: a certificate whose fingerprint is unchanged
+        does not need re-rendering, and its PDF can be reproduced to check
+        its document_hash.
+        """
+        template = self._get_template(certificate)
+        app = certificate.application
+        owner = certificate.owner
+        inputs = {
+            'render_version': RENDER_VERSION,
+            'reportlab': reportlab.Version,
+            'pypdf': pypdf.__version__,
+            'template': [template.pk, template.updated_at.isoformat()] if template else None,
+            'certificate_type': certificate.certificate_type,
+            'certificate_number': certificate.certificate_number,
+            'issue_date': certificate.issue_date.isoformat() if certificate.issue_date else None,
+            'expiry_date': certificate.expiry_date.isoformat() if certificate.expiry_date else None,
+            # Verification URL and signed token (owner name, expiry, signing key)
+            'qr': qr_data(certificate),
+            'owner': [owner.get_full_name(), owner.national_id or ''],
+            'application': [
+                str(getattr(app, field, '') or '')
+                for field in ('application_number', 'property_address', 'property_type',
+                              'size_hectares', 'latitude', 'longitude', 'submitted_at')
+            ] if app else None,
+            'signature': [
+                hashlib.sha256(signature_data.encode()).hexdigest() if signature_data else None,
+                signer_name,
+                sign_date.strftime('%B %d, %Y') if sign_date else None,
+            ],
+        }
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
     
+    def _draw_background(self, c, certificate_type, template=None):
+        """Draw everything that is identical on all certificates of a type"""
+        primary_color = template.primary_color if template and template.primary_color else DEFAULT_PRIMARY_COLOR
+        logo_path = template.logo_image.path if template and template.logo_image else None
+        
     # Add watermark
         self._add_watermark(c)
     
     # Add border
-        self._add_border(c)
+        self._add_border(c, primary_color)
     
     # Add header
-        self._add_header(c, certificate)
+        self._add_header(c, certificate_type, primary_color, logo_path)
+    
+    # Add official seal overlay
+        self._add_official_seal_overlay(c)
     
+    # Fixed footer text and signature caption
+        self._add_footer_static(c)
+        c.setFillColor(colors.black)
+        c.setFont("Helvetica-Bold", 10)
+        c.drawCentredString(self.page_width/2, 3.0*inch, "AUTHORIZED SIGNATURE")
+    
+    def _draw_certificate_fields(self, c, certificate, signature_data=None, signer_name=None, sign_date=None):
+        """Draw the certificate-specific content on the overlay page"""
     # Add QR code (smaller and repositioned)
-        qr_image_path = self._generate_qr_code(certificate)
-        c.drawImage(qr_image_path, self.page_width - 2*inch, self.page_height - 2*inch, 
+        c.drawImage(self._generate_qr_code(certificate), self.page_width - 2*inch, self.page_height - 2*inch, 
                     width=1*inch, height=1*inch)
     
-    # Clean up temporary file
-        if os.path.exists(qr_image_path):
-            os.unlink(qr_image_path)
-    
     # Add certificate content
         if certificate.certificate_type == 'property_contract':
             self._add_property_contract_content(c, certificate)
         else:
             self._add_parcel_certificate_content(c, certificate)
     
-    # Add official seal overlay (before signatures so it appears behind)
-        self._add_official_seal_overlay(c, certificate)
-    
     # Add signatures section
         self._add_signatures_section(c, certificate, signature_data, signer_name, sign_date)
     
     # Add footer
         self._add_footer(c, certificate)
     
-    # Save PDF
-        c.save()
-    
-    # Get PDF content
-        pdf_content = buffer.getvalue()
-        buffer.close()
-    
-    # Calculate document hash
-        document_hash = hashlib.sha256(pdf_content).hexdigest()
-    
-        return pdf_content, document_hash
-    
     def _add_watermark(self, canvas):
         """Add watermark to the page"""
         canvas.saveState()
@@ -159,9 +240,9 @@ class CertificateGenerator:
         canvas.drawCentredString(0, 0, "DRC LAND REGISTRY")
         canvas.restoreState()
     
-    def _add_border(self, canvas):
+    def _add_border(self, canvas, primary_color=DEFAULT_PRIMARY_COLOR):
         """Add decorative border"""
-        canvas.setStrokeColor(colors.HexColor('#000080'))
+        canvas.setStrokeColor(colors.HexColor(primary_color))
         canvas.setLineWidth(2)
         # Outer border
         canvas.rect(0.5*inch, 0.5*inch, 
@@ -173,11 +254,11 @@ class CertificateGenerator:
                    self.page_width - 1.2*inch, 
                    self.page_height - 1.2*inch)
     
-    def _add_header(self, canvas, certificate):
+    def _add_header(self, canvas, certificate_type, primary_color=DEFAULT_PRIMARY_COLOR, logo_path=None):
         """Add certificate header"""
         # Government emblem placeholder
         # Government logo
-        logo_path = os.path.join(settings.BASE_DIR, 'static', 'img', 'logo.png')
+        logo_path = logo_path or os.path.join(settings.BASE_DIR, 'static', 'img', 'logo.png')
         logo_width = 1.2 * inch
         logo_height = 1.2 * inch
         x = (self.page_width - logo_width) / 2
@@ -187,7 +268,7 @@ class CertificateGenerator:
             canvas.drawImage(logo_path, x, y, width=logo_width, height=logo_height, preserveAspectRatio=True, mask='auto')
 
         # Set text color to blue for all following text
-        canvas.setFillColor(colors.HexColor('#000080'))
+        canvas.setFillColor(colors.HexColor(primary_color))
 
         # Country name
         canvas.setFont("Helvetica-Bold", 18)
@@ -206,23 +287,12 @@ class CertificateGenerator:
 
         # Certificate title
         canvas.setFont("Helvetica-Bold", 20)
-        title = "PROPERTY CONTRACT CERTIFICATE" if certificate.certificate_type == 'property_contract' else "PARCEL CERTIFICATE OF OWNERSHIP"
+        title = "PROPERTY CONTRACT CERTIFICATE" if certificate_type == 'property_contract' else "PARCEL CERTIFICATE OF OWNERSHIP"
         canvas.drawCentredString(self.page_width/2, self.page_height - 3.7*inch, title)
     
     def _generate_qr_code(self, certificate):
-        """Generate QR code for certificate verification"""
-        qr = qrcode.QRCode(version=1, box_size=8, border=3)
-        qr.add_data(certificate.verification_url)
-        qr.make(fit=True)
-        
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Create a temporary file for the QR code
-        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp_file:
-            img.save(tmp_file, format='PNG')
-            tmp_file_path = tmp_file.name
-        
-        return tmp_file_path
+        """Generate QR code with the verification URL and signed offline token (cached in memory)"""
+        return qr_image(qr_data(certificate), box_size=8, border=3)
     
     def _add_property_contract_content(self, canvas, certificate):
         """Add content specific to property contract"""
@@ -351,9 +421,7 @@ class CertificateGenerator:
         # Position signature section below owner information with proper spacing
         y_position = 3.0*inch  # Adjusted to appear below owner info
         
-        # AUTHORIZED SIGNATURE text
-        canvas.setFont("Helvetica-Bold", 10)
-        canvas.drawCentredString(self.page_width/2, y_position, "AUTHORIZED SIGNATURE")
+        # The "AUTHORIZED SIGNATURE" caption is part of the prerendered background
         
         # Signature area
         y_position -= 0.5*inch
@@ -361,25 +429,18 @@ class CertificateGenerator:
         # If we have signature data, embed it
         if signature_data and signature_data.startswith('data:image'):
             try:
-                # Extract base64 image data
-                header, data = signature_data.split(',', 1)
-                image_data = base64.b64decode(data)
-                
-                # Save to temporary file
-                with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp_file:
-                    tmp_file.write(image_data)
-                    tmp_file_path = tmp_file.name
+                # Decode the base64 data URL in memory
+                signature = signature_image(signature_data)
+                if signature is None:
+                    raise ValueError('Invalid signature image data')
                 
                 # Center the signature
                 sig_x = (self.page_width - 2*inch) / 2
                 
                 # Draw the signature image
-                canvas.drawImage(tmp_file_path, sig_x, y_position - 0.5*inch, 
+                canvas.drawImage(signature, sig_x, y_position - 0.5*inch, 
                                width=2*inch, height=0.8*inch, preserveAspectRatio=True)
                 
-                # Clean up
-                os.unlink(tmp_file_path)
-                
                 # Add signer details below signature
                 y_position -= 1.0*inch
                 canvas.setFont("Helvetica", 9)
@@ -407,6 +468,39 @@ class CertificateGenerator:
             y_position -= 0.2*inch
             canvas.drawCentredString(self.page_width/2, y_position, "Date: ___________")
     
+    def signature_slots(self):
+        """
+        Where signatures appended after rendering are drawn: (x, y, width, height)
+        of the image. Slot 0 is the main signature area; further signers go to
+        the left and right of it, clear of the owner details and the footer.
+        """
+        return [
+            ((self.page_width - 2*inch) / 2, 2.0*inch, 2*inch, 0.8*inch),
+            (0.8*inch, 1.75*inch, 1.6*inch, 0.6*inch),
+            (self.page_width - 2.4*inch, 1.75*inch, 1.6*inch, 0.6*inch),
+        ]
+
+    def render_signature_stamp(self, slot, signature_data, signer_name=None, sign_date=None):
+        """Overlay page with one signature drawn in `slot`, for appending to an issued PDF"""
+        return render_overlay(lambda c: self._draw_signature_stamp(c, slot, signature_data, signer_name, sign_date))
+
+    def _draw_signature_stamp(self, c, slot, signature_data, signer_name=None, sign_date=None):
+        x, y, width, height = self.signature_slots()[slot]
+        signature = signature_image(signature_data)
+        if signature is None:
+            raise ValueError('Invalid signature image data')
+        c.drawImage(signature, x, y, width=width, height=height, preserveAspectRatio=True, mask='auto')
+
+        # The main signature area already has its caption in the rendered page
+        if slot == 0:
+            return
+        c.setFillColor(colors.black)
+        c.setFont("Helvetica", 8)
+        if signer_name:
+            c.drawCentredString(x + width/2, y - 0.15*inch, signer_name)
+        if sign_date:
+            c.drawCentredString(x + width/2, y - 0.28*inch, f"Date: {sign_date.strftime('%B %d, %Y')}")
+
     def _draw_signature_box(self, canvas, y_position):
         """Draw a signature box with label"""
         # Draw the signature line
@@ -434,6 +528,16 @@ class CertificateGenerator:
             canvas.drawCentredString(self.page_width/2, y_position, 
                                     f"Verification URL: {url}")
             y_position -= 0.2*inch
+    
+    def _add_footer_static(self, canvas):
+        """Add the fixed footer lines below the verification URL"""
+        canvas.setFillColor(colors.black)
+        canvas.setFont("Helvetica", 7)
+        
+        # Same layout as _add_footer: verification URLs all have the same length
+        base_url = getattr(settings, 'CERTIFICATE_VERIFICATION_BASE_URL', 'https://dlrms.cd')
+        url_length = len(f"{base_url}/verify/") + 36
+        y_position = 1.2*inch - (0.3*inch if url_length > 70 else 0.2*inch)
         
         # Official document text
         canvas.drawCentredString(self.page_width/2, y_position, 
@@ -441,4 +545,4 @@ class CertificateGenerator:
         y_position -= 0.15*inch
         
         canvas.drawCentredString(self.page_width/2, y_position, 
-                                "Document officiel du Gouvernement de la République Démocratique du Congo")
\ No newline at end of file
+                                "Document officiel du Gouvernement de la République Démocratique du Congo")
@@ -0,0 +1,61 @@
+# certificates/images.py
+"""
+In-memory image sources for the certificate generators.
+
+QR codes and signature images are handed to ReportLab as ImageReader objects
+built from memory, so rendering a certificate never touches the filesystem.
+Rendered QR codes are kept in an LRU cache keyed by their payload, which makes
+re-rendering an existing certificate (same verification URL) skip QR encoding
+entirely.
+"""
+import base64
+import binascii
+from functools import lru_cache
+from io import BytesIO
+
+import qrcode
+from PIL import Image
+from reportlab.lib.utils import ImageReader
+
+QR_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=QR_CACHE_SIZE)
+def _render_qr(data, box_size, border):
+    qr = qrcode.QRCode(version=1, box_size=box_size, border=border)
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    # Fully decoded RGB image so it can be shared between threads read-only
+    img = qr.make_image(fill_color="black", back_color="white").get_image().convert('RGB')
+    img.load()
+    return img
+
+
+def qr_image(data, box_size=8, border=3):
+    """ImageReader for a QR code encoding `data`"""
+    return ImageReader(_render_qr(data, box_size, border))
+
+
+def qr_png(data, box_size=8, border=3):
+    """PNG bytes of a QR code encoding `data`"""
+    buffer = BytesIO()
+    _render_qr(data, box_size, border).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def signature_image(signature_data):
+    """
+    ImageReader for a base64 data URL (data:image/png;base64,...).
+
+    Returns None when the value is not a decodable image data URL.
+    """
+    if not signature_data or not signature_data.startswith('data:image'):
+        return None
+    try:
+        header, data = signature_data.split(',', 1)
+        img = Image.open(BytesIO(base64.b64decode(data)))
+        img.load()
+    except (ValueError, binascii.Error, OSError):
+        return None
+    return ImageReader(img)
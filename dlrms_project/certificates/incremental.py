@@ -0,0 +1,329 @@
+# certificates/incremental.py
+"""
+Signatures appended to issued certificate PDFs as incremental updates.
+
+A certificate PDF is rendered once, with its first signature embedded. Later
+signatures are not re-rendered into it: each one is drawn on a small overlay
+page that is appended to the stored file as a PDF incremental update (new
+objects, a replacement page object and a cross-reference section pointing
+back at the previous one). The bytes already in the file are never changed,
+so every earlier revision can still be cut out of the file and checked
+against its hash, and adding a signature costs an append of a few kilobytes
+instead of a full render.
+
+The revisions of a stored PDF are kept in Certificate.pdf_revisions, oldest
+first:
+
+    {'signature': <DigitalSignature id or None>, 'slot': <signature slot or None>,
+     'length': <file size after the revision>, 'sha256': <hash of those bytes>}
+
+The first entry is the rendered PDF, whose hash is the certificate's
+document_hash; Certificate.pdf_hash is the hash of the whole stored file.
+"""
+import hashlib
+import logging
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from pypdf import PdfReader
+from pypdf.generic import (
+    ArrayObject, DecodedStreamObject, DictionaryObject, FloatObject, IndirectObject, NameObject, NumberObject,
+    StreamObject,
+)
+
+from .models import Certificate
+
+logger = logging.getLogger(__name__)
+
+
+def _startxref(pdf):
+    position = pdf.rindex(b'startxref')
+    return int(pdf[position + len(b'startxref'):].split()[0])
+
+
+def _stream(data):
+    stream = DecodedStreamObject()
+    stream.set_data(data)
+    return stream
+
+
+def append_overlay(pdf, overlay_pdf, name, page_number=0):
+    """
+    Return `pdf` with an incremental update that draws the first page of
+    `overlay_pdf` on top of page `page_number`.
+
+    The overlay is added as a form XObject under the resource `name` (e.g.
+    '/DlrmsSig1'), so nothing it uses can clash with the page's own
+    resources. `pdf` is returned unchanged at the start of the result.
+    """
+    previous_xref = _startxref(pdf)
+    if pdf[previous_xref:previous_xref + 4] != b'xref':
+        raise ValueError('Only PDFs with a cross-reference table can be updated incrementally')
+
+    reader = PdfReader(BytesIO(pdf))
+    page = reader.pages[page_number]
+    page_ref = page.indirect_reference
+    next_number = int(reader.trailer['/Size'])
+    objects = {}
+
+    def add(obj):
+        nonlocal next_number
+        number, next_number = next_number, next_number + 1
+        objects[number] = obj
+        return IndirectObject(number, 0, None)
+
+    # Copy the overlay's objects, renumbered after the existing ones
+    copied = {}
+
+    def copy(value):
+        if isinstance(value, IndirectObject):
+            if value.idnum not in copied:
+                copied[value.idnum] = number = add(None).idnum
+                objects[number] = copy(value.get_object())
+            return IndirectObject(copied[value.idnum], 0, None)
+        if isinstance(value, StreamObject):
+            for key, item in list(dict.items(value)):
+                value[key] = copy(item)
+            return value
+        if isinstance(value, DictionaryObject):
+            return DictionaryObject({key: copy(item) for key, item in dict.items(value)})
+        if isinstance(value, ArrayObject):
+            return ArrayObject(copy(item) for item in list.__iter__(value))
+        return value
+
+    overlay = PdfReader(BytesIO(overlay_pdf)).pages[0]
+    contents = overlay['/Contents']
+    if isinstance(contents, ArrayObject):
+        form = _stream(b'\n'.join(part.get_object().get_data() for part in contents))
+    else:
+        form = contents
+    form[NameObject('/Type')] = NameObject('/XObject')
+    form[NameObject('/Subtype')] = NameObject('/Form')
+    form[NameObject('/BBox')] = ArrayObject(FloatObject(value) for value in overlay.mediabox)
+    form[NameObject('/Resources')] = copy(dict.get(overlay, '/Resources', DictionaryObject()))
+    form_ref = add(form)
+
+    # Replacement page: the form added to its resources and drawn after its own content,
+    # which is wrapped in q/Q so whatever graphics state it leaves behind does not apply
+    resources = DictionaryObject(dict.items(page['/Resources'] if '/Resources' in page else DictionaryObject()))
+    xobjects = DictionaryObject(dict.items(resources['/XObject'] if '/XObject' in resources else DictionaryObject()))
+    xobjects[NameObject(name)] = form_ref
+    resources[NameObject('/XObject')] = xobjects
+
+    existing = dict.get(page, '/Contents')
+    if existing is None:
+        existing = []
+    elif isinstance(existing.get_object(), ArrayObject):
+        existing = list(list.__iter__(existing.get_object()))
+    else:
+        existing = [existing]
+
+    updated_page = DictionaryObject(dict.items(page))
+    updated_page[NameObject('/Resources')] = resources
+    updated_page[NameObject('/Contents')] = ArrayObject(
+        [add(_stream(b'q\n'))] + existing + [add(_stream(f'Q\nq {name} Do Q\n'.encode()))]
+    )
+    objects[page_ref.idnum] = updated_page
+    generations = {page_ref.idnum: page_ref.generation}
+
+    output = BytesIO()
+    output.write(pdf)
+    if not pdf.endswith(b'\n'):
+        output.write(b'\n')
+
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = output.tell()
+        output.write(f'{number} {generations.get(number, 0)} obj\n'.encode())
+        objects[number].write_to_stream(output, None)
+        output.write(b'\nendobj\n')
+
+    xref = output.tell()
+    # Object 0 heads the free list in every section; readers use it to check the section's numbering
+    output.write(b'xref\n0 1\n0000000000 65535 f\r\n')
+    numbers = sorted(offsets)
+    start = 0
+    while start < len(numbers):
+        end = start
+        while end + 1 < len(numbers) and numbers[end + 1] == numbers[end] + 1:
+            end += 1
+        output.write(f'{numbers[start]} {end - start + 1}\n'.encode())
+        for number in numbers[start:end + 1]:
+            output.write(f'{offsets[number]:010d} {generations.get(number, 0):05d} n\r\n'.encode())
+        start = end + 1
+
+    trailer = DictionaryObject({
+        NameObject('/Size'): NumberObject(next_number),
+        NameObject('/Prev'): NumberObject(previous_xref),
+    })
+    for key in ('/Root', '/Info', '/ID'):
+        if key in reader.trailer:
+            trailer[NameObject(key)] = dict.__getitem__(reader.trailer, key)
+    output.write(b'trailer\n')
+    trailer.write_to_stream(output, None)
+    output.write(f'\nstartxref\n{xref}\n%%EOF\n'.encode())
+    return output.getvalue()
+
+
+def revision(pdf, signature=None, slot=None):
+    """Entry of Certificate.pdf_revisions for the file `pdf`"""
+    return {
+        'signature': signature.pk if signature else None,
+        'slot': slot,
+        'length': len(pdf),
+        'sha256': hashlib.sha256(pdf).hexdigest(),
+    }
+
+
+def next_slot(revisions):
+    """The first free signature slot of a stored PDF, or None if all are taken"""
+    from .generator import CertificateGenerator
+
+    taken = {entry['slot'] for entry in revisions if entry.get('slot') is not None}
+    for slot in range(len(CertificateGenerator().signature_slots())):
+        if slot not in taken:
+            return slot
+    return None
+
+
+def append_signature(pdf, signature, slot, revision_number):
+    """`pdf` with `signature` drawn in `slot` as incremental update number `revision_number`"""
+    from .generator import CertificateGenerator
+    from .tasks import signature_args
+
+    args = signature_args(signature)
+    if not args:
+        raise ValueError('Signature has no image')
+    overlay = CertificateGenerator().render_signature_stamp(slot, **args)
+    return append_overlay(pdf, overlay, f'/DlrmsSig{revision_number}')
+
+
+def append_signatures(pdf, embedded, signatures):
+    """
+    Append `signatures` to a freshly rendered `pdf` in which `embedded` (or
+    no signature) was drawn. Signatures beyond the free slots are left out.
+    Returns (pdf, revisions).
+    """
+    revisions = [revision(pdf, embedded, 0 if embedded else None)]
+    for signature in signatures:
+        slot = next_slot(revisions)
+        if slot is None:
+            break
+        pdf = append_signature(pdf, signature, slot, len(revisions))
+        revisions.append(revision(pdf, signature, slot))
+    return pdf, revisions
+
+
+def _current_revisions(certificate, storage, exclude=None):
+    """Revisions of the stored PDF, describing PDFs issued before revisions were recorded"""
+    if certificate.pdf_revisions:
+        return list(certificate.pdf_revisions)
+
+    embedded = certificate.signatures.filter(status='signed').exclude(pk=exclude).order_by('signed_at').first()
+    return [{
+        'signature': embedded.pk if embedded else None,
+        'slot': 0 if embedded else None,
+        'length': storage.size(certificate.pdf_file.name),
+        'sha256': certificate.pdf_hash or certificate.document_hash,
+    }]
+
+
+def _read_pdf(storage, name, revisions):
+    """
+    The stored PDF, checked against the last recorded revision.
+
+    Bytes after the recorded length whose prefix matches are an update that
+    was appended but never recorded (its transaction failed); they are
+    ignored and overwritten by the next update.
+    """
+    with storage.open(name, 'rb') as f:
+        pdf = f.read()
+    expected = revisions[-1]
+    if hashlib.sha256(pdf).hexdigest() == expected['sha256']:
+        return pdf
+    length = expected.get('length')
+    if length and len(pdf) > length and hashlib.sha256(pdf[:length]).hexdigest() == expected['sha256']:
+        return pdf[:length]
+    raise ValueError('The stored certificate PDF does not match its recorded hash')
+
+
+def add_signature_revision(certificate, signature):
+    """
+    Append `signature` to the certificate's stored PDF.
+
+    Returns the new revision, or None when the PDF has not been rendered yet
+    (process_certificate() appends it once it is), already contains the
+    signature, or has no free signature slot. Raises ValueError if the stored
+    file does not match its recorded hash.
+
+    Local files are appended to in place and cut back to their previous
+    length if the revision cannot be recorded; other storages get the
+    updated file under a new name, which replaces the old one on commit.
+    """
+    storage = certificate.pdf_file.storage
+    written = None
+    try:
+        with transaction.atomic():
+            # One signer at a time: each revision extends the previous one
+            certificate = Certificate.objects.select_for_update().get(pk=certificate.pk)
+            if not certificate.pdf_file or certificate.issuance_status in ('queued', 'rendering'):
+                return None
+
+            revisions = _current_revisions(certificate, storage, exclude=signature.pk)
+            if any(entry.get('signature') == signature.pk for entry in revisions):
+                return None
+            slot = next_slot(revisions)
+            if slot is None:
+                return None
+
+            name = certificate.pdf_file.name
+            pdf = _read_pdf(storage, name, revisions)
+            updated = append_signature(pdf, signature, slot, len(revisions))
+            try:
+                path = storage.path(name)
+            except NotImplementedError:
+                certificate.pdf_file.name = storage.save(name, ContentFile(updated))
+                written = ('new', certificate.pdf_file.name)
+                transaction.on_commit(lambda: storage.delete(name))
+            else:
+                written = ('appended', path, len(pdf))
+                with open(path, 'r+b') as f:
+                    f.truncate(len(pdf))
+                    f.seek(len(pdf))
+                    f.write(updated[len(pdf):])
+
+            entry = revision(updated, signature, slot)
+            certificate.pdf_revisions = revisions + [entry]
+            certificate.pdf_hash = entry['sha256']
+            certificate.save(update_fields=['pdf_file', 'pdf_revisions', 'pdf_hash', 'updated_at'])
+    except Exception:
+        # The revision was not recorded: put the stored file back as it was
+        if written and written[0] == 'appended':
+            with open(written[1], 'r+b') as f:
+                f.truncate(written[2])
+        elif written:
+            storage.delete(written[1])
+        raise
+    return entry
+
+
+def append_missing_signatures(certificate_id):
+    """
+    Append the signed signatures the stored PDF does not contain yet.
+
+    Signatures added while a certificate is queued or rendering are not
+    appended by add_signature_revision() and may have been read after the
+    render started; process_certificate() calls this once the PDF is stored.
+    Returns the number appended.
+    """
+    certificate = Certificate.objects.get(pk=certificate_id)
+    included = {entry.get('signature') for entry in certificate.pdf_revisions}
+    appended = 0
+    for signature in certificate.signatures.filter(status='signed').exclude(pk__in=included).order_by('signed_at'):
+        try:
+            if add_signature_revision(certificate, signature):
+                appended += 1
+        except Exception:
+            logger.exception('Could not append signature %s to certificate %s', signature.pk, certificate_id)
+    return appended
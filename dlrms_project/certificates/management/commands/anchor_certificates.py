@@ -0,0 +1,41 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from certificates.merkle import anchor_certificates
+
+
+class Command(BaseCommand):
+    help = 'Anchor the document hashes of newly issued certificates under one Merkle root'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--from',
+            dest='period_start',
+            help='Start of the issue period (YYYY-MM-DD, default: every unanchored certificate)',
+        )
+        parser.add_argument(
+            '--to',
+            dest='period_end',
+            help='End of the issue period, exclusive (YYYY-MM-DD, default: now)',
+        )
+    
+    def handle(self, *args, **options):
+        period_start = self._parse_date(options['period_start']) if options['period_start'] else None
+        period_end = self._parse_date(options['period_end']) if options['period_end'] else None
+        
+        anchor = anchor_certificates(period_start=period_start, period_end=period_end)
+        
+        if anchor is None:
+            self.stdout.write('No unanchored certificates in this period')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Anchored {anchor.leaf_count} certificates under root {anchor.root}'
+        ))
+    
+    def _parse_date(self, value):
+        try:
+            return timezone.make_aware(datetime.strptime(value, '%Y-%m-%d'))
+        except ValueError:
+            raise CommandError(f'Invalid date "{value}", expected YYYY-MM-DD')
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from certificates.revocation import build_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Build a new revocation snapshot (Bloom filter of revoked and expired certificates)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--false-positive-rate',
+            type=float,
+            help='Target false-positive rate (default: CERTIFICATE_REVOCATION_FALSE_POSITIVE_RATE or 0.001)',
+        )
+        parser.add_argument(
+            '--keep',
+            type=int,
+            help='Number of snapshot versions to keep (default: CERTIFICATE_REVOCATION_SNAPSHOTS_KEPT or 5)',
+        )
+    
+    def handle(self, *args, **options):
+        rate = options['false_positive_rate']
+        if rate is not None and not 0 < rate < 1:
+            raise CommandError('--false-positive-rate must be between 0 and 1')
+        
+        snapshot, created = build_snapshot(false_positive_rate=rate, keep=options['keep'])
+        
+        if created:
+            self.stdout.write(self.style.SUCCESS(
+                f'Built revocation snapshot v{snapshot.version}: {snapshot.entry_count} certificates, '
+                f'{snapshot.size_bytes} bytes'
+            ))
+        else:
+            self.stdout.write(f'Revoked certificates unchanged, snapshot v{snapshot.version} is current')
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from certificates.expiry import expire_certificates, expire_titles, reminder_horizons, send_renewal_reminders
+
+
+class Command(BaseCommand):
+    help = 'Expire lapsed certificates and parcel titles and send renewal reminders (safe to run repeatedly)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--no-reminders',
+            action='store_true',
+            help='Only expire certificates and titles, do not send renewal reminders',
+        )
+        parser.add_argument(
+            '--horizons',
+            nargs='+',
+            type=int,
+            help='Reminder horizons in days (default: CERTIFICATE_EXPIRY_REMINDER_DAYS)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows changed per transaction (default: 1000)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report what would change',
+        )
+    
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        batch_size = max(options['batch_size'], 1)
+        dry_run = options['dry_run']
+        prefix = 'Would expire' if dry_run else 'Expired'
+        
+        certificates = expire_certificates(batch_size=batch_size, dry_run=dry_run)
+        self.stdout.write(f'{prefix} {certificates} certificates')
+        
+        titles, parcels = expire_titles(batch_size=batch_size, dry_run=dry_run)
+        self.stdout.write(f'{prefix} {titles} titles, {parcels} parcels with a lapsed active title')
+        
+        if not options['no_reminders']:
+            sent = send_renewal_reminders(
+                horizons=options['horizons'] or reminder_horizons(),
+                batch_size=batch_size,
+                dry_run=dry_run
+            )
+            for days, count in sent.items():
+                self.stdout.write(f"{'Would send' if dry_run else 'Sent'} {count} reminders for the {days}-day horizon")
+        
+        self.stdout.write(self.style.SUCCESS(f'Expiry run finished in {time.monotonic() - started:.2f}s'))
@@ -1,11 +1,10 @@
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from django.utils import timezone
-from datetime import timedelta
-from certificates.models import Certificate, CertificateAuditLog
+from certificates.expiry import send_renewal_reminders
+from certificates.models import Certificate
 from notifications.models import Notification
-from django.contrib.auth import get_user_model
 
-User = get_user_model()
 
 class Command(BaseCommand):
     help = 'Send notifications to landowners about their certificates'
@@ -21,6 +20,12 @@ class Command(BaseCommand):
             action='store_true',
             help='Notify owners whose certificates are expiring soon',
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Certificates handled per transaction when notifying undownloaded certificates (default: 1000)',
+        )
         parser.add_argument(
             '--days',
             type=int,
@@ -30,7 +35,7 @@ class Command(BaseCommand):
     
     def handle(self, *args, **options):
         if options['notify_undownloaded']:
-            self.notify_undownloaded_certificates()
+            self.notify_undownloaded_certificates(max(options['batch_size'], 1))
         
         if options['notify_expiring']:
             self.notify_expiring_certificates(options['days'])
@@ -40,45 +45,46 @@ class Command(BaseCommand):
                 self.style.WARNING('No action specified. Use --notify-undownloaded or --notify-expiring')
             )
     
-    def notify_undownloaded_certificates(self):
+    def notify_undownloaded_certificates(self, batch_size=1000):
         """Notify owners who haven't downloaded their certificates"""
         self.stdout.write('Checking for undownloaded certificates...')
         
-        # Get all issued certificates
-        certificates = Certificate.objects.filter(status='issued')
+        # Issued, never downloaded by the owner and not reminded yet: one indexed scan
+        # (owner_downloaded_at and download_reminder_sent_at are the markers)
+        pending = Certificate.objects.filter(
+            status='issued',
+            owner_downloaded_at__isnull=True,
+            download_reminder_sent_at__isnull=True
+        )
+        type_names = dict(Certificate.CERTIFICATE_TYPE_CHOICES)
         
         notified_count = 0
-        for certificate in certificates:
-            # Check if owner has downloaded the certificate
-            owner_downloads = CertificateAuditLog.objects.filter(
-                certificate=certificate,
-                action='downloaded',
-                performed_by=certificate.owner
-            ).exists()
-            
-            if not owner_downloads:
-                # Check if we've already sent a notification about this
-                existing_notification = Notification.objects.filter(
-                    recipient=certificate.owner,
-                    title__contains='Certificate Ready',
-                    message__contains=certificate.certificate_number
-                ).exists()
+        while True:
+            with transaction.atomic():
+                rows = list(
+                    pending.select_for_update(skip_locked=True).order_by('id').values_list(
+                        'id', 'owner_id', 'certificate_number', 'certificate_type'
+                    )[:batch_size]
+                )
+                if not rows:
+                    break
                 
-                if not existing_notification:
-                    # Send notification
-                    Notification.objects.create(
-                        recipient=certificate.owner,
+                Certificate.objects.filter(pk__in=[row[0] for row in rows]).update(
+                    download_reminder_sent_at=timezone.now()
+                )
+                Notification.objects.bulk_create([
+                    Notification(
+                        recipient_id=owner_id,
                         title='Certificate Ready for Download',
-                        message=f'Your {certificate.get_certificate_type_display()} certificate {certificate.certificate_number} is ready for download. Please log in to download it.',
+                        message=f'Your {type_names.get(certificate_type, "")} certificate {certificate_number} is ready for download. Please log in to download it.',
                         notification_type='document_uploaded',
                         priority='high'
                     )
-                    notified_count += 1
-                    self.stdout.write(
-                        self.style.SUCCESS(
-                            f'Notified {certificate.owner.get_full_name()} about certificate {certificate.certificate_number}'
-                        )
-                    )
+                    for _, owner_id, certificate_number, certificate_type in rows
+                ], batch_size=batch_size)
+            
+            notified_count += len(rows)
+            self.stdout.write(f'Notified owners of {notified_count} certificates so far')
         
         self.stdout.write(
             self.style.SUCCESS(f'Sent {notified_count} notifications for undownloaded certificates')
@@ -88,46 +94,9 @@ class Command(BaseCommand):
         """Notify owners whose certificates are expiring soon"""
         self.stdout.write(f'Checking for certificates expiring within {days} days...')
         
-        # Calculate the date range
-        today = timezone.now().date()
-        expiry_threshold = today + timedelta(days=days)
-        
-        # Get certificates that are expiring soon
-        expiring_certificates = Certificate.objects.filter(
-            status='issued',
-            expiry_date__isnull=False,
-            expiry_date__date__lte=expiry_threshold,
-            expiry_date__date__gt=today  # Not already expired
-        )
-        
-        notified_count = 0
-        for certificate in expiring_certificates:
-            days_until_expiry = (certificate.expiry_date.date() - today).days
-            
-            # Check if we've already sent a notification recently (within last 7 days)
-            recent_notification = Notification.objects.filter(
-                recipient=certificate.owner,
-                title__contains='Certificate Expiring',
-                message__contains=certificate.certificate_number,
-                created_at__gte=timezone.now() - timedelta(days=7)
-            ).exists()
-            
-            if not recent_notification:
-                # Send notification
-                Notification.objects.create(
-                    recipient=certificate.owner,
-                    title='Certificate Expiring Soon',
-                    message=f'Your {certificate.get_certificate_type_display()} certificate {certificate.certificate_number} will expire in {days_until_expiry} days on {certificate.expiry_date.strftime("%B %d, %Y")}. Please renew it before expiration.',
-                    notification_type='deadline_reminder',
-                    priority='urgent' if days_until_expiry <= 7 else 'high'
-                )
-                notified_count += 1
-                self.stdout.write(
-                    self.style.WARNING(
-                        f'Notified {certificate.owner.get_full_name()} about expiring certificate {certificate.certificate_number} (expires in {days_until_expiry} days)'
-                    )
-                )
+        # Same reminders as the scheduled expire_certificates run, so an owner is never reminded twice
+        sent = send_renewal_reminders(horizons=[days])
         
         self.stdout.write(
-            self.style.SUCCESS(f'Sent {notified_count} notifications for expiring certificates')
-        )
\ No newline at end of file
+            self.style.SUCCESS(f'Sent {sent[days]} notifications for expiring certificates')
+        )
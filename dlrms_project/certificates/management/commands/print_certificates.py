@@ -0,0 +1,92 @@
+import os
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from certificates.models import Certificate
+from certificates.printing import bundle_size, iter_parts, log_print, part_count, print_queryset, write_bundle
+
+
+class Command(BaseCommand):
+    help = 'Merge issued certificate PDFs into print-ready bundle files'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--district',
+            help='Only certificates for parcels in this district',
+        )
+        parser.add_argument(
+            '--issued-from',
+            help='Only certificates issued on or after this date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--issued-to',
+            help='Only certificates issued on or before this date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--status',
+            default='issued',
+            choices=[choice[0] for choice in Certificate.CERTIFICATE_STATUS_CHOICES],
+            help='Certificate status to select (default: issued)',
+        )
+        parser.add_argument(
+            '--bundle-size',
+            type=int,
+            help='Certificates per bundle file (default: CERTIFICATE_PRINT_BUNDLE_SIZE)',
+        )
+        parser.add_argument(
+            '--output-dir',
+            default='.',
+            help='Directory the bundle files are written to (default: current directory)',
+        )
+    
+    def handle(self, *args, **options):
+        filters = {
+            'district': options['district'],
+            'issued_from': self._parse_date(options['issued_from']),
+            'issued_to': self._parse_date(options['issued_to'], end_of_day=True),
+            'status': options['status'],
+        }
+        size = max(options['bundle_size'] or bundle_size(), 1)
+        queryset = print_queryset(**filters)
+        
+        total = queryset.count()
+        if not total:
+            self.stdout.write('No certificates match the filter')
+            return
+        
+        os.makedirs(options['output_dir'], exist_ok=True)
+        prefix = f"certificates_{(options['district'] or 'all').replace(' ', '_').lower()}_{timezone.localdate():%Y%m%d}"
+        parts = part_count(total, size)
+        self.stdout.write(f'Printing {total} certificates in {parts} bundle files')
+        
+        started = time.monotonic()
+        printed, missing = [], []
+        for number, rows in enumerate(iter_parts(queryset, size), start=1):
+            path = os.path.join(options['output_dir'], f'{prefix}_part{number:03d}.pdf')
+            with open(path, 'wb') as output:
+                _, part_printed, part_missing = write_bundle(rows, output)
+            printed.extend(part_printed)
+            missing.extend(part_missing)
+            self.stdout.write(f'{path}: {len(part_printed)} certificates')
+        
+        log_print(None, filters, printed, missing)
+        
+        for _, certificate_number in missing:
+            self.stderr.write(f'Certificate {certificate_number}: PDF file is missing from storage')
+        message = f'Printed {len(printed)} certificates in {time.monotonic() - started:.1f}s'
+        if missing:
+            self.stdout.write(self.style.WARNING(f'{message}, {len(missing)} missing'))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
+    
+    def _parse_date(self, value, end_of_day=False):
+        if not value:
+            return None
+        try:
+            date = timezone.make_aware(datetime.strptime(value, '%Y-%m-%d'))
+        except ValueError:
+            raise CommandError(f'Invalid date "{value}", expected YYYY-MM-DD')
+        return date.replace(hour=23, minute=59, second=59, microsecond=999999) if end_of_day else date
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from certificates.tasks import due_certificate_ids, process_certificate
+
+
+class Command(BaseCommand):
+    help = 'Render queued certificates, retry failed renders that are due and recover abandoned ones'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling the queue instead of exiting when it is empty',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=5,
+            help='Seconds to wait between polls when running with --loop (default: 5)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Maximum number of certificates to pick up per poll (default: 50)',
+        )
+    
+    def handle(self, *args, **options):
+        while True:
+            certificate_ids = due_certificate_ids(limit=options['batch_size'])
+            
+            results = {'issued': 0, 'queued': 0, 'failed': 0}
+            for certificate_id in certificate_ids:
+                result = process_certificate(certificate_id)
+                if result in results:
+                    results[result] += 1
+            
+            if certificate_ids:
+                self.stdout.write(
+                    f"Issued {results['issued']}, requeued {results['queued']}, failed {results['failed']}"
+                )
+            
+            if not options['loop']:
+                break
+            if not certificate_ids:
+                time.sleep(options['interval'])
+        
+        self.stdout.write(self.style.SUCCESS('Certificate queue processed'))
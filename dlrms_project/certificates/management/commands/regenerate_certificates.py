@@ -0,0 +1,233 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from certificates.models import Certificate, CertificateTemplate
+from certificates.regeneration import apply_results, init_worker, render_one
+
+
+class Command(BaseCommand):
+    help = 'Re-render issued certificate PDFs in parallel and update their document hashes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--type',
+            choices=[choice[0] for choice in Certificate.CERTIFICATE_TYPE_CHOICES],
+            help='Only regenerate certificates of this type',
+        )
+        parser.add_argument(
+            '--issued-from',
+            help='Only certificates issued on or after this date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--issued-to',
+            help='Only certificates issued on or before this date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--template',
+            type=int,
+            help='Only certificates rendered before the last change to this CertificateTemplate (id)',
+        )
+        parser.add_argument(
+            '--status',
+            default='issued',
+            help='Certificate status to select (default: issued)',
+        )
+        parser.add_argument(
+            '--ids',
+            nargs='+',
+            type=int,
+            help='Regenerate only these certificate ids',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of worker processes (default: number of CPUs)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Number of results saved per database transaction (default: 50)',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default='regenerate_certificates.checkpoint',
+            help='File recording the certificate id everything up to which is saved '
+                 '(default: regenerate_certificates.checkpoint)',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue after the certificate id recorded in the checkpoint file, retrying earlier failures',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Re-render certificates even when their render fingerprint is unchanged',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the certificates that would be regenerated',
+        )
+
+    def handle(self, *args, **options):
+        queryset = self._build_queryset(options)
+
+        if options['resume']:
+            last_id = self._read_checkpoint(options['checkpoint'])
+            if last_id is not None:
+                queryset = queryset.filter(id__gt=last_id)
+                self.stdout.write(f'Resuming after certificate {last_id}')
+
+        total = queryset.count()
+        if options['dry_run']:
+            self.stdout.write(f'{total} certificates would be regenerated')
+            return
+        if not total:
+            self.stdout.write('No certificates to regenerate')
+            return
+
+        workers = max(options['workers'], 1)
+        batch_size = max(options['batch_size'], 1)
+        self.stdout.write(f'Regenerating {total} certificates with {workers} workers')
+
+        started = time.monotonic()
+        processed = regenerated = skipped = 0
+        failures = []
+        # Once a certificate fails, the checkpoint stays before it so --resume retries it
+        self._checkpoint_blocked = False
+        # Results are saved in id order so the checkpoint never skips an unsaved certificate
+        completed = {}
+        pending_ids = []
+        batch = []
+
+        ids = queryset.order_by('id').values_list('id', flat=True).iterator(chunk_size=batch_size * 10)
+
+        # Spawned (not forked) workers, so no process inherits the parent's database connection
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker
+        )
+        with executor:
+            in_flight = set()
+            exhausted = False
+
+            while in_flight or not exhausted:
+                # Keep a bounded number of renders queued instead of submitting everything up front
+                while not exhausted and len(in_flight) < workers * 4:
+                    certificate_id = next(ids, None)
+                    if certificate_id is None:
+                        exhausted = True
+                        break
+                    pending_ids.append(certificate_id)
+                    in_flight.add(executor.submit(render_one, certificate_id, options['force']))
+
+                if not in_flight:
+                    break
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    completed[result['id']] = result
+
+                while pending_ids and pending_ids[0] in completed:
+                    result = completed.pop(pending_ids.pop(0))
+                    processed += 1
+                    if result.get('skipped'):
+                        skipped += 1
+                    batch.append(result)
+
+                while len(batch) >= batch_size:
+                    regenerated += self._save_batch(batch[:batch_size], options['checkpoint'], failures)
+                    batch = batch[batch_size:]
+                    self._report(processed - len(batch), total, started)
+
+        if batch:
+            regenerated += self._save_batch(batch, options['checkpoint'], failures)
+            self._report(processed, total, started)
+
+        elapsed = time.monotonic() - started
+        rate = processed / elapsed if elapsed else processed
+        for failure in failures:
+            self.stderr.write(f"Certificate {failure['id']}: {failure['error']}")
+
+        message = (
+            f'Regenerated {regenerated} certificates, skipped {skipped} unchanged, '
+            f'in {elapsed:.1f}s ({rate:.1f} certificates/sec)'
+        )
+        if failures:
+            self.stdout.write(self.style.WARNING(f'{message}, {len(failures)} failed (--resume retries them)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
+
+    def _build_queryset(self, options):
+        queryset = Certificate.objects.filter(status=options['status'])
+
+        if options['ids']:
+            queryset = queryset.filter(id__in=options['ids'])
+        if options['type']:
+            queryset = queryset.filter(certificate_type=options['type'])
+        if options['issued_from']:
+            queryset = queryset.filter(issue_date__gte=self._parse_date(options['issued_from']))
+        if options['issued_to']:
+            issued_to = self._parse_date(options['issued_to']).replace(hour=23, minute=59, second=59, microsecond=999999)
+            queryset = queryset.filter(issue_date__lte=issued_to)
+        if options['template']:
+            try:
+                template = CertificateTemplate.objects.get(pk=options['template'])
+            except CertificateTemplate.DoesNotExist:
+                raise CommandError(f"Certificate template {options['template']} does not exist")
+            queryset = queryset.filter(
+                certificate_type=template.certificate_type,
+                updated_at__lt=template.updated_at
+            )
+
+        return queryset
+
+    def _parse_date(self, value):
+        try:
+            return timezone.make_aware(datetime.strptime(value, '%Y-%m-%d'))
+        except ValueError:
+            raise CommandError(f'Invalid date "{value}", expected YYYY-MM-DD')
+
+    def _read_checkpoint(self, path):
+        try:
+            with open(path) as f:
+                return int(f.read().strip())
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            raise CommandError(f'Checkpoint file {path} is not readable')
+
+    def _save_batch(self, batch, checkpoint, failures):
+        # Render errors, and results discarded by apply_results(), carry an 'error'
+        saved = apply_results(batch)
+        failures.extend(result for result in batch if 'error' in result)
+
+        # Write the checkpoint only once the batch is committed, and never past a failed certificate
+        last_id = None
+        for result in batch:
+            if 'error' in result:
+                self._checkpoint_blocked = True
+            if self._checkpoint_blocked:
+                break
+            last_id = result['id']
+        if last_id is not None:
+            tmp_path = f'{checkpoint}.tmp'
+            with open(tmp_path, 'w') as f:
+                f.write(str(last_id))
+            os.replace(tmp_path, checkpoint)
+        return saved
+
+    def _report(self, processed, total, started):
+        elapsed = time.monotonic() - started
+        rate = processed / elapsed if elapsed else processed
+        self.stdout.write(f'{processed}/{total} processed ({rate:.1f} certificates/sec)')
@@ -0,0 +1,155 @@
+# certificates/merkle.py
+"""
+Merkle-tree anchoring of certificate document hashes.
+
+anchor_certificates() (run by the anchor_certificates command) builds a
+Merkle tree over the document hashes of every certificate issued in a period
+that is not anchored yet. It stores the root as a MerkleAnchor and gives each
+certificate its inclusion proof; Certificate.blockchain_hash holds the root,
+so publishing that one value (e.g. on a ledger) vouches for the whole batch.
+
+Checking a certificate then takes log2(n) hashes: recompute the leaf from
+the certificate id and the SHA-256 of its PDF, fold in the proof and compare
+with the anchored root (verify_proof()).
+
+Hashing scheme (domain-separated so a leaf can never pass for a node):
+
+    leaf = SHA-256(0x00 || certificate UUID (16 bytes) || document hash (32 bytes))
+    node = SHA-256(0x01 || left || right)
+
+A node without a sibling is carried up to the next level unchanged. Proofs
+are lists of sibling hashes prefixed with 'L' or 'R' for the side the
+sibling is on.
+"""
+import hashlib
+import uuid
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Certificate, MerkleAnchor
+
+BATCH_SIZE = 1000
+
+
+def is_uuid(value):
+    try:
+        uuid.UUID(str(value))
+    except ValueError:
+        return False
+    return True
+
+
+def leaf_hash(certificate_id, document_hash):
+    certificate_id = certificate_id if isinstance(certificate_id, uuid.UUID) else uuid.UUID(str(certificate_id))
+    return hashlib.sha256(b'\x00' + certificate_id.bytes + bytes.fromhex(document_hash)).digest()
+
+
+def _node_hash(left, right):
+    return hashlib.sha256(b'\x01' + left + right).digest()
+
+
+def build_levels(leaves):
+    """All levels of the tree, leaves first and the root last"""
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parents = [_node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])
+        levels.append(parents)
+    return levels
+
+
+def inclusion_proof(levels, index):
+    """Proof for the leaf at `index`: sibling hashes from the bottom up"""
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            side = 'L' if sibling < index else 'R'
+            proof.append(side + level[sibling].hex())
+        index //= 2
+    return proof
+
+
+def root_from_proof(leaf, proof):
+    node = leaf
+    for step in proof:
+        sibling = bytes.fromhex(step[1:])
+        node = _node_hash(sibling, node) if step[0] == 'L' else _node_hash(node, sibling)
+    return node
+
+
+def verify_proof(certificate_id, document_hash, proof, root):
+    """Whether the certificate with this PDF hash is included under `root` (hex)"""
+    try:
+        return root_from_proof(leaf_hash(certificate_id, document_hash), proof).hex() == root
+    except (ValueError, IndexError, TypeError, AttributeError):
+        return False
+
+
+def verify_certificate(certificate):
+    """Check a certificate's stored document hash against its anchor; None if not anchored"""
+    if not certificate.merkle_anchor_id:
+        return None
+    return verify_proof(
+        certificate.certificate_id,
+        certificate.document_hash,
+        certificate.merkle_proof,
+        certificate.merkle_anchor.root
+    )
+
+
+def anchor_certificates(period_start=None, period_end=None):
+    """
+    Anchor every issued, unanchored certificate issued in [period_start, period_end).
+
+    Without period_start every unanchored certificate issued before
+    period_end (default: now) is included, so certificates rendered late or
+    re-rendered since the last run are never left out. Returns the
+    MerkleAnchor, or None if there was nothing to anchor.
+    """
+    period_end = period_end or timezone.now()
+
+    pending = Certificate.objects.filter(
+        status__in=['issued', 'expired'],
+        merkle_anchor__isnull=True,
+        issue_date__lt=period_end,
+    ).exclude(document_hash='')
+    if period_start:
+        pending = pending.filter(issue_date__gte=period_start)
+
+    with transaction.atomic():
+        # Lock the batch so a concurrent re-render cannot change a hash between hashing and saving
+        rows = list(
+            pending.select_for_update().order_by('id').values_list('id', 'certificate_id', 'document_hash').iterator(
+                chunk_size=BATCH_SIZE
+            )
+        )
+        if not rows:
+            return None
+
+        levels = build_levels([leaf_hash(certificate_id, document_hash) for _, certificate_id, document_hash in rows])
+        root = levels[-1][0].hex()
+
+        anchor = MerkleAnchor.objects.create(
+            root=root,
+            leaf_count=len(rows),
+            period_start=period_start,
+            period_end=period_end,
+        )
+
+        for start in range(0, len(rows), BATCH_SIZE):
+            certificates = [
+                Certificate(
+                    id=pk,
+                    merkle_anchor=anchor,
+                    merkle_proof=inclusion_proof(levels, index),
+                    blockchain_hash=root,
+                )
+                for index, (pk, _, _) in enumerate(rows[start:start + BATCH_SIZE], start=start)
+            ]
+            Certificate.objects.bulk_update(certificates, ['merkle_anchor', 'merkle_proof', 'blockchain_hash'])
+
+    return anchor
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:17
+
+from django.db import migrations, models
+
+
+def mark_existing_issued(apps, schema_editor):
+    Certificate = apps.get_model('certificates', 'Certificate')
+    Certificate.objects.filter(status='issued').update(issuance_status='issued')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0002_remove_certificate_parcel'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certificate',
+            name='issuance_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='certificate',
+            name='issuance_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='certificate',
+            name='issuance_started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='certificate',
+            name='issuance_status',
+            field=models.CharField(blank=True, choices=[('queued', 'Queued'), ('rendering', 'Rendering'), ('issued', 'Issued'), ('failed', 'Failed')], default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='certificate',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='certificate',
+            index=models.Index(fields=['issuance_status', 'next_attempt_at'], name='cert_issuance_queue_idx'),
+        ),
+        migrations.RunPython(mark_existing_issued, migrations.RunPython.noop),
+    ]
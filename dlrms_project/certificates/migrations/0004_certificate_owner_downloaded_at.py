@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:25
+
+from django.db import migrations, models
+from django.db.models import Min, OuterRef, Subquery
+import django.utils.timezone
+
+
+def backfill_owner_downloaded_at(apps, schema_editor):
+    Certificate = apps.get_model('certificates', 'Certificate')
+    CertificateAuditLog = apps.get_model('certificates', 'CertificateAuditLog')
+    first_download = CertificateAuditLog.objects.filter(
+        certificate=OuterRef('pk'),
+        action='downloaded',
+        performed_by=OuterRef('owner')
+    ).values('certificate').annotate(first=Min('timestamp')).values('first')
+    Certificate.objects.update(owner_downloaded_at=Subquery(first_download))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0003_certificate_issuance_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certificate',
+            name='owner_downloaded_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='certificateauditlog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(backfill_owner_downloaded_at, migrations.RunPython.noop),
+    ]
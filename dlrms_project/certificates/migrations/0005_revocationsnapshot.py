@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0004_certificate_owner_downloaded_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevocationSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(unique=True)),
+                ('snapshot_file', models.FileField(upload_to='certificates/revocation/')),
+                ('sha256', models.CharField(max_length=64)),
+                ('entry_count', models.PositiveIntegerField(default=0)),
+                ('false_positive_rate', models.FloatField()),
+                ('size_bytes', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Revocation Snapshot',
+                'verbose_name_plural': 'Revocation Snapshots',
+                'ordering': ['-version'],
+            },
+        ),
+    ]
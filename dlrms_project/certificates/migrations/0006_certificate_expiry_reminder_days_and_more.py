@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0005_revocationsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certificate',
+            name='expiry_reminder_days',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='certificate',
+            index=models.Index(fields=['status', 'expiry_date'], name='cert_status_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:32
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Subquery
+
+
+def backfill_download_reminder_sent_at(apps, schema_editor):
+    # Reminders sent before the marker existed are recognised by their notification, as the command used to do
+    Certificate = apps.get_model('certificates', 'Certificate')
+    Notification = apps.get_model('notifications', 'Notification')
+    reminders = Notification.objects.filter(
+        recipient=OuterRef('owner'),
+        title__contains='Certificate Ready',
+        message__contains=OuterRef('certificate_number')
+    ).order_by('created_at')
+    Certificate.objects.filter(
+        Exists(reminders), status='issued', owner_downloaded_at__isnull=True
+    ).update(download_reminder_sent_at=Subquery(reminders.values('created_at')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0006_certificate_expiry_reminder_days_and_more'),
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certificate',
+            name='download_reminder_sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='certificate',
+            index=models.Index(condition=models.Q(('owner_downloaded_at__isnull', True)), fields=['status', 'download_reminder_sent_at'], name='cert_undownloaded_idx'),
+        ),
+        migrations.RunPython(backfill_download_reminder_sent_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0007_certificate_download_reminder_sent_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MerkleAnchor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('root', models.CharField(max_length=64, unique=True)),
+                ('leaf_count', models.PositiveIntegerField()),
+                ('period_start', models.DateTimeField(blank=True, null=True)),
+                ('period_end', models.DateTimeField()),
+                ('anchor_reference', models.CharField(blank=True, max_length=256)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Merkle Anchor',
+                'verbose_name_plural': 'Merkle Anchors',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='certificate',
+            name='merkle_proof',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='certificate',
+            name='merkle_anchor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='certificates', to='certificates.merkleanchor'),
+        ),
+    ]
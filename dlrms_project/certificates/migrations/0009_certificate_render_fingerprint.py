@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0008_merkle_anchoring'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certificate',
+            name='render_fingerprint',
+            field=models.CharField(blank=True, help_text='SHA-256 of the inputs the PDF was rendered from', max_length=64),
+        ),
+    ]
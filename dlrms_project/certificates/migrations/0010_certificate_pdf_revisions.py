@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:50
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def set_pdf_hash(apps, schema_editor):
+    # Until now the stored PDF was always exactly the rendered one
+    Certificate = apps.get_model('certificates', 'Certificate')
+    Certificate.objects.exclude(document_hash='').update(pdf_hash=F('document_hash'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0009_certificate_render_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certificate',
+            name='pdf_hash',
+            field=models.CharField(blank=True, help_text='SHA-256 of the stored PDF, including appended signatures', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='certificate',
+            name='pdf_revisions',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(set_pdf_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:14
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0010_certificate_pdf_revisions'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='certificate',
+            options={'ordering': ['-created_at'], 'permissions': [('bulk_verify_certificate', 'Can verify certificates in bulk')], 'verbose_name': 'Certificate', 'verbose_name_plural': 'Certificates'},
+        ),
+    ]
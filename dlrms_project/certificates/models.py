@@ -21,6 +21,13 @@ class Certificate(models.Model):
         ('expired', 'Expired'),
     ]
     
+    ISSUANCE_STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('rendering', 'Rendering'),
+        ('issued', 'Issued'),
+        ('failed', 'Failed'),
+    ]
+    
     # Certificate Information
     certificate_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     certificate_number = models.CharField(max_length=50, unique=True)
@@ -41,11 +48,33 @@ class Certificate(models.Model):
     
     # Security
     document_hash = models.CharField(max_length=256, blank=True, help_text="SHA-256 hash of the PDF")
+    # Signatures added after issuance are appended to the PDF (see certificates/incremental.py)
+    pdf_hash = models.CharField(max_length=64, blank=True, help_text="SHA-256 of the stored PDF, including appended signatures")
+    pdf_revisions = models.JSONField(default=list, blank=True)
+    render_fingerprint = models.CharField(max_length=64, blank=True, help_text="SHA-256 of the inputs the PDF was rendered from")
     blockchain_hash = models.CharField(max_length=256, blank=True, null=True)
+    # Merkle batch anchoring (see certificates/merkle.py); blockchain_hash holds the anchor root
+    merkle_anchor = models.ForeignKey('MerkleAnchor', on_delete=models.SET_NULL, null=True, blank=True, related_name='certificates')
+    merkle_proof = models.JSONField(default=list, blank=True)
     
     # Signatures
     signatures = models.ManyToManyField('signatures.DigitalSignature', blank=True, related_name='certificates')
     
+    # Background issuance (see certificates/tasks.py)
+    issuance_status = models.CharField(max_length=20, choices=ISSUANCE_STATUS_CHOICES, blank=True, default='')
+    issuance_attempts = models.PositiveSmallIntegerField(default=0)
+    issuance_error = models.TextField(blank=True)
+    issuance_started_at = models.DateTimeField(null=True, blank=True)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    
+    # Tightest renewal reminder horizon (days) already sent, see certificates/expiry.py
+    expiry_reminder_days = models.PositiveSmallIntegerField(null=True, blank=True)
+    
+    # First download by the owner, maintained by DownloadCertificateView
+    owner_downloaded_at = models.DateTimeField(null=True, blank=True)
+    # "Ready for download" reminder sent by notify_certificate_owners --notify-undownloaded
+    download_reminder_sent_at = models.DateTimeField(null=True, blank=True)
+    
     # Metadata
     issued_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='issued_certificates')
     created_at = models.DateTimeField(auto_now_add=True)
@@ -96,6 +125,13 @@ class Certificate(models.Model):
             return False
         return True
     
+    @property
+    def issued_hashes(self):
+        """SHA-256 of every revision of the issued PDF: as rendered, and after each appended signature"""
+        hashes = {entry['sha256'] for entry in self.pdf_revisions}
+        hashes.update(value for value in (self.document_hash, self.pdf_hash) if value)
+        return hashes
+    
     @property
     def verification_url(self):
         """Get the verification URL for this certificate"""
@@ -108,6 +144,19 @@ class Certificate(models.Model):
         verbose_name = "Certificate"
         verbose_name_plural = "Certificates"
         ordering = ['-created_at']
+        permissions = [
+            # Granted to accounts of institutional verifiers (banks, courts) for the bulk verification API
+            ('bulk_verify_certificate', 'Can verify certificates in bulk'),
+        ]
+        indexes = [
+            models.Index(fields=['issuance_status', 'next_attempt_at'], name='cert_issuance_queue_idx'),
+            models.Index(fields=['status', 'expiry_date'], name='cert_status_expiry_idx'),
+            models.Index(
+                fields=['status', 'download_reminder_sent_at'],
+                name='cert_undownloaded_idx',
+                condition=models.Q(owner_downloaded_at__isnull=True)
+            ),
+        ]
 
     def save(self, *args, **kwargs):
         # Check if this is a status change to 'issued'
@@ -188,7 +237,8 @@ class CertificateAuditLog(models.Model):
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(blank=True)
     details = models.JSONField(default=dict, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # A default rather than auto_now_add so buffered entries keep the time they were logged
+    timestamp = models.DateTimeField(default=timezone.now)
     
     def __str__(self):
         return f"{self.certificate.certificate_number} - {self.action} at {self.timestamp}"
@@ -196,4 +246,43 @@ class CertificateAuditLog(models.Model):
     class Meta:
         verbose_name = "Certificate Audit Log"
         verbose_name_plural = "Certificate Audit Logs"
-        ordering = ['-timestamp']
\ No newline at end of file
+        ordering = ['-timestamp']
+
+class RevocationSnapshot(models.Model):
+    """Versioned Bloom filter of revoked and expired certificate ids (see certificates/revocation.py)"""
+    
+    version = models.PositiveIntegerField(unique=True)
+    snapshot_file = models.FileField(upload_to='certificates/revocation/')
+    sha256 = models.CharField(max_length=64)
+    entry_count = models.PositiveIntegerField(default=0)
+    false_positive_rate = models.FloatField()
+    size_bytes = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Revocation snapshot v{self.version} ({self.entry_count} certificates)"
+    
+    class Meta:
+        verbose_name = "Revocation Snapshot"
+        verbose_name_plural = "Revocation Snapshots"
+        ordering = ['-version']
+
+
+class MerkleAnchor(models.Model):
+    """Merkle root over the document hashes of a batch of certificates (see certificates/merkle.py)"""
+    
+    root = models.CharField(max_length=64, unique=True)
+    leaf_count = models.PositiveIntegerField()
+    period_start = models.DateTimeField(null=True, blank=True)
+    period_end = models.DateTimeField()
+    # Where the root was published (e.g. a ledger transaction id), once it is
+    anchor_reference = models.CharField(max_length=256, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Anchor {self.root[:16]} ({self.leaf_count} certificates)"
+    
+    class Meta:
+        verbose_name = "Merkle Anchor"
+        verbose_name_plural = "Merkle Anchors"
+        ordering = ['-created_at']
@@ -0,0 +1,217 @@
+# certificates/offline.py
+"""
+Signed QR payloads for offline certificate verification.
+
+The QR code on a certificate carries the verification URL with a compact
+token appended (?t=...). Scanning it with any phone still opens the
+verification page, while a verifier app (or the /certificates/verify/offline/
+endpoint) can check the token on its own: it is signed with an Ed25519 key,
+so only the public key is needed, not our database.
+
+Token layout (base64url, no padding):
+
+    version     1 byte
+    key id      4 bytes   first bytes of SHA-256 of the raw public key
+    certificate 16 bytes  certificate_id (UUID)
+    type        1 byte    see TYPE_CODES
+    expiry      8 bytes   unix time, 0 for lifetime certificates
+    owner hash  16 bytes  truncated SHA-256 of the normalised owner name
+    hash length 1 byte    0 or 32
+    doc hash    0/32 B    SHA-256 of the issued PDF
+    number      rest      certificate_number, UTF-8
+    signature   64 bytes  Ed25519 over everything above
+
+The QR printed inside the PDF cannot contain the hash of the PDF it is part
+of, so that token has no document hash. The standalone QR image saved on the
+certificate (Certificate.qr_code) is made after rendering and includes it.
+
+decode_token() and owner_name_matches() only need `cryptography` and the
+standard library, so they can be copied into verifier tools as-is.
+"""
+import base64
+import binascii
+import hashlib
+import struct
+import uuid
+from datetime import datetime, timezone as dt_timezone
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+
+TOKEN_VERSION = 1
+TYPE_CODES = {
+    'property_contract': 1,
+    'parcel_certificate': 2,
+}
+SIGNATURE_LENGTH = 64
+_HEADER = struct.Struct('>B4s16sBq16sB')
+
+
+class InvalidToken(ValueError):
+    """The token is malformed, signed by an unknown key or has been altered"""
+
+
+def owner_name_hash(name):
+    """Truncated SHA-256 of a name, ignoring case and extra whitespace"""
+    normalised = ' '.join(name.lower().split())
+    return hashlib.sha256(normalised.encode('utf-8')).digest()[:16]
+
+
+def owner_name_matches(payload, name):
+    """Whether `name` (e.g. read from an ID card) is the owner named in a decoded token"""
+    return payload['owner_hash'] == owner_name_hash(name).hex()
+
+
+def key_id(public_key):
+    raw = public_key.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+    return hashlib.sha256(raw).digest()[:4]
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text):
+    try:
+        return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+    except (binascii.Error, ValueError):
+        raise InvalidToken('Token is not valid base64')
+
+
+def encode_token(private_key, certificate_id, certificate_number, certificate_type,
+                 owner_name, expiry_date=None, document_hash=''):
+    """Build and sign a token from plain certificate values"""
+    doc_hash = bytes.fromhex(document_hash) if document_hash else b''
+    expiry = int(expiry_date.timestamp()) if expiry_date else 0
+
+    body = _HEADER.pack(
+        TOKEN_VERSION,
+        key_id(private_key.public_key()),
+        uuid.UUID(str(certificate_id)).bytes,
+        TYPE_CODES.get(certificate_type, 0),
+        expiry,
+        owner_name_hash(owner_name),
+        len(doc_hash),
+    ) + doc_hash + certificate_number.encode('utf-8')
+
+    return _b64encode(body + private_key.sign(body))
+
+
+def decode_token(token, public_keys):
+    """
+    Verify a token and return its contents.
+
+    `public_keys` is an iterable of Ed25519 public keys that are trusted
+    (current and previous signing keys). Raises InvalidToken if the token is
+    malformed, signed by none of them, or altered. Expiry is reported, not
+    enforced: check payload['expired'].
+    """
+    data = _b64decode(token)
+    if len(data) < _HEADER.size + SIGNATURE_LENGTH:
+        raise InvalidToken('Token is too short')
+
+    body, signature = data[:-SIGNATURE_LENGTH], data[-SIGNATURE_LENGTH:]
+    version, kid, certificate_id, type_code, expiry, owner_hash, hash_length = _HEADER.unpack_from(body)
+    if version != TOKEN_VERSION:
+        raise InvalidToken(f'Unsupported token version {version}')
+
+    public_key = next((key for key in public_keys if key_id(key) == kid), None)
+    if public_key is None:
+        raise InvalidToken('Token was signed with an unknown key')
+    try:
+        public_key.verify(signature, body)
+    except InvalidSignature:
+        raise InvalidToken('Token signature is invalid')
+
+    doc_hash = body[_HEADER.size:_HEADER.size + hash_length]
+    number = body[_HEADER.size + hash_length:]
+    if len(doc_hash) != hash_length:
+        raise InvalidToken('Token is truncated')
+
+    expiry_date = datetime.fromtimestamp(expiry, tz=dt_timezone.utc) if expiry else None
+    type_names = {code: name for name, code in TYPE_CODES.items()}
+    return {
+        'certificate_id': str(uuid.UUID(bytes=certificate_id)),
+        'certificate_number': number.decode('utf-8'),
+        'certificate_type': type_names.get(type_code, ''),
+        'owner_hash': owner_hash.hex(),
+        'expiry_date': expiry_date,
+        'expired': bool(expiry_date and expiry_date < datetime.now(dt_timezone.utc)),
+        'document_hash': doc_hash.hex(),
+        'key_id': kid.hex(),
+    }
+
+
+# Server side: key loading and certificate helpers (these need Django)
+
+_private_key = None
+
+
+def signing_key():
+    """
+    The Ed25519 key certificates are signed with.
+
+    Read from CERTIFICATE_QR_SIGNING_KEY (PEM, e.g. from the environment).
+    With DEBUG on, a key derived from SECRET_KEY is used when it is unset, so
+    development setups work unconfigured. Otherwise an unset key raises
+    ImproperlyConfigured: a derived key is only as secret as SECRET_KEY
+    (whose default is public), and rotating SECRET_KEY would invalidate
+    every printed QR code.
+    """
+    global _private_key
+    if _private_key is None:
+        from django.conf import settings
+        from django.core.exceptions import ImproperlyConfigured
+
+        pem = getattr(settings, 'CERTIFICATE_QR_SIGNING_KEY', '')
+        if pem:
+            # Environment variables often carry the PEM with escaped newlines
+            pem = pem.replace('\\n', '\n')
+            _private_key = serialization.load_pem_private_key(pem.encode(), password=None)
+        elif settings.DEBUG:
+            seed = hashlib.sha256(f'certificate-qr-signing:{settings.SECRET_KEY}'.encode()).digest()
+            _private_key = Ed25519PrivateKey.from_private_bytes(seed)
+        else:
+            raise ImproperlyConfigured(
+                'CERTIFICATE_QR_SIGNING_KEY must be set when DEBUG is off '
+                '(an Ed25519 private key in PEM, e.g. from "openssl genpkey -algorithm ed25519")'
+            )
+    return _private_key
+
+
+def trusted_public_keys():
+    """The current public key plus retired ones still accepted (CERTIFICATE_QR_TRUSTED_PUBLIC_KEYS)"""
+    from django.conf import settings
+
+    keys = [signing_key().public_key()]
+    for pem in getattr(settings, 'CERTIFICATE_QR_TRUSTED_PUBLIC_KEYS', []):
+        key = serialization.load_pem_public_key(pem.encode())
+        if isinstance(key, Ed25519PublicKey):
+            keys.append(key)
+    return keys
+
+
+def public_key_pem(public_key=None):
+    public_key = public_key or signing_key().public_key()
+    return public_key.public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode('ascii')
+
+
+def certificate_token(certificate, include_hash=False):
+    """Signed token for a certificate; with include_hash, bound to its issued PDF"""
+    return encode_token(
+        signing_key(),
+        certificate.certificate_id,
+        certificate.certificate_number,
+        certificate.certificate_type,
+        certificate.owner.get_full_name(),
+        certificate.expiry_date,
+        certificate.document_hash if include_hash else '',
+    )
+
+
+def qr_data(certificate, include_hash=False):
+    """What the certificate QR code encodes: the verification URL carrying the signed token"""
+    return f'{certificate.verification_url}?t={certificate_token(certificate, include_hash)}'
@@ -0,0 +1,117 @@
+# certificates/printing.py
+"""
+Print bundles: issued certificate PDFs merged into print-ready files.
+
+District offices print certificates in batches. print_queryset() selects the
+certificates for a district, issue date range and status in a stable order,
+and write_bundle() merges their stored PDFs into one file per part of
+`bundle_size` certificates, so a batch of any size is printed as a series of
+bounded files. Only one part is held in memory at a time; the output goes to
+a spooled temporary file that moves to disk once it grows large.
+
+All certificates share the same background artwork (seals, logo), so
+identical objects are merged before writing (compress_identical_objects(),
+new in pypdf 5.0) and a part is barely larger than a single certificate
+plus its variable text.
+"""
+import tempfile
+
+from django.conf import settings
+from pypdf import PdfReader, PdfWriter
+
+from core.models import AuditLog
+from .models import Certificate
+
+SPOOL_MAX_MEMORY = 16 * 1024 * 1024
+
+
+def bundle_size():
+    return getattr(settings, 'CERTIFICATE_PRINT_BUNDLE_SIZE', 50)
+
+
+def print_queryset(district=None, issued_from=None, issued_to=None, status='issued'):
+    """Certificates with a stored PDF matching the filter, in print order"""
+    queryset = Certificate.objects.filter(status=status).exclude(pdf_file='').exclude(pdf_file__isnull=True)
+    if district:
+        queryset = queryset.filter(application__parcel__district__iexact=district)
+    if issued_from:
+        queryset = queryset.filter(issue_date__gte=issued_from)
+    if issued_to:
+        queryset = queryset.filter(issue_date__lte=issued_to)
+    return queryset.order_by('application__parcel__district', 'certificate_number', 'id')
+
+
+def part_count(total, size=None):
+    size = size or bundle_size()
+    return (total + size - 1) // size
+
+
+def write_bundle(certificates, output=None):
+    """
+    Merge the PDFs of `certificates` into one file.
+
+    Writes to `output` (a binary file object) or to a new spooled temporary
+    file, which is returned rewound. Returns (file, printed, missing) where
+    printed and missing are lists of (id, certificate_number).
+    """
+    output = output or tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    writer = PdfWriter()
+    printed, missing = [], []
+
+    for pk, number, pdf_name in certificates:
+        try:
+            with Certificate.pdf_file.field.storage.open(pdf_name, 'rb') as f:
+                for page in PdfReader(f).pages:
+                    writer.add_page(page)
+        except (FileNotFoundError, OSError):
+            missing.append((pk, number))
+            continue
+        printed.append((pk, number))
+
+    if printed:
+        # Two passes: images only become identical once their soft masks are merged
+        writer.compress_identical_objects()
+        writer.compress_identical_objects()
+        writer.add_metadata({'/Title': 'Certificate print bundle', '/Producer': 'DLRMS'})
+        writer.write(output)
+    output.seek(0)
+    return output, printed, missing
+
+
+def bundle_part(queryset, part, size=None):
+    """Rows (id, certificate_number, pdf_file) of part `part` (1-based) of a bundle"""
+    size = size or bundle_size()
+    start = (part - 1) * size
+    return list(queryset.values_list('id', 'certificate_number', 'pdf_file')[start:start + size])
+
+
+def iter_parts(queryset, size=None):
+    """All parts of a bundle, streaming the rows instead of paging with OFFSET"""
+    size = size or bundle_size()
+    part = []
+    for row in queryset.values_list('id', 'certificate_number', 'pdf_file').iterator(chunk_size=size):
+        part.append(row)
+        if len(part) == size:
+            yield part
+            part = []
+    if part:
+        yield part
+
+
+def log_print(user, filters, printed, missing, part=None, parts=None, **kwargs):
+    """One audit entry for a whole print run (or one part of it)"""
+    description = f'Printed {len(printed)} certificates in a print bundle'
+    if part:
+        description += f' (part {part} of {parts})'
+    return AuditLog.log_action(
+        user,
+        'download',
+        description,
+        object_type='Certificate',
+        new_values={
+            'filters': {key: str(value) for key, value in filters.items() if value},
+            'certificates': [number for _, number in printed],
+            'missing': [number for _, number in missing],
+        },
+        **kwargs
+    )
@@ -0,0 +1,188 @@
+# certificates/regeneration.py
+"""
+Re-rendering of already issued certificates, used by the
+regenerate_certificates management command.
+
+render_one() runs inside worker processes: it renders a certificate, writes
+the PDF and its standalone QR image to storage under new names and returns
+the new hash. Signatures appended to the old PDF after issuance are appended
+to the new one again. Certificates whose render fingerprint is unchanged are
+skipped: rendering is deterministic, so their PDF would come out byte for
+byte the same.
+apply_results() runs in the parent process and records a whole batch of
+results with bulk updates, switching the certificates to the new files. The
+old files are deleted once that commits; if it does not, the new ones are.
+A certificate whose stored PDF changed while it was being rendered (a
+signature was appended) keeps its files and is reported as failed.
+"""
+import django
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+
+def init_worker():
+    """Process pool initializer: set Django up in a freshly spawned worker"""
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+def render_one(certificate_id, force=False):
+    """Render one certificate and store its PDF; returns a result dict for apply_results()"""
+    from .images import qr_png
+    from .models import Certificate
+    from .offline import qr_data
+    from .tasks import certificate_signatures, render_fingerprint, render_issued_pdf
+
+    created = []
+    try:
+        certificate = Certificate.objects.select_related('application', 'owner').get(pk=certificate_id)
+        signature, appended = certificate_signatures(certificate)
+        fingerprint = render_fingerprint(certificate, signature)
+        if (not force and fingerprint == certificate.render_fingerprint
+                and certificate.pdf_file and certificate.pdf_file.storage.exists(certificate.pdf_file.name)):
+            return {'id': certificate_id, 'skipped': True}
+
+        pdf_content, document_hash, revisions = render_issued_pdf(certificate, signature, appended)
+
+        # New names, so the current files stay in place until apply_results() commits the switch
+        pdf_name = certificate.pdf_file.field.generate_filename(
+            certificate, f'certificate_{certificate.certificate_number}.pdf'
+        )
+        stored_name = certificate.pdf_file.storage.save(pdf_name, ContentFile(pdf_content))
+        created.append((certificate.pdf_file.storage, stored_name))
+
+        # The standalone QR token binds the PDF hash, so it changes with the PDF
+        certificate.document_hash, previous_hash = document_hash, certificate.document_hash
+        qr_name = certificate.qr_code.field.generate_filename(
+            certificate, f'certificate_{certificate.certificate_number}.png'
+        )
+        qr_name = certificate.qr_code.storage.save(qr_name, ContentFile(qr_png(qr_data(certificate, include_hash=True))))
+        created.append((certificate.qr_code.storage, qr_name))
+
+        return {
+            'id': certificate_id,
+            'pdf_file': stored_name,
+            'qr_code': qr_name,
+            'document_hash': document_hash,
+            'pdf_hash': revisions[-1]['sha256'],
+            'pdf_revisions': revisions,
+            'render_fingerprint': fingerprint,
+            'previous_hash': previous_hash,
+            'previous_pdf_file': certificate.pdf_file.name,
+            'previous_qr_code': certificate.qr_code.name,
+            'previous_pdf_hash': certificate.pdf_hash,
+            'signature_ids': [entry['signature'] for entry in revisions if entry['signature']],
+        }
+    except Exception as e:
+        _delete_files(created)
+        return {'id': certificate_id, 'error': str(e)}
+
+
+def _delete_files(files):
+    for storage, name in files:
+        try:
+            storage.delete(name)
+        except Exception:
+            pass
+
+
+def _new_files(result, certificate):
+    return [(certificate.pdf_file.storage, result['pdf_file']), (certificate.qr_code.storage, result['qr_code'])]
+
+
+def _old_files(result, certificate):
+    files = [(certificate.pdf_file.storage, result['previous_pdf_file']), (certificate.qr_code.storage, result['previous_qr_code'])]
+    # A missing old file frees its name, which the new file may then have been saved under
+    return [(storage, name) for storage, name in files if name and name not in (result['pdf_file'], result['qr_code'])]
+
+
+def apply_results(results):
+    """
+    Persist a batch of successful render results in one transaction.
+
+    Results for certificates whose stored PDF changed since they were
+    rendered are discarded and get an 'error'. Returns the number saved.
+    """
+    from signatures import pki
+    from signatures.models import DigitalSignature
+    from .models import Certificate
+    from .verification import invalidate_verification
+
+    succeeded = [result for result in results if 'error' not in result and not result.get('skipped')]
+    if not succeeded:
+        return 0
+
+    now = timezone.now()
+    new_files = []
+    try:
+        with transaction.atomic():
+            # Locked like add_signature_revision() does, so no signature is appended while the files are switched
+            certificates = Certificate.objects.select_for_update().in_bulk([result['id'] for result in succeeded])
+            for result in succeeded:
+                new_files += _new_files(result, certificates[result['id']])
+
+            conflicts = []
+            for result in succeeded:
+                certificate = certificates[result['id']]
+                if (certificate.pdf_file.name != result['previous_pdf_file']
+                        or certificate.pdf_hash != result['previous_pdf_hash']):
+                    result['error'] = 'The certificate PDF changed while it was being rendered'
+                    conflicts.append(result)
+            for result in conflicts:
+                _delete_files(_new_files(result, certificates.pop(result['id'])))
+                succeeded.remove(result)
+            if not succeeded:
+                return 0
+
+            old_files = []
+            for result in succeeded:
+                certificate = certificates[result['id']]
+                old_files += _old_files(result, certificate)
+                certificate.pdf_file.name = result['pdf_file']
+                certificate.qr_code.name = result['qr_code']
+                if certificate.document_hash != result['document_hash']:
+                    # The anchored proof covers the old PDF; the next anchoring run picks the new one up
+                    certificate.merkle_anchor = None
+                    certificate.merkle_proof = []
+                    certificate.blockchain_hash = None
+                certificate.document_hash = result['document_hash']
+                certificate.pdf_hash = result['pdf_hash']
+                certificate.pdf_revisions = result['pdf_revisions']
+                certificate.render_fingerprint = result['render_fingerprint']
+                # bulk_update() does not apply auto_now
+                certificate.updated_at = now
+            Certificate.objects.bulk_update(
+                certificates.values(),
+                ['pdf_file', 'qr_code', 'document_hash', 'pdf_hash', 'pdf_revisions', 'render_fingerprint',
+                 'merkle_anchor', 'merkle_proof', 'blockchain_hash', 'updated_at']
+            )
+
+            # The signatures in the PDF refer to the document by hash; keep them pointing at (and signed over) the new PDF
+            signatures = DigitalSignature.objects.select_related('signer').in_bulk(
+                [signature_id for result in succeeded for signature_id in result['signature_ids']]
+            )
+            changed = []
+            for result in succeeded:
+                for signature_id in result['signature_ids']:
+                    signature = signatures.get(signature_id)
+                    if (signature and signature.document_hash in ('', result['previous_hash'])
+                            and signature.document_hash != result['document_hash']):
+                        signature.document_hash = result['document_hash']
+                        signature.updated_at = now
+                        changed.append(signature)
+            if changed:
+                pki.sign_many(changed)
+                DigitalSignature.objects.bulk_update(changed, ['document_hash', 'updated_at'] + pki.SIGNED_FIELDS)
+
+            updated = list(certificates.values())
+            transaction.on_commit(lambda: _delete_files(old_files))
+            # bulk_update() sends no post_save, so the cached verification snapshots are dropped here
+            transaction.on_commit(lambda: [invalidate_verification(certificate) for certificate in updated])
+    except Exception:
+        _delete_files(new_files)
+        raise
+
+    return len(succeeded)
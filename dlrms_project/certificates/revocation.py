@@ -0,0 +1,197 @@
+# certificates/revocation.py
+"""
+Revocation snapshots: a compact, versioned Bloom filter of every certificate
+that is revoked or expired.
+
+build_snapshot() (run periodically by the build_revocation_snapshot command)
+streams the ids of revoked/expired certificates into a Bloom filter and
+stores it as a RevocationSnapshot. The file is published at
+/certificates/revocation/snapshot/ with an ETag, so bulk verifiers download
+it only when it changes, and it is loaded in process by `checker` for our own
+verification paths.
+
+A Bloom filter answers "definitely not revoked" with certainty and
+"possibly revoked" with a small false-positive rate (the rate the snapshot
+was built for). Only the second answer needs a database lookup. Revocations
+made after a snapshot was built are not in it, so the snapshot age bounds
+how stale a "not revoked" answer can be.
+
+File layout: the 24-byte header below followed by the bit array.
+
+    magic       4 bytes  b'DLRB'
+    version     4 bytes  snapshot version
+    bits        8 bytes  size of the bit array (m)
+    hashes      4 bytes  number of hash functions (k)
+    entries     4 bytes  number of certificate ids added
+
+Bit positions for an id are (h1 + i*h2) mod m for i in 0..k-1, where h1 and
+h2 are the first two big-endian 64-bit words of SHA-256 over the 16 bytes of
+the certificate UUID.
+"""
+import hashlib
+import math
+import struct
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Certificate, RevocationSnapshot
+
+MAGIC = b'DLRB'
+_HEADER = struct.Struct('>4sIQII')
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over certificate UUIDs"""
+
+    def __init__(self, num_bits, num_hashes, bits=None, count=0):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = bits if bits is not None else bytearray((num_bits + 7) // 8)
+        self.count = count
+
+    @classmethod
+    def for_capacity(cls, capacity, false_positive_rate):
+        """Size a filter for `capacity` entries at the given false-positive rate"""
+        # A floor on the size keeps tiny filters (few revocations) from degenerating
+        capacity = max(capacity, 64)
+        num_bits = int(math.ceil(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        num_hashes = max(int(round(num_bits / capacity * math.log(2))), 1)
+        return cls(num_bits, num_hashes)
+
+    def _positions(self, certificate_id):
+        if not isinstance(certificate_id, uuid.UUID):
+            certificate_id = uuid.UUID(str(certificate_id))
+        h1, h2 = struct.unpack_from('>QQ', hashlib.sha256(certificate_id.bytes).digest())
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, certificate_id):
+        for position in self._positions(certificate_id):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, certificate_id):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(certificate_id))
+
+    def to_bytes(self, version=0):
+        return _HEADER.pack(MAGIC, version, self.num_bits, self.num_hashes, self.count) + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Returns (version, filter)"""
+        if len(data) < _HEADER.size:
+            raise ValueError('Revocation snapshot is truncated')
+        magic, version, num_bits, num_hashes, count = _HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError('Not a revocation snapshot')
+        bits = bytearray(data[_HEADER.size:])
+        if len(bits) != (num_bits + 7) // 8:
+            raise ValueError('Revocation snapshot is truncated')
+        return version, cls(num_bits, num_hashes, bits, count)
+
+
+def revoked_certificates():
+    """Certificates that must not verify as valid: revoked, or expired by status or date"""
+    return Certificate.objects.filter(
+        Q(status__in=['revoked', 'expired']) | Q(expiry_date__lt=timezone.now())
+    )
+
+
+def build_snapshot(false_positive_rate=None, keep=None):
+    """
+    Build a new snapshot from the database.
+
+    Returns (snapshot, created). When the revoked set has not changed since the
+    latest snapshot, that snapshot is returned and no new version is written.
+    """
+    if false_positive_rate is None:
+        false_positive_rate = getattr(settings, 'CERTIFICATE_REVOCATION_FALSE_POSITIVE_RATE', 0.001)
+    if keep is None:
+        keep = getattr(settings, 'CERTIFICATE_REVOCATION_SNAPSHOTS_KEPT', 5)
+
+    queryset = revoked_certificates()
+    bloom = BloomFilter.for_capacity(queryset.count(), false_positive_rate)
+    for certificate_id in queryset.values_list('certificate_id', flat=True).iterator(chunk_size=10000):
+        bloom.add(certificate_id)
+
+    # The content hash ignores the version so an unchanged set is recognised
+    sha256 = hashlib.sha256(bloom.to_bytes()).hexdigest()
+    latest = RevocationSnapshot.objects.first()
+    if latest and latest.sha256 == sha256:
+        return latest, False
+
+    with transaction.atomic():
+        latest = RevocationSnapshot.objects.select_for_update().first()
+        version = latest.version + 1 if latest else 1
+        data = bloom.to_bytes(version)
+
+        snapshot = RevocationSnapshot(
+            version=version,
+            sha256=sha256,
+            entry_count=bloom.count,
+            false_positive_rate=false_positive_rate,
+            size_bytes=len(data),
+        )
+        snapshot.snapshot_file.save(f'revocation_v{version}.bloom', ContentFile(data), save=False)
+        snapshot.save()
+
+    for old in RevocationSnapshot.objects.all()[keep:]:
+        old.snapshot_file.delete(save=False)
+        old.delete()
+
+    return snapshot, True
+
+
+class RevocationChecker:
+    """
+    In-process view of the latest snapshot.
+
+    The snapshot is loaded once and the latest version is re-checked at most
+    every CERTIFICATE_REVOCATION_REFRESH_SECONDS, so checks are in-memory
+    lookups.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filter = None
+        self._snapshot = None
+        self._checked_at = None
+
+    def _refresh(self):
+        interval = getattr(settings, 'CERTIFICATE_REVOCATION_REFRESH_SECONDS', 60)
+        if self._checked_at is not None and time.monotonic() - self._checked_at < interval:
+            return
+
+        with self._lock:
+            if self._checked_at is not None and time.monotonic() - self._checked_at < interval:
+                return
+            latest = RevocationSnapshot.objects.first()
+            if latest and (self._snapshot is None or latest.version != self._snapshot.version):
+                with latest.snapshot_file.open('rb') as f:
+                    _, self._filter = BloomFilter.from_bytes(f.read())
+                self._snapshot = latest
+            self._checked_at = time.monotonic()
+
+    @property
+    def snapshot(self):
+        self._refresh()
+        return self._snapshot
+
+    def possibly_revoked(self, certificate_id):
+        """
+        False when the certificate is certainly not in the snapshot, True when
+        it may be (confirm with the database), None when no snapshot exists.
+        """
+        self._refresh()
+        if self._filter is None:
+            return None
+        return certificate_id in self._filter
+
+
+checker = RevocationChecker()
@@ -1,65 +1,91 @@
-from django.db.models.signals import post_save
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.dispatch import receiver
 from django.utils import timezone
-from django.core.files.base import ContentFile
 
 from applications.models import ParcelApplication
+from signatures.models import DigitalSignature
 from .models import Certificate, CertificateAuditLog
-from .generator import CertificateGenerator
+from .tasks import enqueue_issuance
+from .verification import invalidate_verification
 
 
 @receiver(post_save, sender=ParcelApplication)
 def generate_certificate_on_approval(sender, instance, **kwargs):
-    """Automatically generate certificate when application is approved"""
+    """
+    Queue certificate issuance when an application is approved.
+
+    Off by default: officers issue certificates from GenerateCertificateView,
+    signing them before they are rendered. CERTIFICATE_AUTO_ISSUE_ON_APPROVAL
+    issues an unsigned certificate on approval instead.
+    """
+    if not getattr(settings, 'CERTIFICATE_AUTO_ISSUE_ON_APPROVAL', False):
+        return
     
     # Check if status changed to approved
-    if instance.status == 'approved' and not hasattr(instance, 'certificate'):
+    if instance.status == 'approved' and not Certificate.objects.filter(application=instance).exists():
         try:
-            # Create certificate record
-            certificate = Certificate.objects.create(
+            # Create certificate record; rendering happens after the approval commits
+            certificate = Certificate(
                 application=instance,
-                parcel=instance.parcel,
                 owner=instance.applicant,
                 certificate_type=instance.application_type,
                 issued_by=instance.reviewed_by,
-                issue_date=timezone.now()
+                issue_date=timezone.now(),
+                issuance_status='queued'
             )
-            
-            # Calculate expiry date
             certificate.calculate_expiry_date()
+            certificate.save()
+            
+            # Create audit log
+            CertificateAuditLog.objects.create(
+                certificate=certificate,
+                action='created',
+                performed_by=instance.reviewed_by,
+                details={
+                    'auto_generated': True,
+                    'trigger': 'application_approval'
+                }
+            )
             
-            # Generate PDF
-            generator = CertificateGenerator()
-            try:
-                pdf_content, document_hash = generator.generate_certificate(certificate)
-                
-                # Save PDF file
-                certificate.pdf_file.save(
-                    f'certificate_{certificate.certificate_number}.pdf',
-                    ContentFile(pdf_content)
-                )
-                
-                # Save document hash
-                certificate.document_hash = document_hash
-                certificate.status = 'issued'
-                certificate.save()
-                
-                # Create audit log
-                CertificateAuditLog.objects.create(
-                    certificate=certificate,
-                    action='created',
-                    performed_by=instance.reviewed_by,
-                    details={
-                        'auto_generated': True,
-                        'trigger': 'application_approval'
-                    }
-                )
-            except Exception as e:
-                # If PDF generation fails, still keep the certificate record
-                print(f"Error generating PDF for certificate: {str(e)}")
-                certificate.status = 'draft'
-                certificate.save()
+            enqueue_issuance(certificate.id)
             
         except Exception as e:
             # Log the error but don't stop the approval process
-            print(f"Error generating certificate: {str(e)}")
\ No newline at end of file
+            print(f"Error generating certificate: {str(e)}")
+
+
+def _invalidate_after_commit(certificates):
+    # After commit, so a concurrent verification cannot re-cache the old state
+    certificates = list(certificates)
+    transaction.on_commit(lambda: [invalidate_verification(certificate) for certificate in certificates])
+
+
+@receiver(post_save, sender=Certificate)
+@receiver(post_delete, sender=Certificate)
+def invalidate_certificate_verification(sender, instance, **kwargs):
+    """Cached verification results follow status changes, revocation and re-rendering"""
+    _invalidate_after_commit([instance])
+
+
+@receiver(post_save, sender=DigitalSignature)
+@receiver(pre_delete, sender=DigitalSignature)
+def invalidate_signed_certificates_verification(sender, instance, **kwargs):
+    """A signature shown on verification pages was signed, revoked or removed"""
+    # pre_delete: the certificate links are gone by the time post_delete runs
+    _invalidate_after_commit(Certificate.objects.filter(signatures=instance).only('certificate_id', 'certificate_number'))
+
+
+@receiver(m2m_changed, sender=Certificate.signatures.through)
+def invalidate_certificate_signatures_verification(sender, instance, action, reverse, pk_set, **kwargs):
+    """Signatures were attached to or detached from certificates"""
+    # pre_clear: pk_set is not provided for clears, so collect the links before they go
+    if action not in ['post_add', 'post_remove', 'pre_clear']:
+        return
+    if not reverse:
+        _invalidate_after_commit([instance])
+    elif action == 'pre_clear':
+        _invalidate_after_commit(instance.certificates.only('certificate_id', 'certificate_number'))
+    elif pk_set:
+        _invalidate_after_commit(Certificate.objects.filter(pk__in=pk_set).only('certificate_id', 'certificate_number'))
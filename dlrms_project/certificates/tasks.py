@@ -0,0 +1,368 @@
+# certificates/tasks.py
+"""
+Background certificate issuance.
+
+Certificates are created in the 'queued' issuance state and rendered outside
+the request that created them. enqueue_issuance() schedules the work with
+transaction.on_commit, so approval and generation requests return as soon as
+their transaction commits. How the work is run depends on
+CERTIFICATE_ISSUANCE_BACKEND:
+
+- 'thread' (default): a daemon thread in the web process renders the PDF
+- 'celery': the render_certificate Celery task (requires CELERY_BROKER_URL)
+- 'worker': nothing is started; the process_certificate_queue command picks
+  queued certificates up
+
+Failed renders are retried with exponential backoff up to
+CERTIFICATE_ISSUANCE_MAX_ATTEMPTS. The process_certificate_queue command also
+retries certificates that are due and recovers renders abandoned by a crashed
+process, so it is safe to run periodically whatever the backend.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from notifications.broadcasts import notify_roles
+from notifications.models import Notification
+from signatures import pki
+from .images import qr_png
+from .models import Certificate, CertificateAuditLog
+from .offline import qr_data
+
+try:
+    from celery import shared_task
+except ImportError:  # Celery is optional
+    shared_task = None
+
+logger = logging.getLogger(__name__)
+
+
+def _max_attempts():
+    return getattr(settings, 'CERTIFICATE_ISSUANCE_MAX_ATTEMPTS', 3)
+
+
+def _retry_delay(attempts):
+    base = getattr(settings, 'CERTIFICATE_ISSUANCE_RETRY_SECONDS', 30)
+    return timedelta(seconds=base * (2 ** max(attempts - 1, 0)))
+
+
+def _stale_after():
+    return timedelta(seconds=getattr(settings, 'CERTIFICATE_RENDER_TIMEOUT_SECONDS', 600))
+
+
+def enqueue_issuance(certificate_id):
+    """Schedule rendering of a queued certificate once the current transaction commits"""
+    transaction.on_commit(lambda: _dispatch(certificate_id))
+
+
+def _dispatch(certificate_id):
+    backend = getattr(settings, 'CERTIFICATE_ISSUANCE_BACKEND', 'thread')
+
+    if backend == 'celery' and render_certificate is not None and getattr(settings, 'CELERY_BROKER_URL', None):
+        render_certificate.delay(certificate_id)
+    elif backend in ['thread', 'celery']:
+        # Without a usable broker, 'celery' falls back to a thread
+        threading.Thread(target=_run_in_thread, args=(certificate_id,), daemon=True).start()
+
+
+def _run_in_thread(certificate_id):
+    """Render a certificate, sleeping between retries, then release the DB connection"""
+    try:
+        while process_certificate(certificate_id) == 'queued':
+            certificate = Certificate.objects.only('next_attempt_at').get(pk=certificate_id)
+            delay = (certificate.next_attempt_at - timezone.now()).total_seconds()
+            time.sleep(max(delay, 0))
+    except Exception:
+        logger.exception('Certificate issuance thread failed for certificate %s', certificate_id)
+    finally:
+        close_old_connections()
+
+
+def _claim(certificate_id):
+    """
+    Move a due certificate into the 'rendering' state.
+
+    Returns the certificate, or None if it is not due or another worker holds
+    it. Uses SKIP LOCKED so workers never wait on each other.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        certificate = Certificate.objects.select_for_update(skip_locked=True).filter(
+            Q(issuance_status='queued', next_attempt_at__lte=now) |
+            Q(issuance_status='queued', next_attempt_at__isnull=True) |
+            Q(issuance_status='rendering', issuance_started_at__lt=now - _stale_after()),
+            pk=certificate_id
+        ).first()
+        if certificate is None:
+            return None
+
+        certificate.issuance_status = 'rendering'
+        certificate.issuance_attempts += 1
+        certificate.issuance_started_at = now
+        certificate.save(update_fields=['issuance_status', 'issuance_attempts', 'issuance_started_at', 'updated_at'])
+    return certificate
+
+
+def certificate_signatures(certificate):
+    """
+    Signed signatures of a certificate as (embedded, appended).
+
+    `embedded` is drawn in the rendered PDF, `appended` are added to it
+    afterwards (see certificates/incremental.py). Before the first render the
+    earliest signature is embedded; after it, the PDF's recorded revisions
+    decide, so signatures appended later do not change what is rendered.
+    """
+    signed = list(certificate.signatures.filter(status='signed').select_related('signer', 'image').order_by('signed_at'))
+    if not certificate.pdf_revisions:
+        return (signed[0] if signed else None), signed[1:]
+
+    order = {entry['signature']: position for position, entry in enumerate(certificate.pdf_revisions)}
+    signed.sort(key=lambda signature: order.get(signature.pk, len(order)))
+    embedded_id = certificate.pdf_revisions[0]['signature']
+    if signed and signed[0].pk == embedded_id:
+        return signed[0], signed[1:]
+    return None, signed
+
+
+def issuing_signature(certificate):
+    """The signature embedded in the certificate PDF"""
+    return certificate_signatures(certificate)[0]
+
+
+def signature_args(signature):
+    if signature and signature.image_id:
+        return {
+            'signature_data': signature.image.data_url(),
+            'signer_name': signature.signer.get_full_name(),
+            'sign_date': signature.signed_at,
+        }
+    return {}
+
+
+def render_pdf(certificate, signature=None):
+    """Render a certificate PDF, embedding `signature` if given; returns (pdf_bytes, sha256)"""
+    from .generator import CertificateGenerator
+
+    return CertificateGenerator().generate_certificate(certificate, **signature_args(signature))
+
+
+def render_issued_pdf(certificate, signature, appended):
+    """
+    Render a certificate with `signature` embedded and append the `appended` ones.
+
+    Returns (pdf_bytes, document_hash, revisions): document_hash is the hash
+    of the rendered PDF, before any signature is appended.
+    """
+    from .incremental import append_signatures
+
+    pdf_content, document_hash = render_pdf(certificate, signature)
+    pdf_content, revisions = append_signatures(pdf_content, signature, appended)
+    return pdf_content, document_hash, revisions
+
+
+def render_fingerprint(certificate, signature=None):
+    """Fingerprint of what render_pdf() would draw, without rendering"""
+    from .generator import CertificateGenerator
+
+    return CertificateGenerator().render_fingerprint(certificate, **signature_args(signature))
+
+
+def process_certificate(certificate_id):
+    """
+    Render and issue one certificate if it is due.
+
+    Returns the resulting issuance status, or None if the certificate was not
+    claimed (already issued, not due, or being rendered elsewhere).
+    """
+    from .incremental import append_missing_signatures
+
+    certificate = _claim(certificate_id)
+    if certificate is None:
+        return None
+
+    signature, appended = certificate_signatures(certificate)
+
+    try:
+        pdf_content, document_hash, revisions = render_issued_pdf(certificate, signature, appended)
+    except Exception as e:
+        logger.exception('Error rendering certificate %s', certificate.certificate_number)
+        return _record_failure(certificate, e)
+
+    # Files are written under new names before the transaction, which switches them in: if it fails they
+    # are removed again, and the files of an earlier render are only deleted once it has committed
+    old_files = [(field.storage, field.name) for field in (certificate.pdf_file, certificate.qr_code) if field]
+    new_files = []
+    try:
+        pdf_name = certificate.pdf_file.storage.save(
+            certificate.pdf_file.field.generate_filename(certificate, f'certificate_{certificate.certificate_number}.pdf'),
+            ContentFile(pdf_content)
+        )
+        new_files.append((certificate.pdf_file.storage, pdf_name))
+        certificate.document_hash = document_hash
+        # Standalone QR (for display and re-printing) whose signed token also binds the PDF hash
+        qr_name = certificate.qr_code.storage.save(
+            certificate.qr_code.field.generate_filename(certificate, f'certificate_{certificate.certificate_number}.png'),
+            ContentFile(qr_png(qr_data(certificate, include_hash=True)))
+        )
+        new_files.append((certificate.qr_code.storage, qr_name))
+    except Exception as e:
+        logger.exception('Error storing certificate %s', certificate.certificate_number)
+        _delete_files(new_files)
+        return _record_failure(certificate, e)
+
+    # A missing old file frees its name, which a new file may then have been saved under
+    old_files = [(storage, name) for storage, name in old_files if name not in (pdf_name, qr_name)]
+
+    try:
+        with transaction.atomic():
+            certificate.pdf_file.name = pdf_name
+            certificate.qr_code.name = qr_name
+            certificate.pdf_hash = revisions[-1]['sha256']
+            certificate.pdf_revisions = revisions
+            certificate.render_fingerprint = render_fingerprint(certificate, signature)
+            certificate.status = 'issued'
+            certificate.issuance_status = 'issued'
+            certificate.issuance_error = ''
+            certificate.next_attempt_at = None
+            certificate.save()
+
+            if signature:
+                # The signature covers the document hash, so it is (re)signed over the issued PDF
+                signature.document_hash = document_hash
+                pki.sign(signature)
+                signature.save(update_fields=['document_hash', 'updated_at'] + pki.SIGNED_FIELDS)
+
+            CertificateAuditLog.objects.create(
+                certificate=certificate,
+                action='issued',
+                performed_by=certificate.issued_by,
+                details={
+                    'certificate_number': certificate.certificate_number,
+                    'attempts': certificate.issuance_attempts,
+                    'pre_signed': signature is not None,
+                    'appended_signatures': len(revisions) - 1,
+                }
+            )
+            _notify_issued(certificate)
+
+            transaction.on_commit(lambda: _delete_files(old_files))
+            # Signatures added once the list above was read are not in the PDF; they are appended to it now
+            transaction.on_commit(lambda: append_missing_signatures(certificate.pk))
+    except Exception:
+        _delete_files(new_files)
+        raise
+
+    return 'issued'
+
+
+def _delete_files(files):
+    for storage, name in files:
+        try:
+            storage.delete(name)
+        except Exception:
+            logger.warning('Could not delete %s', name, exc_info=True)
+
+
+def _record_failure(certificate, error):
+    attempts = certificate.issuance_attempts
+    if attempts < _max_attempts():
+        certificate.issuance_status = 'queued'
+        certificate.next_attempt_at = timezone.now() + _retry_delay(attempts)
+    else:
+        certificate.issuance_status = 'failed'
+        certificate.next_attempt_at = None
+    certificate.issuance_error = str(error)[:2000]
+    certificate.save(update_fields=['issuance_status', 'next_attempt_at', 'issuance_error', 'updated_at'])
+
+    if certificate.issuance_status == 'failed' and certificate.issued_by:
+        Notification.objects.create(
+            recipient=certificate.issued_by,
+            title='Certificate Generation Failed',
+            message=f'Certificate {certificate.certificate_number} could not be generated after {attempts} attempts: {certificate.issuance_error}',
+            notification_type='system_alert',
+            priority='high'
+        )
+    return certificate.issuance_status
+
+
+def _notify_issued(certificate):
+    application = certificate.application
+    issued_by = certificate.issued_by
+    issued_by_name = issued_by.get_full_name() if issued_by else 'the registry'
+
+    notifications_to_create = [
+        Notification(
+            recipient=certificate.owner,
+            title='Certificate Ready!',
+            message=f'Your {certificate.get_certificate_type_display()} certificate {certificate.certificate_number} has been generated and is ready for download.',
+            notification_type='document_uploaded',
+            priority='high',
+            sender=issued_by
+        )
+    ]
+
+    # One broadcast for the other officers rather than a row each
+    notify_roles(
+        ['registry_officer', 'admin'],
+        title='Certificate Generated',
+        message=f'Certificate {certificate.certificate_number} has been generated for {certificate.owner.get_full_name()} by {issued_by_name}',
+        notification_type='system_alert',
+        sender=issued_by,
+        exclude_sender=True
+    )
+
+    if application.field_agent:
+        notifications_to_create.append(
+            Notification(
+                recipient=application.field_agent,
+                title='Certificate Issued',
+                message=f'Certificate has been issued for application {application.application_number} that you inspected',
+                notification_type='system_alert',
+                sender=issued_by
+            )
+        )
+
+    Notification.objects.bulk_create(notifications_to_create)
+
+
+def due_certificate_ids(limit=100):
+    """Ids of certificates waiting to be rendered, retried or recovered"""
+    now = timezone.now()
+    return list(
+        Certificate.objects.filter(
+            Q(issuance_status='queued', next_attempt_at__isnull=True) |
+            Q(issuance_status='queued', next_attempt_at__lte=now) |
+            Q(issuance_status='rendering', issuance_started_at__lt=now - _stale_after())
+        ).order_by('created_at').values_list('id', flat=True)[:limit]
+    )
+
+
+def requeue(certificate):
+    """Put a failed certificate back in the queue with a fresh retry budget"""
+    certificate.issuance_status = 'queued'
+    certificate.issuance_attempts = 0
+    certificate.issuance_error = ''
+    certificate.next_attempt_at = None
+    certificate.save(update_fields=['issuance_status', 'issuance_attempts', 'issuance_error', 'next_attempt_at', 'updated_at'])
+    enqueue_issuance(certificate.id)
+
+
+if shared_task is not None:
+    @shared_task(bind=True, max_retries=None)
+    def render_certificate(self, certificate_id):
+        """Celery entry point; retries itself while the certificate is waiting for another attempt"""
+        result = process_certificate(certificate_id)
+        if result == 'queued':
+            certificate = Certificate.objects.only('next_attempt_at').get(pk=certificate_id)
+            countdown = max((certificate.next_attempt_at - timezone.now()).total_seconds(), 0)
+            raise self.retry(countdown=countdown)
+        return result
+else:
+    render_certificate = None
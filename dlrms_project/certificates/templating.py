@@ -0,0 +1,85 @@
+# certificates/templating.py
+"""
+Prerendered page backgrounds for certificate PDFs.
+
+Everything on a certificate that does not depend on the certificate itself
+(watermark, borders, logo, seals, fixed header and footer text) is drawn once
+per template version into a one-page PDF and kept in process memory. Each
+certificate then only renders its variable content into a small overlay page,
+which is merged on top of a copy of the cached background. The PNG artwork is
+decoded and compressed once per template version instead of once per
+certificate, and the merge copies the already-compressed image streams as-is.
+
+Rendering is deterministic: canvases are created with ReportLab's invariant
+mode (no creation timestamp, fixed document id) and the merged file gets
+fixed metadata and no /ID, so the same inputs always give the same bytes.
+"""
+import threading
+from io import BytesIO
+
+from pypdf import PdfReader, PdfWriter
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+_backgrounds = {}
+_lock = threading.Lock()
+
+
+def get_background(name, version, draw):
+    """
+    Return the background PDF bytes for `name` at `version`.
+
+    `draw` is called with a ReportLab canvas to render the background when it
+    is not cached yet or the cached copy belongs to another version (e.g. the
+    CertificateTemplate was edited since).
+    """
+    with _lock:
+        cached = _backgrounds.get(name)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4, invariant=1)
+    draw(c)
+    c.showPage()
+    c.save()
+    pdf = buffer.getvalue()
+
+    with _lock:
+        _backgrounds[name] = (version, pdf)
+    return pdf
+
+
+def clear_backgrounds():
+    """Drop all cached backgrounds (they are rebuilt on next use)"""
+    with _lock:
+        _backgrounds.clear()
+
+
+def render_overlay(draw):
+    """Render a single transparent overlay page with `draw` and return its PDF bytes"""
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4, invariant=1)
+    draw(c)
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def merge_overlay(background_pdf, overlay_pdf, metadata=None):
+    """
+    Stamp the overlay page on top of a fresh copy of the background page.
+
+    `metadata` (e.g. {'/Title': ...}) replaces the document info; it must not
+    contain anything time-dependent, or the output stops being reproducible.
+    """
+    page = PdfReader(BytesIO(background_pdf)).pages[0]
+    page.merge_page(PdfReader(BytesIO(overlay_pdf)).pages[0])
+
+    writer = PdfWriter()
+    writer.add_page(page)
+    if metadata:
+        writer.add_metadata(metadata)
+    output = BytesIO()
+    writer.write(output)
+    return output.getvalue()
@@ -13,10 +13,20 @@ urlpatterns = [
     path('generate/<int:application_id>/', views.GenerateCertificateView.as_view(), name='generate_certificate'),
     path('<int:pk>/download/', views.DownloadCertificateView.as_view(), name='download_certificate'),
     path('<int:pk>/sign/', views.SignCertificateView.as_view(), name='sign_certificate'),
+    path('<int:pk>/issuance-status/', views.CertificateIssuanceStatusView.as_view(), name='certificate_issuance_status'),
+    path('<int:pk>/retry-issuance/', views.RetryCertificateIssuanceView.as_view(), name='retry_certificate_issuance'),
+    path('print-bundle/', views.PrintBundleView.as_view(), name='print_bundle'),
     
     # Public verification
     path('verify/', views.VerifyCertificateView.as_view(), name='verify_certificate'),
     path('verify/<uuid:certificate_id>/', views.VerifyCertificateView.as_view(), name='verify_certificate_uuid'),
+    path('verify/offline/', views.OfflineTokenVerificationView.as_view(), name='verify_offline_token'),
+    path('verify/bulk/', views.BulkVerifyCertificatesView.as_view(), name='bulk_verify_certificates'),
+    path('verify/public-key/', views.CertificatePublicKeyView.as_view(), name='verification_public_key'),
+    path('revocation/snapshot/', views.RevocationSnapshotView.as_view(), name='revocation_snapshot'),
+    path('verify/<uuid:certificate_id>/proof/', views.CertificateProofView.as_view(), name='certificate_proof'),
+    path('verify/proof/', views.VerifyProofView.as_view(), name='verify_proof'),
+    path('verify/<uuid:certificate_id>/document/', views.VerifyDocumentView.as_view(), name='verify_document'),
     
     # Document signing
     path('sign/<str:doc_type>/<int:doc_id>/', document_views.DocumentSigningView.as_view(), name='document_signing'),
@@ -0,0 +1,274 @@
+# certificates/verification.py
+"""
+Cached public certificate verification.
+
+Verification pages and API responses are built from a plain snapshot of the
+certificate, its owner, application and signatures. Snapshots are cached
+under both the certificate_id and the certificate_number, so a repeated QR
+scan is served from the cache without touching the database. Unknown ids are
+cached too (for a shorter time) so guessing does not hammer the database.
+
+Snapshots are dropped by the signal handlers in certificates.signals whenever
+the certificate is saved or deleted (status changes, revocation, re-rendering)
+or its signatures change. Changes to owner or application details are picked
+up when the snapshot expires (CERTIFICATE_VERIFICATION_CACHE_SECONDS).
+
+Snapshots are only cached when the default cache is shared by all processes
+(Redis). A per-process cache (LocMemCache) can only be invalidated in the
+process that made the change, so other workers would keep serving revoked or
+re-rendered certificates; with one, every verification is built fresh.
+"""
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils import timezone
+
+from signatures import pki
+from .models import Certificate
+
+NOT_FOUND = 'not_found'
+
+
+def _cache_timeout():
+    return getattr(settings, 'CERTIFICATE_VERIFICATION_CACHE_SECONDS', 300)
+
+
+def _not_found_timeout():
+    return getattr(settings, 'CERTIFICATE_VERIFICATION_NOT_FOUND_CACHE_SECONDS', 60)
+
+
+def _cache_enabled():
+    """Whether snapshots are cached: only in a cache every process shares and can invalidate"""
+    # `cache` is a proxy, so the backend is checked on caches['default']
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def _id_key(certificate_id):
+    return f'certificates:verify:id:{certificate_id}'
+
+
+def _number_key(certificate_number):
+    return f'certificates:verify:number:{certificate_number}'
+
+
+def build_snapshot(certificate):
+    """Everything the verification page and API show, as plain cacheable data"""
+    owner = certificate.owner
+    application = certificate.application
+
+    application_data = None
+    if application:
+        application_data = {
+            'application_number': application.application_number,
+            'property_address': getattr(application, 'property_address', ''),
+            'size_hectares': getattr(application, 'size_hectares', None),
+            'intended_use': getattr(application, 'intended_use', ''),
+            'district': getattr(application, 'district', ''),
+            'sector': getattr(application, 'sector', ''),
+            'cell': getattr(application, 'cell', ''),
+        }
+
+    signatures = []
+    certificate_signatures = list(certificate.signatures.all())
+    verified = pki.verify_many(certificate_signatures)
+    for signature in certificate_signatures:
+        signatures.append({
+            'id': signature.id,
+            'signature_id': str(signature.signature_id),
+            'signer_name': signature.signer.get_full_name(),
+            'signer_role': signature.signer.get_role_display(),
+            'signed_at': signature.signed_at,
+            'document_hash': signature.document_hash or '',
+            # True, False, or None for signatures made before cryptographic signing
+            'is_verified': verified[signature.pk],
+        })
+
+    return {
+        'pk': certificate.pk,
+        'certificate_id': str(certificate.certificate_id),
+        'certificate_number': certificate.certificate_number,
+        'certificate_type_display': certificate.get_certificate_type_display(),
+        'status': certificate.status,
+        'status_display': certificate.get_status_display(),
+        'issue_date': certificate.issue_date,
+        'expiry_date': certificate.expiry_date,
+        'pdf_url': certificate.pdf_file.url if certificate.pdf_file else '',
+        'owner': {
+            'full_name': owner.get_full_name(),
+            'email': owner.email,
+            'national_id': getattr(owner, 'national_id', ''),
+            'phone_number': getattr(owner, 'phone_number', ''),
+        },
+        'application': application_data,
+        'signatures': signatures,
+    }
+
+
+def _with_validity(snapshot):
+    """Validity depends on the current time, so it is computed per request"""
+    is_valid = snapshot['status'] == 'issued' and not (
+        snapshot['expiry_date'] and timezone.now() > snapshot['expiry_date']
+    )
+    return dict(snapshot, is_valid=is_valid)
+
+
+def _load_snapshot(lookup):
+    try:
+        certificate = Certificate.objects.select_related('owner', 'application').prefetch_related(
+            'signatures__signer'
+        ).get(**lookup)
+    except (Certificate.DoesNotExist, ValueError):
+        return None
+    return build_snapshot(certificate)
+
+
+def get_verification(certificate_id=None, certificate_number=None):
+    """
+    Return the verification snapshot for a certificate, looked up by
+    certificate_id or certificate_number, or None if it does not exist.
+    """
+    lookup = {'certificate_id': certificate_id} if certificate_id else {'certificate_number': certificate_number}
+    if not _cache_enabled():
+        snapshot = _load_snapshot(lookup)
+        return _with_validity(snapshot) if snapshot else None
+
+    key = _id_key(certificate_id) if certificate_id else _number_key(certificate_number)
+    snapshot = cache.get(key)
+    if snapshot == NOT_FOUND:
+        return None
+    if snapshot is not None:
+        return _with_validity(snapshot)
+
+    snapshot = _load_snapshot(lookup)
+    if snapshot is None:
+        cache.set(key, NOT_FOUND, _not_found_timeout())
+        return None
+
+    cache.set_many({
+        _id_key(snapshot['certificate_id']): snapshot,
+        _number_key(snapshot['certificate_number']): snapshot,
+    }, _cache_timeout())
+    return _with_validity(snapshot)
+
+
+def verification_cache_keys(certificate_id, certificate_number):
+    """Cache keys holding a certificate's snapshot, for callers invalidating in bulk"""
+    keys = [_id_key(certificate_id)]
+    if certificate_number:
+        keys.append(_number_key(certificate_number))
+    return keys
+
+
+def invalidate_verification(certificate):
+    """Drop the cached snapshots of a certificate"""
+    cache.delete_many(verification_cache_keys(certificate.certificate_id, certificate.certificate_number))
+
+
+def _rendering_key(fingerprint):
+    return f'certificates:rendering:{fingerprint}'
+
+
+def verify_rendering(certificate):
+    """
+    Re-render a certificate and check the result against its document_hash.
+
+    Rendering is deterministic, so an issued PDF can always be reproduced
+    from the database: a match proves the recorded hash belongs to the
+    certificate's current data. The rendered hash depends only on the render
+    fingerprint, so it is cached under it (for
+    CERTIFICATE_RENDER_CHECK_CACHE_SECONDS) and repeated checks do not render
+    again. Rendering is expensive: only call this for staff, never for public
+    verification requests. Returns a dict with 'reproducible' and
+    'rendered_hash'.
+    """
+    from .tasks import issuing_signature, render_fingerprint, render_pdf
+
+    signature = issuing_signature(certificate)
+    key = _rendering_key(render_fingerprint(certificate, signature))
+    rendered_hash = cache.get(key)
+    if rendered_hash is None:
+        _, rendered_hash = render_pdf(certificate, signature)
+        cache.set(key, rendered_hash, getattr(settings, 'CERTIFICATE_RENDER_CHECK_CACHE_SECONDS', 86400))
+
+    return {
+        'reproducible': bool(certificate.document_hash) and rendered_hash == certificate.document_hash,
+        'rendered_hash': rendered_hash,
+    }
+
+
+def verify_many(items):
+    """
+    Verify a batch of certificates for institutional verifiers.
+
+    `items` are dicts with a certificate_number or certificate_id and
+    optionally the document_hash of the PDF being checked. All certificates
+    are fetched with one query (signatures prefetched). Returns
+    (results in input order, ids of the certificates found).
+    """
+    from django.db.models import Q
+
+    from .merkle import is_uuid
+
+    numbers, ids = set(), set()
+    for item in items:
+        if item.get('certificate_id'):
+            if is_uuid(item['certificate_id']):
+                ids.add(str(item['certificate_id']).lower())
+        elif item.get('certificate_number'):
+            numbers.add(item['certificate_number'])
+
+    by_number, by_id = {}, {}
+    if numbers or ids:
+        certificates = Certificate.objects.filter(
+            Q(certificate_number__in=numbers) | Q(certificate_id__in=ids)
+        ).select_related('owner').prefetch_related('signatures__signer')
+        for certificate in certificates:
+            by_number[certificate.certificate_number] = certificate
+            by_id[str(certificate.certificate_id)] = certificate
+
+    verified = pki.verify_many([
+        signature for certificate in by_id.values() for signature in certificate.signatures.all()
+    ])
+
+    now = timezone.now()
+    results, found = [], set()
+    for item in items:
+        if item.get('certificate_id'):
+            certificate = by_id.get(str(item['certificate_id']).lower())
+        else:
+            certificate = by_number.get(item.get('certificate_number'))
+
+        result = {
+            'certificate_number': item.get('certificate_number'),
+            'certificate_id': item.get('certificate_id'),
+            'found': certificate is not None,
+        }
+        if certificate is not None:
+            found.add(certificate.pk)
+            expired = bool(certificate.expiry_date and now > certificate.expiry_date)
+            document_hash = (item.get('document_hash') or '').strip().lower()
+            result.update({
+                'certificate_number': certificate.certificate_number,
+                'certificate_id': str(certificate.certificate_id),
+                'certificate_type': certificate.certificate_type,
+                'status': certificate.status,
+                'is_valid': certificate.status == 'issued' and not expired,
+                'expired': expired,
+                'owner_name': certificate.owner.get_full_name(),
+                'issue_date': certificate.issue_date.isoformat() if certificate.issue_date else None,
+                'expiry_date': certificate.expiry_date.isoformat() if certificate.expiry_date else None,
+                'document_matches': document_hash in certificate.issued_hashes if document_hash else None,
+                'signatures': [
+                    {
+                        'signer_name': signature.signer.get_full_name(),
+                        'signed_at': signature.signed_at.isoformat() if signature.signed_at else None,
+                        'is_verified': verified[signature.pk],
+                        'verification_status': pki.verification_status(verified[signature.pk]),
+                    }
+                    for signature in certificate.signatures.all()
+                ],
+            })
+        results.append(result)
+
+    return results, found
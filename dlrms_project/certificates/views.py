@@ -2,20 +2,36 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import ListView, DetailView, View
-from django.http import HttpResponse, JsonResponse, Http404
+from django.http import FileResponse, HttpResponse, JsonResponse, Http404
 from django.core.files.base import ContentFile
 from django.contrib import messages
+from django.conf import settings
 from django.utils import timezone
 from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
+from django.db import transaction
 import json
 import hashlib
+from datetime import datetime
 
-from .models import Certificate, CertificateAuditLog
-from .generator import CertificateGenerator
+from .models import Certificate, CertificateAuditLog, MerkleAnchor
+from .tasks import enqueue_issuance, requeue
+from .incremental import add_signature_revision
+from .audit import log_action_async, request_audit_fields
+from .verification import get_verification, verify_many, verify_rendering
+from . import offline
+from .revocation import checker as revocation_checker, revoked_certificates
+from . import merkle
+from . import printing
 from applications.models import ParcelApplication
-from signatures.models import DigitalSignature
+from signatures.models import DigitalSignature, SignatureImage
+from signatures import pki
 from notifications.models import Notification
-from accounts.models import User
+from notifications.broadcasts import notify_roles
+from core.hashing import sha256_file
+from core.ratelimit import check_rate_limit, rate_limit
 
 
 class CertificateListView(LoginRequiredMixin, ListView):
@@ -93,125 +109,58 @@ class GenerateCertificateView(LoginRequiredMixin, View):
             # messages.error(request, 'Please provide a signature before generating the certificate.')
             return redirect('certificates:generate_certificate', application_id=application_id)
         
+        if hasattr(application, 'certificate'):
+            messages.info(request, 'Certificate already exists for this application.')
+            return redirect('certificates:certificate_detail', pk=application.certificate.pk)
+        
         try:
-            # Create certificate record
-            certificate = Certificate.objects.create(
-                application=application,
-                owner=application.applicant,
-                certificate_type=application.application_type,
-                issued_by=request.user,
-                issue_date=timezone.now()
-            )
-            
-            # Calculate expiry date
-            certificate.calculate_expiry_date()
-            
-            # Generate PDF with signature
-            generator = CertificateGenerator()
-            try:
-                # Pass signature data to generator
-                pdf_content, document_hash = generator.generate_certificate(
-                    certificate, 
-                    signature_data=signature_data,
-                    signer_name=request.user.get_full_name(),
-                    sign_date=timezone.now()
-                )
-            except Exception as pdf_error:
-                # If PDF generation fails, delete the certificate and show error
-                certificate.delete()
-                messages.error(request, f'Error generating certificate PDF: {str(pdf_error)}')
-                return redirect('applications:application_detail', pk=application_id)
-            
-            # Save PDF file
-            certificate.pdf_file.save(
-                f'certificate_{certificate.certificate_number}.pdf',
-                ContentFile(pdf_content)
-            )
-            
-            # Save document hash
-            certificate.document_hash = document_hash
-            certificate.status = 'issued'
-            certificate.save()
-            
-            # Create digital signature record
-            signature = DigitalSignature.objects.create(
-                signer=request.user,
-                document_type='application_approval',
-                document_title=f'Certificate {certificate.certificate_number}',
-                document_hash=document_hash,
-                signature_hash=hashlib.sha256(signature_data.encode()).hexdigest(),
-                signature_image=signature_data,
-                certificate_serial=certificate.certificate_number,
-                certificate_issuer='DRC Land Registry',
-                certificate_valid_from=timezone.now(),
-                certificate_valid_until=certificate.expiry_date,
-                is_verified=True,
-                verification_method='Pre-signing',
-                verification_timestamp=timezone.now(),
-                status='signed'
-            )
-            
-            # Link signature to certificate
-            certificate.signatures.add(signature)
-            
-            # Create audit log
-            CertificateAuditLog.objects.create(
-                certificate=certificate,
-                action='created',
-                performed_by=request.user,
-                ip_address=request.META.get('REMOTE_ADDR'),
-                user_agent=request.META.get('HTTP_USER_AGENT', ''),
-                details={'certificate_number': certificate.certificate_number, 'pre_signed': True}
-            )
-            
-            # Create notifications
-            notifications_to_create = []
-            
-            # 1. Notify the landowner that their certificate is ready
-            notifications_to_create.append(
-                Notification(
-                    recipient=application.applicant,
-                    title='Certificate Ready!',
-                    message=f'Your {certificate.get_certificate_type_display()} certificate {certificate.certificate_number} has been generated and is ready for download.',
-                    notification_type='document_uploaded',
-                    priority='high',
-                    sender=request.user
+            with transaction.atomic():
+                # Create certificate record; the PDF is rendered in the background
+                certificate = Certificate(
+                    application=application,
+                    owner=application.applicant,
+                    certificate_type=application.application_type,
+                    issued_by=request.user,
+                    issue_date=timezone.now(),
+                    issuance_status='queued'
                 )
-            )
-            
-            # 2. Notify other registry officers and admin
-            other_officers = User.objects.filter(
-                role__in=['registry_officer', 'admin'], 
-                is_active=True
-            ).exclude(id=request.user.id)
-            
-            for officer in other_officers:
-                notifications_to_create.append(
-                    Notification(
-                        recipient=officer,
-                        title='Certificate Generated',
-                        message=f'Certificate {certificate.certificate_number} has been generated for {application.applicant.get_full_name()} by {request.user.get_full_name()}',
-                        notification_type='system_alert',
-                        sender=request.user
-                    )
+                certificate.calculate_expiry_date()
+                certificate.save()
+                
+                # Create digital signature record; its document hash is filled in once the PDF exists
+                signature = DigitalSignature.objects.create(
+                    signer=request.user,
+                    document_type='application_approval',
+                    document_title=f'Certificate {certificate.certificate_number}',
+                    document_hash='',
+                    signature_hash=hashlib.sha256(signature_data.encode()).hexdigest(),
+                    image=SignatureImage.from_data_url(signature_data),
+                    certificate_serial=certificate.certificate_number,
+                    certificate_issuer='DRC Land Registry',
+                    certificate_valid_from=timezone.now(),
+                    certificate_valid_until=certificate.expiry_date,
+                    is_verified=True,
+                    verification_method='Pre-signing',
+                    verification_timestamp=timezone.now(),
+                    status='signed'
                 )
-            
-            # 3. If there was a field agent, notify them too
-            if application.field_agent:
-                notifications_to_create.append(
-                    Notification(
-                        recipient=application.field_agent,
-                        title='Certificate Issued',
-                        message=f'Certificate has been issued for application {application.application_number} that you inspected',
-                        notification_type='system_alert',
-                        sender=request.user
-                    )
+                
+                # Link signature to certificate
+                certificate.signatures.add(signature)
+                
+                # Create audit log
+                CertificateAuditLog.objects.create(
+                    certificate=certificate,
+                    action='created',
+                    performed_by=request.user,
+                    ip_address=request.META.get('REMOTE_ADDR'),
+                    user_agent=request.META.get('HTTP_USER_AGENT', ''),
+                    details={'certificate_number': certificate.certificate_number, 'pre_signed': True}
                 )
+                
+                enqueue_issuance(certificate.id)
             
-            # Bulk create all notifications
-            Notification.objects.bulk_create(notifications_to_create)
-            
-            messages.success(request, f'Certificate {certificate.certificate_number} has been generated successfully!')
+            messages.success(request, f'Certificate {certificate.certificate_number} is being generated. You will be notified when it is ready.')
             return redirect('applications:application_detail', pk=application_id)
             
         except Exception as e:
@@ -230,17 +179,11 @@ class CertificateDetailView(LoginRequiredMixin, DetailView):
         
         # Check permissions
         user = self.request.user
-        if user.role == 'landowner' and certificate.owner != user:
+        if user.role == 'landowner' and certificate.owner_id != user.id:
             raise Http404("Certificate not found")
         
         # Log view action
-        CertificateAuditLog.objects.create(
-            certificate=certificate,
-            action='viewed',
-            performed_by=user,
-            ip_address=self.request.META.get('REMOTE_ADDR'),
-            user_agent=self.request.META.get('HTTP_USER_AGENT', '')
-        )
+        log_action_async(certificate.pk, 'viewed', **request_audit_fields(self.request))
         
         return certificate
     
@@ -260,7 +203,7 @@ class DownloadCertificateView(LoginRequiredMixin, View):
         
         # Check permissions
         user = request.user
-        if user.role == 'landowner' and certificate.owner != user:
+        if user.role == 'landowner' and certificate.owner_id != user.id:
             raise Http404("Certificate not found")
         
         # Check if PDF exists
@@ -268,46 +211,27 @@ class DownloadCertificateView(LoginRequiredMixin, View):
             messages.error(request, 'Certificate PDF not found. Please regenerate the certificate.')
             return redirect('certificates:certificate_detail', pk=pk)
         
-        # Check if this is the first download by the owner
+        # Claim the first owner download atomically, so concurrent downloads notify only once
         first_download_by_owner = False
-        if user == certificate.owner:
-            owner_downloads = CertificateAuditLog.objects.filter(
-                certificate=certificate,
-                action='downloaded',
-                performed_by=user
-            ).count()
-            if owner_downloads == 0:
-                first_download_by_owner = True
+        if user.id == certificate.owner_id and certificate.owner_downloaded_at is None:
+            first_download_by_owner = bool(
+                Certificate.objects.filter(pk=certificate.pk, owner_downloaded_at__isnull=True).update(
+                    owner_downloaded_at=timezone.now()
+                )
+            )
         
         # Log download action
-        CertificateAuditLog.objects.create(
-            certificate=certificate,
-            action='downloaded',
-            performed_by=user,
-            ip_address=request.META.get('REMOTE_ADDR'),
-            user_agent=request.META.get('HTTP_USER_AGENT', '')
-        )
+        log_action_async(certificate.pk, 'downloaded', **request_audit_fields(request))
         
         # If first download by owner, notify registry officers
         if first_download_by_owner:
-            registry_officers = User.objects.filter(
-                role__in=['registry_officer', 'admin'], 
-                is_active=True
+            notify_roles(
+                ['registry_officer', 'admin'],
+                title='Certificate Downloaded by Owner',
+                message=f'{user.get_full_name()} has downloaded their certificate {certificate.certificate_number} for the first time',
+                notification_type='system_alert',
+                sender=user
             )
-            
-            notifications_to_create = []
-            for officer in registry_officers:
-                notifications_to_create.append(
-                    Notification(
-                        recipient=officer,
-                        title='Certificate Downloaded by Owner',
-                        message=f'{user.get_full_name()} has downloaded their certificate {certificate.certificate_number} for the first time',
-                        notification_type='system_alert',
-                        sender=user
-                    )
-                )
-            
-            Notification.objects.bulk_create(notifications_to_create)
         
         # Serve the PDF
         response = HttpResponse(certificate.pdf_file.read(), content_type='application/pdf')
@@ -316,31 +240,27 @@ class DownloadCertificateView(LoginRequiredMixin, View):
 
 
 
+@method_decorator(rate_limit('certificate_verify'), name='get')
+@method_decorator(rate_limit('certificate_lookup'), name='post')
 class VerifyCertificateView(View):
     """Public certificate verification - Enhanced to show details"""
     template_name = 'certificates/verify_certificate.html'
     
     def get(self, request, certificate_id=None):
         if certificate_id:
-            try:
-                certificate = Certificate.objects.get(certificate_id=certificate_id)
-                
+            certificate = get_verification(certificate_id=certificate_id)
+            
+            if certificate:
                 # Log verification
-                CertificateAuditLog.objects.create(
-                    certificate=certificate,
-                    action='verified',
-                    performed_by=request.user if request.user.is_authenticated else None,
-                    ip_address=request.META.get('REMOTE_ADDR'),
-                    user_agent=request.META.get('HTTP_USER_AGENT', '')
-                )
+                log_action_async(certificate['pk'], 'verified', **request_audit_fields(request))
                 
                 context = {
                     'certificate': certificate,
-                    'is_valid': certificate.is_valid,
+                    'is_valid': certificate['is_valid'],
                     'verification_success': True,
                     'certificate_id': certificate_id  # Add this to show details
                 }
-            except Certificate.DoesNotExist:
+            else:
                 context = {
                     'verification_success': False,
                     'error_message': 'Certificate not found'
@@ -357,70 +277,377 @@ class VerifyCertificateView(View):
         if not certificate_number:
             return JsonResponse({'success': False, 'error': 'Certificate number is required'})
         
-        try:
-            certificate = Certificate.objects.select_related('owner', 'application').prefetch_related('signatures__signer').get(
-                certificate_number=certificate_number
-            )
-            
-            # Log verification
-            CertificateAuditLog.objects.create(
-                certificate=certificate,
-                action='verified',
-                performed_by=request.user if request.user.is_authenticated else None,
-                ip_address=request.META.get('REMOTE_ADDR'),
-                user_agent=request.META.get('HTTP_USER_AGENT', '')
-            )
-            
-            # Get additional details from the application if available
-            application = certificate.application
-            property_details = {
-                'address': getattr(application, 'property_address', 'N/A'),
-                'size': f"{getattr(application, 'size_hectares', 0)} hectares" if hasattr(application, 'size_hectares') else 'N/A',
-                'use_type': getattr(application, 'intended_use', 'N/A'),
-                'location': {
-                    'district': getattr(application, 'district', 'N/A'),
-                    'sector': getattr(application, 'sector', 'N/A'),
-                    'cell': getattr(application, 'cell', 'N/A'),
-                }
-            }
-            
-            # Get digital signatures information
-            signatures_data = []
-            for signature in certificate.signatures.all():
-                signatures_data.append({
-                    'id': signature.id,
-                    'signature_id': getattr(signature, 'signature_id', str(signature.id)),
-                    'signer_name': signature.signer.get_full_name(),
-                    'role': signature.signer.get_role_display(),
-                    'signed_at': signature.signed_at.strftime('%B %d, %Y at %I:%M %p'),
-                    'document_hash': getattr(signature, 'document_hash', ''),
-                    'is_verified': getattr(signature, 'is_verified', True),
-                })
-            
-            return JsonResponse({
-                'success': True,
-                'redirect': True,
-                'redirect_url': request.build_absolute_uri(f'/certificates/verify/{certificate.certificate_id}/'),
-                'certificate': {
-                    'id': str(certificate.certificate_id),
-                    'number': certificate.certificate_number,
-                    'type': certificate.get_certificate_type_display(),
-                    'owner': certificate.owner.get_full_name(),
-                    'owner_email': certificate.owner.email,
-                    'issue_date': certificate.issue_date.strftime('%B %d, %Y') if certificate.issue_date else 'Not issued',
-                    'expiry_date': certificate.expiry_date.strftime('%B %d, %Y') if certificate.expiry_date else 'Lifetime',
-                    'is_valid': certificate.is_valid,
-                    'status': certificate.get_status_display(),
-                    'property_details': property_details,
-                    'signatures': signatures_data,  # Include signature information
-                    'verification_url': request.build_absolute_uri(f'/certificates/verify/{certificate.certificate_id}/'),
-                }
-            })
-        except Certificate.DoesNotExist:
+        certificate = get_verification(certificate_number=certificate_number)
+        if not certificate:
             return JsonResponse({
                 'success': False, 
                 'error': 'Certificate not found. Please check the certificate number and try again.'
             })
+        
+        # Log verification
+        log_action_async(certificate['pk'], 'verified', **request_audit_fields(request))
+        
+        application = certificate['application'] or {}
+        property_details = {
+            'address': application.get('property_address') or 'N/A',
+            'size': f"{application['size_hectares']} hectares" if application.get('size_hectares') else 'N/A',
+            'use_type': application.get('intended_use') or 'N/A',
+            'location': {
+                'district': application.get('district') or 'N/A',
+                'sector': application.get('sector') or 'N/A',
+                'cell': application.get('cell') or 'N/A',
+            }
+        }
+        
+        # Get digital signatures information
+        signatures_data = []
+        for signature in certificate['signatures']:
+            signatures_data.append({
+                'id': signature['id'],
+                'signature_id': signature['signature_id'],
+                'signer_name': signature['signer_name'],
+                'role': signature['signer_role'],
+                'signed_at': signature['signed_at'].strftime('%B %d, %Y at %I:%M %p') if signature['signed_at'] else '',
+                'document_hash': signature['document_hash'],
+                'is_verified': signature['is_verified'],
+                'verification_status': pki.verification_status(signature['is_verified']),
+            })
+        
+        verification_url = request.build_absolute_uri(f"/certificates/verify/{certificate['certificate_id']}/")
+        return JsonResponse({
+            'success': True,
+            'redirect': True,
+            'redirect_url': verification_url,
+            'certificate': {
+                'id': certificate['certificate_id'],
+                'number': certificate['certificate_number'],
+                'type': certificate['certificate_type_display'],
+                'owner': certificate['owner']['full_name'],
+                'owner_email': certificate['owner']['email'],
+                'issue_date': certificate['issue_date'].strftime('%B %d, %Y') if certificate['issue_date'] else 'Not issued',
+                'expiry_date': certificate['expiry_date'].strftime('%B %d, %Y') if certificate['expiry_date'] else 'Lifetime',
+                'is_valid': certificate['is_valid'],
+                'status': certificate['status_display'],
+                'property_details': property_details,
+                'signatures': signatures_data,  # Include signature information
+                'verification_url': verification_url,
+            }
+        })
+
+@method_decorator(rate_limit('certificate_verify'), name='get')
+class OfflineTokenVerificationView(View):
+    """
+    Check a signed QR token (see certificates/offline.py) without touching the database.
+    
+    Gives the same answer a verifier app holding our public key and the
+    revocation snapshot computes locally.
+    """
+    
+    def get(self, request):
+        token = request.GET.get('t', '').strip()
+        if not token:
+            return JsonResponse({'success': False, 'error': 'Token is required'}, status=400)
+        
+        try:
+            payload = offline.decode_token(token, offline.trusted_public_keys())
+        except offline.InvalidToken as e:
+            return JsonResponse({'success': False, 'valid': False, 'error': str(e)})
+        
+        # The revocation snapshot settles almost every token in memory; only possible hits are confirmed
+        # (and everything while no snapshot has been built yet)
+        possibly_revoked = revocation_checker.possibly_revoked(payload['certificate_id'])
+        if possibly_revoked is not False:
+            revoked = revoked_certificates().filter(certificate_id=payload['certificate_id']).exists()
+        else:
+            revoked = False
+        snapshot = revocation_checker.snapshot
+        
+        owner_name = request.GET.get('owner_name', '').strip()
+        return JsonResponse({
+            'success': True,
+            'valid': not payload['expired'] and not revoked,
+            'revoked': revoked,
+            'revocation_snapshot': snapshot.version if snapshot else None,
+            'certificate': dict(
+                payload,
+                expiry_date=payload['expiry_date'].isoformat() if payload['expiry_date'] else None,
+            ),
+            'owner_name_matches': offline.owner_name_matches(payload, owner_name) if owner_name else None,
+        })
+
+
+class CertificatePublicKeyView(View):
+    """Public keys that verify certificate QR tokens, for offline verifiers"""
+    
+    def get(self, request):
+        keys = offline.trusted_public_keys()
+        response = JsonResponse({
+            'algorithm': 'Ed25519',
+            'keys': [
+                {'key_id': offline.key_id(key).hex(), 'pem': offline.public_key_pem(key)}
+                for key in keys
+            ],
+        })
+        response['Cache-Control'] = 'public, max-age=3600'
+        return response
+
+
+def _revocation_etag(request):
+    snapshot = revocation_checker.snapshot
+    return f'{snapshot.version}-{snapshot.sha256[:16]}' if snapshot else None
+
+
+class RevocationSnapshotView(View):
+    """Download the latest revocation snapshot (Bloom filter, see certificates/revocation.py)"""
+    
+    @method_decorator(condition(etag_func=_revocation_etag))
+    def get(self, request):
+        snapshot = revocation_checker.snapshot
+        if snapshot is None:
+            raise Http404("No revocation snapshot has been built yet")
+        
+        response = FileResponse(snapshot.snapshot_file.open('rb'), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="revocation_v{snapshot.version}.bloom"'
+        response['Cache-Control'] = 'public, max-age=60'
+        response['X-Revocation-Version'] = str(snapshot.version)
+        response['X-Revocation-Entries'] = str(snapshot.entry_count)
+        response['X-Revocation-False-Positive-Rate'] = str(snapshot.false_positive_rate)
+        response['X-Revocation-Generated-At'] = snapshot.created_at.isoformat()
+        return response
+
+
+@method_decorator(rate_limit('certificate_verify'), name='get')
+class CertificateProofView(View):
+    """Merkle inclusion proof of a certificate's PDF hash (see certificates/merkle.py)"""
+    
+    def get(self, request, certificate_id):
+        certificate = get_object_or_404(
+            Certificate.objects.select_related('merkle_anchor'), certificate_id=certificate_id
+        )
+        anchor = certificate.merkle_anchor
+        if anchor is None:
+            return JsonResponse({'success': False, 'error': 'Certificate has not been anchored yet'}, status=404)
+        
+        return JsonResponse({
+            'success': True,
+            'certificate_id': str(certificate.certificate_id),
+            'document_hash': certificate.document_hash,
+            'proof': certificate.merkle_proof,
+            'root': anchor.root,
+            'anchor': {
+                'leaf_count': anchor.leaf_count,
+                'period_start': anchor.period_start.isoformat() if anchor.period_start else None,
+                'period_end': anchor.period_end.isoformat(),
+                'reference': anchor.anchor_reference,
+            },
+        })
+
+
+@method_decorator(rate_limit('certificate_verify'), name='get')
+class VerifyProofView(View):
+    """
+    Check that a PDF hash belongs to a certificate under an anchored root.
+    
+    Takes certificate_id, document_hash (SHA-256 of the PDF being checked) and
+    optionally proof (comma separated) and root; without them the stored
+    proof is used. Verification costs log2(batch size) hashes.
+    """
+    
+    def get(self, request):
+        certificate_id = request.GET.get('certificate_id', '').strip()
+        document_hash = request.GET.get('document_hash', '').strip().lower()
+        if not certificate_id or not document_hash:
+            return JsonResponse({'success': False, 'error': 'certificate_id and document_hash are required'}, status=400)
+        
+        proof = [step for step in request.GET.get('proof', '').split(',') if step]
+        root = request.GET.get('root', '').strip().lower()
+        if not proof or not root:
+            certificate = Certificate.objects.select_related('merkle_anchor').filter(
+                certificate_id=certificate_id
+            ).first() if merkle.is_uuid(certificate_id) else None
+            if certificate is None or certificate.merkle_anchor is None:
+                return JsonResponse({'success': False, 'error': 'No anchored certificate with this id'}, status=404)
+            proof, root = certificate.merkle_proof, certificate.merkle_anchor.root
+        
+        return JsonResponse({
+            'success': True,
+            'valid': merkle.verify_proof(certificate_id, document_hash, proof, root),
+            'root': root,
+            'root_anchored': MerkleAnchor.objects.filter(root=root).exists(),
+        })
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(rate_limit('certificate_document'), name='post')
+class VerifyDocumentView(View):
+    """
+    Check a holder's copy of a certificate PDF.
+    
+    POST the file as 'document' (or its SHA-256 as 'document_hash'). The
+    answer says whether it is the PDF we issued (in any of its signature
+    revisions, see certificates/incremental.py), from the recorded hashes
+    alone. Registry officers are also told whether that PDF is still
+    reproduced byte for byte by re-rendering the certificate from the
+    registry data (see verify_rendering()); public callers cannot trigger
+    renders.
+    """
+    
+    def post(self, request, certificate_id):
+        certificate = get_object_or_404(
+            Certificate.objects.select_related('owner', 'application'), certificate_id=certificate_id
+        )
+        
+        upload = request.FILES.get('document')
+        if upload:
+            document_hash, _ = sha256_file(upload)
+        else:
+            document_hash = request.POST.get('document_hash', '').strip().lower()
+        if not document_hash:
+            return JsonResponse({'success': False, 'error': 'A document or document_hash is required'}, status=400)
+        
+        if not certificate.document_hash:
+            return JsonResponse({'success': False, 'error': 'Certificate has not been issued yet'}, status=404)
+        
+        result = {
+            'success': True,
+            # Any revision: a copy downloaded before a later signature was appended is still genuine
+            'matches_issued': document_hash in certificate.issued_hashes,
+            'is_latest': document_hash == (certificate.pdf_hash or certificate.document_hash),
+            'document_hash': document_hash,
+            'issued_hash': certificate.document_hash,
+            'current_hash': certificate.pdf_hash or certificate.document_hash,
+        }
+        
+        if request.user.is_authenticated and request.user.role in ['registry_officer', 'admin']:
+            try:
+                result['reproducible'] = verify_rendering(certificate)['reproducible']
+            except Exception:
+                return JsonResponse({'success': False, 'error': 'Certificate could not be re-rendered'}, status=500)
+        
+        log_action_async(certificate.pk, 'verified', **request_audit_fields(request))
+        return JsonResponse(result)
+
+
+class BulkVerifyCertificatesView(LoginRequiredMixin, View):
+    """
+    Verify a batch of certificates in one request (banks, courts).
+    
+    POST a JSON body {"certificates": [...]} where each entry is a
+    certificate number, or an object with certificate_number or
+    certificate_id and optionally document_hash (SHA-256 of the PDF
+    presented). Returns one result per entry, in order.
+    
+    Open to registry officers, admins and accounts holding the
+    certificates.bulk_verify_certificate permission. Each entry counts
+    against the certificate_bulk_verify rate limit.
+    """
+    raise_exception = True
+    
+    def post(self, request):
+        if (request.user.role not in ['registry_officer', 'admin']
+                and not request.user.has_perm('certificates.bulk_verify_certificate')):
+            return JsonResponse({'success': False, 'error': 'Permission denied'}, status=403)
+        
+        try:
+            items = json.loads(request.body or b'{}').get('certificates')
+        except (ValueError, AttributeError):
+            return JsonResponse({'success': False, 'error': 'Invalid JSON body'}, status=400)
+        
+        if not isinstance(items, list) or not items:
+            return JsonResponse({'success': False, 'error': 'A non-empty "certificates" list is required'}, status=400)
+        max_items = getattr(settings, 'CERTIFICATE_BULK_VERIFY_MAX_ITEMS', 1000)
+        if len(items) > max_items:
+            return JsonResponse({'success': False, 'error': f'At most {max_items} certificates per request'}, status=400)
+        
+        items = [{'certificate_number': item} if isinstance(item, str) else item for item in items]
+        for position, item in enumerate(items):
+            if not isinstance(item, dict) or not all(
+                isinstance(item.get(field), (str, type(None)))
+                for field in ['certificate_number', 'certificate_id', 'document_hash']
+            ):
+                return JsonResponse({
+                    'success': False,
+                    'error': f'Invalid certificate entry at position {position}: '
+                             'certificate_number, certificate_id and document_hash must be strings'
+                }, status=400)
+        
+        limited = check_rate_limit(request, 'certificate_bulk_verify', cost=len(items))
+        if limited:
+            return limited
+        
+        results, found = verify_many(items)
+        
+        audit_fields = request_audit_fields(request)
+        CertificateAuditLog.objects.bulk_create([
+            CertificateAuditLog(certificate_id=pk, action='verified', details={'bulk': True}, **audit_fields)
+            for pk in found
+        ])
+        
+        return JsonResponse({
+            'success': True,
+            'count': len(results),
+            'found': sum(1 for result in results if result['found']),
+            'results': results,
+        })
+
+
+class PrintBundleView(LoginRequiredMixin, View):
+    """
+    Download certificates as a print-ready bundle (see certificates/printing.py).
+    
+    Filters: district, issued_from, issued_to (YYYY-MM-DD) and status. Large
+    batches are split into parts of CERTIFICATE_PRINT_BUNDLE_SIZE
+    certificates; request them one by one with ?part=N. The X-Bundle-*
+    headers give the number of parts and certificates.
+    """
+    
+    def get(self, request):
+        if request.user.role not in ['registry_officer', 'admin']:
+            return JsonResponse({'success': False, 'error': 'Permission denied'}, status=403)
+        
+        try:
+            filters = {
+                'district': request.GET.get('district', '').strip() or None,
+                'issued_from': self._parse_date(request.GET.get('issued_from')),
+                'issued_to': self._parse_date(request.GET.get('issued_to'), end_of_day=True),
+                'status': request.GET.get('status', 'issued'),
+            }
+            part = int(request.GET.get('part', 1))
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'Invalid date or part number'}, status=400)
+        
+        queryset = printing.print_queryset(**filters)
+        total = queryset.count()
+        parts = printing.part_count(total)
+        if not total:
+            return JsonResponse({'success': False, 'error': 'No certificates match the filter'}, status=404)
+        if not 1 <= part <= parts:
+            return JsonResponse({'success': False, 'error': f'Part must be between 1 and {parts}'}, status=400)
+        
+        bundle, printed, missing = printing.write_bundle(printing.bundle_part(queryset, part))
+        printing.log_print(
+            request.user, filters, printed, missing, part=part, parts=parts,
+            ip_address=request.META.get('REMOTE_ADDR'),
+            user_agent=request.META.get('HTTP_USER_AGENT', '')[:500]
+        )
+        if not printed:
+            bundle.close()
+            return JsonResponse({'success': False, 'error': 'The certificate PDFs of this part are missing'}, status=404)
+        
+        filename = f"certificates_{(filters['district'] or 'all').replace(' ', '_').lower()}_part{part:03d}.pdf"
+        response = FileResponse(bundle, as_attachment=True, filename=filename, content_type='application/pdf')
+        response['X-Bundle-Part'] = str(part)
+        response['X-Bundle-Parts'] = str(parts)
+        response['X-Bundle-Certificates'] = str(len(printed))
+        response['X-Bundle-Missing'] = ','.join(number for _, number in missing)
+        return response
+    
+    def _parse_date(self, value, end_of_day=False):
+        if not value:
+            return None
+        date = timezone.make_aware(datetime.strptime(value, '%Y-%m-%d'))
+        return date.replace(hour=23, minute=59, second=59, microsecond=999999) if end_of_day else date
+
 
 class SignCertificateView(LoginRequiredMixin, View):
     """Add digital signature to certificate"""
@@ -440,22 +667,19 @@ class SignCertificateView(LoginRequiredMixin, View):
             return JsonResponse({'success': False, 'error': 'Signature data is required'})
         
         try:
-            # Create digital signature
-            signature = DigitalSignature.objects.create(
+            # Create digital signature, signed over the certificate's document hash with the signer's key
+            signature = DigitalSignature(
                 signer=request.user,
                 document_type='application_approval',
                 document_title=f'Certificate {certificate.certificate_number}',
                 document_hash=certificate.document_hash,
                 signature_hash=hashlib.sha256(signature_data.encode()).hexdigest(),  # Store hash of signature
-                signature_image=signature_data,  # Store actual signature image in new field
+                image=SignatureImage.from_data_url(signature_data),  # Stored once per distinct image
                 related_document=None,
                 certificate_serial=certificate.certificate_number,
                 certificate_issuer='DRC Land Registry',
                 certificate_valid_from=timezone.now(),
                 certificate_valid_until=certificate.expiry_date,
-                is_verified=True,
-                verification_method='PKI',
-                verification_timestamp=timezone.now(),
                 status='signed',
                 signature_metadata={
                     'signature_type': signature_type,
@@ -463,10 +687,20 @@ class SignCertificateView(LoginRequiredMixin, View):
                     'user_agent': request.META.get('HTTP_USER_AGENT', '')
                 }
             )
+            pki.sign(signature)
+            signature.save()
             
             # Add signature to certificate
             certificate.signatures.add(signature)
             
+            # Append it to the issued PDF as an incremental update instead of re-rendering;
+            # certificates still being rendered include it when they are
+            pdf_error = None
+            try:
+                revision = add_signature_revision(certificate, signature)
+            except ValueError as e:
+                revision, pdf_error = None, str(e)
+            
             # Log the signing action
             CertificateAuditLog.objects.create(
                 certificate=certificate,
@@ -476,15 +710,68 @@ class SignCertificateView(LoginRequiredMixin, View):
                 user_agent=request.META.get('HTTP_USER_AGENT', ''),
                 details={
                     'signature_id': str(signature.signature_id),
-                    'signature_type': signature_type
+                    'signature_type': signature_type,
+                    'pdf_hash': revision['sha256'] if revision else None,
                 }
             )
             
             return JsonResponse({
                 'success': True,
                 'message': 'Certificate signed successfully',
-                'signature_id': str(signature.signature_id)
+                'signature_id': str(signature.signature_id),
+                'pdf_updated': revision is not None,
+                'pdf_error': pdf_error,
             })
             
         except Exception as e:
-            return JsonResponse({'success': False, 'error': str(e)})
\ No newline at end of file
+            return JsonResponse({'success': False, 'error': str(e)})
+
+
+class CertificateIssuanceStatusView(LoginRequiredMixin, View):
+    """Report the background issuance state of a certificate (polled by the UI)"""
+    
+    def get(self, request, pk):
+        certificate = get_object_or_404(Certificate, pk=pk)
+        
+        # Check permissions
+        user = request.user
+        if user.role == 'landowner' and certificate.owner != user:
+            raise Http404("Certificate not found")
+        
+        data = {
+            'success': True,
+            'certificate_id': certificate.id,
+            'certificate_number': certificate.certificate_number,
+            'status': certificate.status,
+            'issuance_status': certificate.issuance_status,
+            'attempts': certificate.issuance_attempts,
+            'next_attempt_at': certificate.next_attempt_at.isoformat() if certificate.next_attempt_at else None,
+        }
+        if certificate.issuance_status == 'issued':
+            data['download_url'] = reverse('certificates:download_certificate', args=[certificate.pk])
+        if certificate.issuance_error and user.role in ['registry_officer', 'admin']:
+            data['error'] = certificate.issuance_error
+        
+        return JsonResponse(data)
+
+
+class RetryCertificateIssuanceView(LoginRequiredMixin, View):
+    """Queue a failed certificate for another round of rendering attempts"""
+    
+    def post(self, request, pk):
+        if request.user.role not in ['registry_officer', 'admin']:
+            return JsonResponse({'success': False, 'message': 'Insufficient permissions'}, status=403)
+        
+        with transaction.atomic():
+            certificate = get_object_or_404(Certificate.objects.select_for_update(), pk=pk)
+            if certificate.issuance_status != 'failed':
+                return JsonResponse({
+                    'success': False,
+                    'message': f'Only failed certificates can be retried. Current state: {certificate.issuance_status or "n/a"}'
+                }, status=400)
+            requeue(certificate)
+        
+        return JsonResponse({
+            'success': True,
+            'message': f'Certificate {certificate.certificate_number} has been queued for generation'
+        })
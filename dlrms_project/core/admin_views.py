@@ -6,9 +6,13 @@ from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.db.models import Q
+from django.db import transaction
 from django.contrib.auth.hashers import make_password
 from .decorators import admin_required, officer_required
+from .models import AuditLog
+from .utils import parse_flag
 import csv
+import json
 import logging
 
 # Set up logging
@@ -336,9 +340,51 @@ def toggle_user_active(request, user_id):
 @require_POST
 def bulk_verify_users(request):
     """Bulk verify all unverified users (AJAX endpoint)"""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body) if request.body else {}
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            return JsonResponse({'success': False, 'message': 'Invalid JSON body'}, status=400)
+    else:
+        data = {'dry_run': request.POST.get('dry_run', '')}
+        if 'user_ids' in request.POST:
+            data['user_ids'] = request.POST.getlist('user_ids')
+    
+    # A subset that cannot be read must not widen to every unverified user
+    user_ids = data.get('user_ids')
+    if user_ids is not None and not isinstance(user_ids, list):
+        return JsonResponse({'success': False, 'message': '"user_ids" must be a list'}, status=400)
+    dry_run = parse_flag(data.get('dry_run', False))
+    
     try:
         unverified_users = User.objects.filter(is_verified=False)
-        count = unverified_users.count()
+        if user_ids is not None:
+            unverified_users = unverified_users.filter(id__in=user_ids)
+        
+        if dry_run:
+            count = unverified_users.count()
+            return JsonResponse({
+                'success': True,
+                'dry_run': True,
+                'message': f'{count} users would be verified.',
+                'count': count
+            })
+        
+        with transaction.atomic():
+            verified = list(unverified_users.select_for_update().values_list('id', 'username'))
+            count = User.objects.filter(id__in=[user_id for user_id, _ in verified]).update(
+                is_verified=True,
+                updated_at=timezone.now()
+            )
+            
+            if count:
+                AuditLog.log_bulk_action(
+                    request.user, 'update', 'User verified (bulk)', 'User', verified,
+                    new_values={'is_verified': True},
+                    ip_address=request.META.get('REMOTE_ADDR')
+                )
         
         if count == 0:
             return JsonResponse({
@@ -347,8 +393,6 @@ def bulk_verify_users(request):
                 'count': 0
             })
         
-        unverified_users.update(is_verified=True)
-        
         return JsonResponse({
             'success': True,
             'message': f'{count} users have been verified successfully.',
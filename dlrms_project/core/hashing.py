@@ -0,0 +1,66 @@
+# core/hashing.py
+"""
+Streaming SHA-256 of stored files.
+
+Files are read in fixed-size chunks into one reusable buffer, so memory use
+stays flat however large the file is. hashlib releases the GIL while hashing
+large buffers, which lets several files be hashed in parallel from a thread
+pool.
+"""
+import hashlib
+import os
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def sha256_path(path, chunk_size=CHUNK_SIZE):
+    """SHA-256 (hex) and size of the file at `path`"""
+    digest = hashlib.sha256()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    size = 0
+    with open(path, 'rb', buffering=0) as f:
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            digest.update(view[:read])
+            size += read
+    return digest.hexdigest(), size
+
+
+def sha256_file(file, chunk_size=CHUNK_SIZE):
+    """SHA-256 (hex) and size of an open file object (e.g. an uploaded or storage file)"""
+    digest = hashlib.sha256()
+    size = 0
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    for chunk in iter(lambda: file.read(chunk_size), b''):
+        digest.update(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def sha256_storage(storage, name, chunk_size=CHUNK_SIZE):
+    """
+    SHA-256 (hex) and size of a stored file. Local files are read directly;
+    other storages (e.g. S3) are streamed through storage.open().
+    """
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        with storage.open(name, 'rb') as f:
+            return sha256_file(f, chunk_size)
+    return sha256_path(path, chunk_size)
+
+
+def sha256_fieldfile(fieldfile, chunk_size=CHUNK_SIZE):
+    """
+    SHA-256 (hex) and size of a model FileField value: a new upload that is
+    not stored yet is hashed from the upload, a stored file from storage.
+    """
+    if not fieldfile._committed:
+        return sha256_file(fieldfile, chunk_size)
+    return sha256_storage(fieldfile.storage, fieldfile.name, chunk_size)
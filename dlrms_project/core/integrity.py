@@ -0,0 +1,198 @@
+# core/integrity.py
+"""
+Integrity scan of stored documents against their recorded SHA-256.
+
+scan_files() (run by the scan_file_integrity command, e.g. nightly) walks the
+file fields in SCANNED_FILES, hashes each file with the streaming hasher in
+core.hashing across a thread pool and compares the result with the hash
+recorded on the object. The outcome per file is kept as a
+FileIntegrityRecord:
+
+- ok: the file matches its recorded hash
+- mismatch: the file was altered or corrupted
+- missing: the object points at a file that is not in storage
+- recorded: the object has no recorded hash; the first hash seen becomes the
+  baseline later scans compare against
+
+Incremental runs skip files whose name, size and modification time are
+unchanged since they last matched, so only new or touched files are read.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.utils import timezone
+
+from .hashing import CHUNK_SIZE, sha256_storage
+from .models import FileIntegrityRecord
+
+# (model, file field, field holding the expected SHA-256 or None)
+SCANNED_FILES = [
+    ('certificates.Certificate', 'pdf_file', 'pdf_hash'),
+    ('land_management.OwnershipTransfer', 'transfer_certificate', 'transfer_certificate_hash'),
+    ('documents.Document', 'file', 'content_hash'),
+    ('applications.ParcelDocument', 'file', 'content_hash'),
+]
+
+BATCH_SIZE = 1000
+
+
+class ScanStats:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.counts = {status: 0 for status, _ in FileIntegrityRecord.STATUS_CHOICES}
+        self.skipped = 0
+        self.hashed = 0
+        self.bytes = 0
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def megabytes_per_second(self):
+        return self.bytes / (1024 * 1024) / max(self.elapsed, 1e-9)
+
+
+def _stat(storage, name):
+    """(size, mtime) of a stored file, or None if it does not exist"""
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        if not storage.exists(name):
+            return None
+        try:
+            mtime = storage.get_modified_time(name).timestamp()
+        except NotImplementedError:
+            mtime = None
+        return storage.size(name), mtime
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime
+
+
+def _check(storage, name, chunk_size):
+    """Stat and hash one file; returns (stat, sha256) with sha256 '' if missing"""
+    stat = _stat(storage, name)
+    if stat is None:
+        return None, ''
+    try:
+        sha256, _ = sha256_storage(storage, name, chunk_size)
+    except FileNotFoundError:
+        return None, ''
+    return stat, sha256
+
+
+def _unchanged(record, name, stat, expected):
+    return (
+        record is not None
+        and record.status in ('ok', 'recorded')
+        and record.file_name == name
+        and record.expected_hash == expected
+        and stat is not None
+        and stat[1] is not None
+        and (record.size, record.mtime) == stat
+    )
+
+
+def scan_files(workers=None, full=False, chunk_size=CHUNK_SIZE, batch_size=BATCH_SIZE, on_problem=None):
+    """
+    Scan every file in SCANNED_FILES and record the results.
+
+    With full=False, files unchanged since they last matched are skipped.
+    on_problem(record, actual_sha256) is called for each mismatched or missing
+    file. Returns ScanStats.
+    """
+    stats = ScanStats()
+    workers = workers or min(32, (os.cpu_count() or 1) * 2)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for model_label, file_field, hash_field in SCANNED_FILES:
+            model = apps.get_model(model_label)
+            object_type = model.__name__
+            storage = model._meta.get_field(file_field).storage
+            fields = ['id', file_field] + ([hash_field] if hash_field else [])
+
+            rows = model.objects.exclude(**{f'{file_field}__isnull': True}).exclude(**{file_field: ''})
+            rows = rows.order_by('id').values_list(*fields).iterator(chunk_size=batch_size)
+
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) == batch_size:
+                    _scan_batch(pool, storage, object_type, batch, full, chunk_size, stats, on_problem)
+                    batch = []
+            if batch:
+                _scan_batch(pool, storage, object_type, batch, full, chunk_size, stats, on_problem)
+
+    return stats
+
+
+def _scan_batch(pool, storage, object_type, rows, full, chunk_size, stats, on_problem):
+    records = {
+        record.object_id: record
+        for record in FileIntegrityRecord.objects.filter(
+            object_type=object_type, object_id__in=[row[0] for row in rows]
+        )
+    }
+
+    pending = []
+    for row in rows:
+        pk, name = row[0], row[1]
+        expected = (row[2] if len(row) > 2 else '') or ''
+        record = records.get(pk)
+        if not full and record is not None:
+            stat = _stat(storage, name)
+            if _unchanged(record, name, stat, expected):
+                stats.skipped += 1
+                continue
+        pending.append((pk, name, expected, record))
+
+    now = timezone.now()
+    results = []
+    checks = pool.map(lambda item: _check(storage, item[1], chunk_size), pending)
+    for (pk, name, expected, record), (stat, sha256) in zip(pending, checks):
+        previous = record.sha256 if record and record.file_name == name else ''
+        recorded = sha256
+        if stat is None:
+            status = 'missing'
+            recorded = previous
+        else:
+            stats.hashed += 1
+            stats.bytes += stat[0]
+            # Without a hash on the object, compare with the first hash we recorded
+            baseline = expected or previous
+            if not baseline:
+                status = 'recorded'
+            elif sha256 == baseline:
+                status = 'ok'
+            else:
+                status = 'mismatch'
+                # Keep the baseline so the file keeps failing until it is restored
+                recorded = baseline if not expected else sha256
+
+        result = FileIntegrityRecord(
+            object_type=object_type,
+            object_id=pk,
+            file_name=name,
+            size=stat[0] if stat else None,
+            mtime=stat[1] if stat else None,
+            sha256=recorded,
+            expected_hash=expected,
+            status=status,
+            checked_at=now,
+        )
+        stats.counts[status] += 1
+        if status in ('mismatch', 'missing') and on_problem:
+            on_problem(result, sha256)
+        results.append(result)
+
+    FileIntegrityRecord.objects.bulk_create(
+        results,
+        update_conflicts=True,
+        unique_fields=['object_type', 'object_id'],
+        update_fields=['file_name', 'size', 'mtime', 'sha256', 'expected_hash', 'status', 'checked_at'],
+    )
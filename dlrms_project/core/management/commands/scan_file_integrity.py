@@ -0,0 +1,76 @@
+import csv
+
+from django.core.management.base import BaseCommand
+
+from core.hashing import CHUNK_SIZE
+from core.integrity import BATCH_SIZE, scan_files
+
+
+class Command(BaseCommand):
+    help = 'Check stored certificate and transfer PDFs against their recorded SHA-256 hashes'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Hash every file, including files unchanged since the last scan',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Number of hashing threads (default: twice the number of CPUs, at most 32)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE // 1024,
+            help=f'Read size in KiB (default: {CHUNK_SIZE // 1024})',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help=f'Files looked up and recorded per batch (default: {BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--report',
+            default='file_integrity_report.csv',
+            help='CSV file listing mismatched and missing files (default: file_integrity_report.csv)',
+        )
+    
+    def handle(self, *args, **options):
+        with open(options['report'], 'w', newline='') as report:
+            writer = csv.writer(report)
+            writer.writerow(['object_type', 'object_id', 'file_name', 'status', 'expected_sha256', 'actual_sha256'])
+            
+            def on_problem(record, actual_sha256):
+                writer.writerow([
+                    record.object_type, record.object_id, record.file_name, record.status,
+                    record.expected_hash or record.sha256, actual_sha256
+                ])
+                self.stdout.write(self.style.ERROR(
+                    f'{record.status.upper()}: {record.object_type} {record.object_id} ({record.file_name})'
+                ))
+            
+            stats = scan_files(
+                workers=options['workers'],
+                full=options['full'],
+                chunk_size=max(options['chunk_size'], 4) * 1024,
+                batch_size=max(options['batch_size'], 1),
+                on_problem=on_problem,
+            )
+        
+        counts = stats.counts
+        self.stdout.write(
+            f"Hashed {stats.hashed} files ({stats.bytes / (1024 * 1024):.1f} MiB) in {stats.elapsed:.1f}s "
+            f"({stats.megabytes_per_second:.1f} MiB/s), skipped {stats.skipped} unchanged"
+        )
+        self.stdout.write(
+            f"ok: {counts['ok']}, recorded: {counts['recorded']}, "
+            f"mismatch: {counts['mismatch']}, missing: {counts['missing']}"
+        )
+        
+        if counts['mismatch'] or counts['missing']:
+            self.stdout.write(self.style.ERROR(f"Integrity problems found, see {options['report']}"))
+        else:
+            self.stdout.write(self.style.SUCCESS('All scanned files match their recorded hashes'))
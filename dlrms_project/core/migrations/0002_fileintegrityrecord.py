@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FileIntegrityRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_type', models.CharField(help_text='Model name of the object owning the file', max_length=50)),
+                ('object_id', models.PositiveIntegerField()),
+                ('file_name', models.CharField(max_length=255)),
+                ('size', models.BigIntegerField(blank=True, null=True)),
+                ('mtime', models.FloatField(blank=True, null=True)),
+                ('sha256', models.CharField(blank=True, max_length=64)),
+                ('expected_hash', models.CharField(blank=True, help_text='Hash recorded on the object, if any', max_length=64)),
+                ('status', models.CharField(choices=[('ok', 'OK'), ('mismatch', 'Hash Mismatch'), ('missing', 'Missing'), ('recorded', 'Recorded')], max_length=10)),
+                ('checked_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'File Integrity Record',
+                'verbose_name_plural': 'File Integrity Records',
+                'indexes': [models.Index(fields=['status'], name='file_integrity_status_idx')],
+                'unique_together': {('object_type', 'object_id')},
+            },
+        ),
+    ]
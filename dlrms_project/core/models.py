@@ -62,6 +62,22 @@ class AuditLog(models.Model):
             **kwargs
         )
     
+    @classmethod
+    def log_bulk_action(cls, user, action_type, description, object_type, objects, **kwargs):
+        """Create one audit entry per (object_id, object_repr) pair with batched inserts"""
+        return cls.objects.bulk_create([
+            cls(
+                user=user,
+                action_type=action_type,
+                description=description,
+                object_type=object_type,
+                object_id=object_id,
+                object_repr=str(object_repr)[:200],
+                **kwargs
+            )
+            for object_id, object_repr in objects
+        ], batch_size=1000)
+    
     class Meta:
         verbose_name = "Audit Log"
         verbose_name_plural = "Audit Logs"
@@ -111,4 +127,38 @@ class SystemSetting(models.Model):
     class Meta:
         verbose_name = "System Setting"
         verbose_name_plural = "System Settings"
-        ordering = ['key']
\ No newline at end of file
+        ordering = ['key']
+
+class FileIntegrityRecord(models.Model):
+    """Result of the last integrity scan of a stored file (see core.integrity)"""
+    
+    STATUS_CHOICES = [
+        ('ok', 'OK'),
+        ('mismatch', 'Hash Mismatch'),
+        ('missing', 'Missing'),
+        ('recorded', 'Recorded'),
+    ]
+    
+    object_type = models.CharField(max_length=50, help_text="Model name of the object owning the file")
+    object_id = models.PositiveIntegerField()
+    file_name = models.CharField(max_length=255)
+    
+    # Stat of the file when it was last hashed, used to skip unchanged files
+    size = models.BigIntegerField(blank=True, null=True)
+    mtime = models.FloatField(blank=True, null=True)
+    
+    sha256 = models.CharField(max_length=64, blank=True)
+    expected_hash = models.CharField(max_length=64, blank=True, help_text="Hash recorded on the object, if any")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    checked_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.object_type} {self.object_id}: {self.status}"
+    
+    class Meta:
+        verbose_name = "File Integrity Record"
+        verbose_name_plural = "File Integrity Records"
+        unique_together = ['object_type', 'object_id']
+        indexes = [
+            models.Index(fields=['status'], name='file_integrity_status_idx'),
+        ]
@@ -0,0 +1,185 @@
+# core/ratelimit.py
+"""
+Token-bucket rate limiting for public and lookup endpoints.
+
+Limits are configured per scope in settings.RATE_LIMITS:
+
+    RATE_LIMITS = {
+        'certificate_lookup': {'ip': '20/m', 'user': '60/m'},
+    }
+
+A rate 'N/period' (period s, m, h or d) is a bucket holding N tokens that
+refills at N per period: a client can burst N requests, then continues at
+the steady rate. Anonymous requests are counted per client IP, signed-in
+users per account (so an office behind one NAT address is not throttled as
+a whole); 'user' falls back to the 'ip' rate. Requests over the limit get a
+429 response with a Retry-After header.
+
+Behind reverse proxies, set RATE_LIMIT_TRUSTED_PROXIES to how many there
+are. Each proxy appends the address it received the request from to
+X-Forwarded-For, so the client is the entry that many places from the
+right; anything further left was sent by the client and is ignored.
+
+Buckets live in the default cache so all worker processes and nodes share
+them. With Redis the bucket is updated by one Lua script (atomic, using the
+Redis clock); other cache backends use a read-modify-write that may let a
+few extra requests through under heavy concurrency. If the cache is down,
+requests are let through rather than failing verification.
+"""
+import logging
+import math
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# KEYS[1] bucket; ARGV[1] capacity, ARGV[2] refill rate (tokens/second), ARGV[3] tokens to take
+# Returns {allowed (0/1), seconds to wait until enough tokens are available}
+TOKEN_BUCKET_SCRIPT = """
+if redis.replicate_commands then redis.replicate_commands() end
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed, wait = 0, 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return {allowed, tostring(wait)}
+"""
+
+_lock = threading.Lock()
+_scripts = {}
+
+
+def parse_rate(rate):
+    """'20/m' -> (20, 60): capacity and the period (seconds) it refills over"""
+    count, _, period = rate.partition('/')
+    return int(count), PERIODS[period.strip().lower()[:1]]
+
+
+def client_ip(request):
+    """The client address, counted RATE_LIMIT_TRUSTED_PROXIES hops back through X-Forwarded-For"""
+    proxies = getattr(settings, 'RATE_LIMIT_TRUSTED_PROXIES', 0)
+    if proxies > 0:
+        forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+        forwarded = [entry.strip() for entry in forwarded.split(',') if entry.strip()]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _bucket(request, scope):
+    """(cache key, rate) of the bucket a request draws from, or None if the scope is not limited"""
+    limits = getattr(settings, 'RATE_LIMITS', {}).get(scope)
+    if not limits:
+        return None
+
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated and limits.get('user', limits.get('ip')):
+        return f'ratelimit:{scope}:user:{user.pk}', limits.get('user', limits.get('ip'))
+    if limits.get('ip'):
+        return f'ratelimit:{scope}:ip:{client_ip(request)}', limits['ip']
+    return None
+
+
+def _take_redis(key, capacity, refill, cost):
+    key = cache.make_and_validate_key(key)
+    # RedisCache does not expose scripting; use the client it would use for this key
+    client = cache._cache.get_client(key, write=True)
+    script = _scripts.get(id(client))
+    if script is None:
+        script = _scripts[id(client)] = client.register_script(TOKEN_BUCKET_SCRIPT)
+    allowed, wait = script(keys=[key], args=[capacity, refill, cost])
+    return bool(int(allowed)), float(wait)
+
+
+def _take_cache(key, capacity, refill, cost):
+    with _lock:
+        now = time.time()
+        tokens, ts = cache.get(key) or (capacity, now)
+        tokens = min(capacity, tokens + max(0, now - ts) * refill)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        cache.set(key, (tokens, now), math.ceil(capacity / refill) + 1)
+    return allowed, 0 if allowed else (cost - tokens) / refill
+
+
+def take(key, rate, cost=1):
+    """Take `cost` tokens from the bucket at `key`; returns (allowed, seconds until there are enough)"""
+    capacity, period = parse_rate(rate)
+    refill = capacity / period
+    try:
+        from django.core.cache import caches
+        from django.core.cache.backends.redis import RedisCache
+
+        # `cache` is a proxy, so the backend is checked on caches['default']
+        if isinstance(caches['default'], RedisCache):
+            return _take_redis(key, capacity, refill, cost)
+        return _take_cache(key, capacity, refill, cost)
+    except Exception:
+        logger.warning('Rate limit check failed for %s, letting the request through', key, exc_info=True)
+        return True, 0
+
+
+def check_rate_limit(request, scope, cost=1):
+    """
+    Charge a request `cost` tokens of the RATE_LIMITS entry for `scope`.
+
+    Returns None if it may proceed, or the 429 response to send. For
+    endpoints doing work per item (e.g. bulk verification) charge the number
+    of items, so a batch costs what the same lookups made one by one would.
+    """
+    bucket = _bucket(request, scope)
+    if not bucket:
+        return None
+
+    key, rate = bucket
+    capacity, _ = parse_rate(rate)
+    if cost > capacity:
+        return JsonResponse({
+            'success': False,
+            'error': f'Too many items in one request (at most {capacity}).'
+        }, status=400)
+
+    allowed, wait = take(key, rate, cost)
+    if allowed:
+        return None
+    response = JsonResponse({
+        'success': False,
+        'error': 'Too many requests. Please wait a moment and try again.'
+    }, status=429)
+    response['Retry-After'] = str(max(math.ceil(wait), 1))
+    return response
+
+
+def rate_limit(scope):
+    """
+    View decorator applying the RATE_LIMITS entry for `scope`.
+
+    Use @method_decorator(rate_limit(scope), name='post') on class-based views.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            return check_rate_limit(request, scope) or view_func(request, *args, **kwargs)
+        return _wrapped_view
+    return decorator
@@ -0,0 +1,9 @@
+# core/utils.py
+"""Small helpers shared by views across apps"""
+
+
+def parse_flag(value):
+    """A boolean request option: true or 'true'/'1'/'on'/'yes' enable it, anything else does not"""
+    if isinstance(value, str):
+        return value.strip().lower() in ('true', '1', 'on', 'yes')
+    return value is True
@@ -7,6 +7,7 @@ from django.utils import timezone
 from datetime import timedelta
 from applications.models import ParcelApplication, ParcelTitle
 from disputes.models import Dispute as DisputeModel
+from notifications.broadcasts import unread_count as unread_notifications_count
 from .mixins import SurveyorRequiredMixin
 
 User = get_user_model()
@@ -30,7 +31,7 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         user = self.request.user
 
         context['user'] = user
-        context['unread_notifications_count'] = user.notifications.filter(is_read=False).count()
+        context['unread_notifications_count'] = unread_notifications_count(user)
 
         # ADD Dispute Officer-specific context
         if user.role == 'dispute_officer':
@@ -283,7 +284,7 @@ class SurveyorDashboardView(SurveyorRequiredMixin, TemplateView):
         
         context.update({
             'user': user,
-            'unread_notifications_count': user.notifications.filter(is_read=False).count(),
+            'unread_notifications_count': unread_notifications_count(user),
             'assigned_applications': assigned_applications[:5],
             'pending_inspections_count': assigned_applications.count(),
             'assigned_disputes': assigned_disputes[:3],
@@ -48,6 +48,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.gis',  # Enable GIS support
+    'django.contrib.postgres',  # Trigram search for duplicate detection
     
     # Third party apps
     'leaflet',  # Enable Leaflet for maps
@@ -210,11 +211,48 @@ SESSION_COOKIE_AGE = 3600  # 1 hour
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 
 # Cache Configuration
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+# Redis when REDIS_URL is set (shared by all web processes), otherwise a per-process memory cache
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'dlrms',
+        }
     }
-}
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'dlrms',
+        }
+    }
+
+# Public certificate verification results are cached (see certificates/verification.py); only with a
+# shared cache (REDIS_URL), since the per-process memory cache cannot be invalidated across workers
+CERTIFICATE_VERIFICATION_CACHE_SECONDS = 300
+
+# Hashes of re-rendered certificates, cached by render fingerprint for the officers' reproducibility check
+# of an uploaded PDF (see verify_rendering() in certificates/verification.py)
+CERTIFICATE_RENDER_CHECK_CACHE_SECONDS = 86400
+
+# Issue an unsigned certificate as soon as an application is approved, skipping the officer's
+# pre-sign step in GenerateCertificateView (see certificates/signals.py)
+CERTIFICATE_AUTO_ISSUE_ON_APPROVAL = config('CERTIFICATE_AUTO_ISSUE_ON_APPROVAL', default=False, cast=bool)
+
+# Where queued certificates are rendered (see certificates/tasks.py): 'thread' in the web process,
+# 'celery' on a worker (falls back to a thread without CELERY_BROKER_URL), or 'worker' to leave them
+# to the process_certificate_queue command. Failed renders are retried with backoff up to MAX_ATTEMPTS,
+# and a render still claimed after RENDER_TIMEOUT_SECONDS is taken over by the next run.
+CERTIFICATE_ISSUANCE_BACKEND = config('CERTIFICATE_ISSUANCE_BACKEND', default='thread')
+CERTIFICATE_ISSUANCE_MAX_ATTEMPTS = 3
+CERTIFICATE_ISSUANCE_RETRY_SECONDS = 30
+CERTIFICATE_RENDER_TIMEOUT_SECONDS = 600
+
+# Certificate audit entries are written in batches (see certificates/audit.py)
+CERTIFICATE_AUDIT_BUFFER_SIZE = 100
+CERTIFICATE_AUDIT_FLUSH_SECONDS = 2
 
 CSRF_TRUSTED_ORIGINS = [
     'https://yourdomain.com',
@@ -222,4 +260,43 @@ CSRF_TRUSTED_ORIGINS = [
     # Add other trusted origins if needed
 ]
 
-CERTIFICATE_VERIFICATION_BASE_URL = 'http://192.168.1.68:8000/certificates'
\ No newline at end of file
+CERTIFICATE_VERIFICATION_BASE_URL = 'http://192.168.1.68:8000/certificates'
+
+# Ed25519 key (PEM) signing the offline-verifiable certificate QR tokens (see certificates/offline.py).
+# Public keys of retired signing keys go in CERTIFICATE_QR_TRUSTED_PUBLIC_KEYS so old QR codes still verify.
+# Required when DEBUG is off; development setups derive a key from SECRET_KEY.
+CERTIFICATE_QR_SIGNING_KEY = config('CERTIFICATE_QR_SIGNING_KEY', default='')
+CERTIFICATE_QR_TRUSTED_PUBLIC_KEYS = []
+
+# Revocation snapshots (see certificates/revocation.py), rebuilt periodically by build_revocation_snapshot
+CERTIFICATE_REVOCATION_FALSE_POSITIVE_RATE = 0.001
+CERTIFICATE_REVOCATION_SNAPSHOTS_KEPT = 5
+CERTIFICATE_REVOCATION_REFRESH_SECONDS = 60
+
+# Renewal reminder horizons (days before expiry) used by the expire_certificates command
+CERTIFICATE_EXPIRY_REMINDER_DAYS = [90, 30, 7]
+
+# Largest batch accepted by the bulk verification API (certificates/verify/bulk/)
+CERTIFICATE_BULK_VERIFY_MAX_ITEMS = 1000
+
+# Certificates per print bundle file (see certificates/printing.py)
+CERTIFICATE_PRINT_BUNDLE_SIZE = 50
+
+# Token-bucket rate limits per endpoint scope (see core/ratelimit.py): 'N/s|m|h|d' per client IP,
+# and per account for signed-in users. Buckets are kept in the default cache (Redis in production).
+RATE_LIMITS = {
+    'certificate_verify': {'ip': '60/m', 'user': '120/m'},
+    'certificate_lookup': {'ip': '10/m', 'user': '30/m'},
+    'certificate_document': {'ip': '10/m'},
+    # Charged per certificate in the batch; must hold at least CERTIFICATE_BULK_VERIFY_MAX_ITEMS
+    'certificate_bulk_verify': {'user': '2000/h'},
+    'receiver_lookup': {'user': '20/m'},
+}
+# Number of reverse proxies in front of the application that append to X-Forwarded-For; the client IP is
+# taken that many entries from the right. 0 (no proxy) uses REMOTE_ADDR, as any header could be forged.
+RATE_LIMIT_TRUSTED_PROXIES = config('RATE_LIMIT_TRUSTED_PROXIES', default=0, cast=int)
+
+# Password encrypting signers' private keys (see signatures/pki.py). Required when DEBUG is off; development
+# setups derive one from SECRET_KEY (move existing keys over with the reencrypt_signer_keys command).
+SIGNER_KEY_ENCRYPTION_KEY = config('SIGNER_KEY_ENCRYPTION_KEY', default='')
+SIGNATURE_VERIFICATION_CACHE_SECONDS = 86400
@@ -2,6 +2,8 @@ import os
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from core.hashing import sha256_fieldfile
+
 User = get_user_model()
 
 def get_upload_path(instance, filename):
@@ -28,6 +30,7 @@ class Document(models.Model):
     document_type = models.CharField(max_length=30, choices=DOCUMENT_TYPE_CHOICES)
     file = models.FileField(upload_to=get_upload_path)
     file_size = models.PositiveIntegerField(help_text="File size in bytes")
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True, help_text="SHA-256 of the file")
     
     # Relationships
     uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='uploaded_documents')
@@ -49,6 +52,19 @@ class Document(models.Model):
     def __str__(self):
         return f"{self.title} - {self.document_type}"
     
+    def save(self, *args, **kwargs):
+        # Hash a new upload once, in chunks, as it is stored
+        if self.file and not self.file._committed:
+            self.content_hash, _ = sha256_fieldfile(self.file)
+        super().save(*args, **kwargs)
+    
+    def get_content_hash(self):
+        """SHA-256 of the file, computed and recorded on first use for files stored without one"""
+        if not self.content_hash and self.file:
+            self.content_hash, _ = sha256_fieldfile(self.file)
+            type(self).objects.filter(pk=self.pk).update(content_hash=self.content_hash)
+        return self.content_hash
+    
     @property
     def file_extension(self):
         return os.path.splitext(self.file.name)[1].lower()
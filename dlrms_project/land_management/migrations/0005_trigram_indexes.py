@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:12
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('land_management', '0004_remove_ownershiptransfer_approval_date_and_more'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='landparcel',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['location'], name='landparcel_location_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='landparcel',
+            index=models.Index(fields=['latitude', 'longitude'], name='landparcel_lat_lng_idx'),
+        ),
+    ]
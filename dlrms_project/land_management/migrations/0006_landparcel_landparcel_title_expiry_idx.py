@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('land_management', '0005_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='landparcel',
+            index=models.Index(fields=['active_title_expiry'], name='landparcel_title_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('land_management', '0006_landparcel_landparcel_title_expiry_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ownershiptransfer',
+            name='transfer_certificate_hash',
+            field=models.CharField(blank=True, help_text='SHA-256 of the generated transfer certificate', max_length=64),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.contrib.gis.db import models
+from django.contrib.postgres.indexes import GinIndex
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -92,6 +93,11 @@ class LandParcel(models.Model):
         verbose_name = "Land Parcel"
         verbose_name_plural = "Land Parcels"
         ordering = ['-created_at']
+        indexes = [
+            GinIndex(fields=['location'], name='landparcel_location_trgm', opclasses=['gin_trgm_ops']),
+            models.Index(fields=['latitude', 'longitude'], name='landparcel_lat_lng_idx'),
+            models.Index(fields=['active_title_expiry'], name='landparcel_title_expiry_idx'),
+        ]
 
 class OwnershipTransfer(models.Model):
     """Model for tracking land ownership transfers"""
@@ -136,6 +142,7 @@ class OwnershipTransfer(models.Model):
     current_owner_id_document = models.FileField(upload_to='transfers/owner_ids/', blank=True, null=True)
     new_owner_id_document = models.FileField(upload_to='transfers/buyer_ids/', blank=True, null=True)
     transfer_certificate = models.FileField(upload_to='transfers/certificates/', blank=True, null=True)
+    transfer_certificate_hash = models.CharField(max_length=64, blank=True, help_text="SHA-256 of the generated transfer certificate")
     
     # Receiver Details (stored when entered)
     receiver_national_id = models.CharField(max_length=50)
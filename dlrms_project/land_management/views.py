@@ -11,7 +11,9 @@ from .models import LandParcel, OwnershipTransfer, ParcelBoundary
 # Import models from other apps
 from applications.models import ParcelApplication, ParcelTitle
 from core.mixins import RoleRequiredMixin
+from core.ratelimit import rate_limit
 from notifications.models import Notification
+from notifications.broadcasts import notify_roles
 # Land Tranfer
 from django.contrib.auth import get_user_model
 from django.db import transaction
@@ -24,6 +26,7 @@ from disputes.models import Dispute
 from django.contrib.auth.decorators import login_required
 from io import BytesIO
 from django.core.files.base import ContentFile
+import hashlib
 
 
 User = get_user_model()
@@ -494,6 +497,7 @@ class InitiateTransferView(LoginRequiredMixin, CreateView):
 
 
 @login_required
+@rate_limit('receiver_lookup')
 def check_receiver_details(request):
     """AJAX view to check receiver details by national ID"""
     national_id = request.GET.get('national_id')
@@ -549,15 +553,14 @@ class TransferConfirmationView(LoginRequiredMixin, UpdateView):
             response = super().form_valid(form)
             
             # Notify notaries
-            notaries = User.objects.filter(role='notary')
-            for notary in notaries:
-                Notification.objects.create(
-                    recipient=notary,
-                    title='New Transfer for Review',
-                    message=f'Transfer {self.object.transfer_number} is ready for review.',
-                    notification_type='approval_required',
-                    related_transfer=self.object
-                )
+            notify_roles(
+                ['notary'],
+                title='New Transfer for Review',
+                message=f'Transfer {self.object.transfer_number} is ready for review.',
+                notification_type='approval_required',
+                related_transfer=self.object,
+                send_email=True
+            )
             
             # Notify current owner
             Notification.objects.create(
@@ -690,7 +693,8 @@ class TransferReviewView(RoleRequiredMixin, LoginRequiredMixin, UpdateView):
                 notary=self.request.user
             )
             
-            # Save PDF to transfer model
+            # Save PDF to transfer model, recording its hash for integrity scans
+            transfer.transfer_certificate_hash = hashlib.sha256(pdf_content).hexdigest()
             transfer.transfer_certificate.save(
                 f'transfer_certificate_{transfer.transfer_number}.pdf',
                 ContentFile(pdf_content)
@@ -0,0 +1,124 @@
+# notifications/broadcasts.py
+"""
+Broadcast notifications: one row per message instead of one per recipient.
+
+Messages for every officer (or every notary, ...) used to be written as one
+Notification per recipient, so the table grew with events x officers.
+notify_roles() writes a single BroadcastNotification per role instead. A
+user sees the broadcasts for their role and groups that were sent after they
+joined; reading one records a BroadcastReceipt, so read state costs a row
+only for broadcasts that have actually been read.
+
+merged_notifications() lists direct and broadcast notifications together,
+newest first, as one UNION query that the database can sort and paginate;
+hydrate() then loads the full objects for just the page being shown.
+"""
+from django.db import transaction
+from django.db.models import Q, Value
+
+from .models import BroadcastNotification, BroadcastReceipt, Notification
+
+
+def notify_roles(roles, title, message, notification_type, send_email=False, **kwargs):
+    """
+    Notify every user with one of `roles`. Extra keyword arguments are
+    BroadcastNotification fields (priority, sender, exclude_sender,
+    related_*). With send_email, recipients are also emailed, as direct
+    notifications are.
+    """
+    broadcasts = BroadcastNotification.objects.bulk_create([
+        BroadcastNotification(role=role, title=title, message=message, notification_type=notification_type, **kwargs)
+        for role in roles
+    ])
+    if send_email:
+        from .utils import send_broadcast_emails
+
+        transaction.on_commit(lambda: send_broadcast_emails(broadcasts))
+    return broadcasts
+
+
+def recipients(broadcast):
+    """Users a broadcast is addressed to"""
+    from accounts.models import User
+
+    users = User.objects.filter(is_active=True, date_joined__lte=broadcast.created_at)
+    users = users.filter(role=broadcast.role) if broadcast.role else users.filter(groups=broadcast.group_id)
+    if broadcast.exclude_sender and broadcast.sender_id:
+        users = users.exclude(pk=broadcast.sender_id)
+    return users
+
+
+def broadcasts_for(user):
+    """Broadcast notifications addressed to `user`"""
+    audience = Q(group__in=user.groups.values('pk'))
+    if user.role:
+        audience |= Q(role=user.role)
+    return BroadcastNotification.objects.filter(audience, created_at__gte=user.date_joined).exclude(
+        exclude_sender=True, sender=user
+    )
+
+
+def unread_broadcasts(user):
+    return broadcasts_for(user).exclude(receipts__user=user)
+
+
+def unread_count(user):
+    """Unread direct and broadcast notifications of `user`"""
+    return Notification.objects.filter(recipient=user, is_read=False).count() + unread_broadcasts(user).count()
+
+
+def merged_notifications(user):
+    """
+    (id, created_at, kind) of all notifications of `user`, newest first,
+    where kind is 'direct' or 'broadcast'. Paginate it, then hydrate() the page.
+    """
+    direct = Notification.objects.filter(recipient=user).order_by().annotate(
+        kind=Value('direct')
+    ).values('id', 'created_at', 'kind')
+    broadcast = broadcasts_for(user).order_by().annotate(
+        kind=Value('broadcast')
+    ).values('id', 'created_at', 'kind')
+    return direct.union(broadcast, all=True).order_by('-created_at', '-id')
+
+
+def hydrate(user, rows):
+    """Load the notifications for rows of merged_notifications(), in order"""
+    related = ['related_transfer', 'related_application', 'related_parcel', 'related_dispute']
+    direct_ids = [row['id'] for row in rows if row['kind'] == 'direct']
+    broadcast_ids = [row['id'] for row in rows if row['kind'] == 'broadcast']
+
+    direct = Notification.objects.select_related(*related).in_bulk(direct_ids) if direct_ids else {}
+    broadcasts = BroadcastNotification.objects.select_related(*related).in_bulk(broadcast_ids) if broadcast_ids else {}
+    read = dict(
+        BroadcastReceipt.objects.filter(user=user, broadcast_id__in=broadcast_ids).values_list('broadcast_id', 'read_at')
+    ) if broadcast_ids else {}
+
+    notifications = []
+    for row in rows:
+        if row['kind'] == 'direct':
+            notification = direct.get(row['id'])
+        else:
+            notification = broadcasts.get(row['id'])
+            if notification is not None:
+                # Same attributes as a Notification, for templates
+                notification.is_broadcast = True
+                notification.recipient = user
+                notification.read_at = read.get(notification.pk)
+                notification.is_read = notification.read_at is not None
+        if notification is not None:
+            notifications.append(notification)
+    return notifications
+
+
+def mark_read(user, broadcast):
+    BroadcastReceipt.objects.get_or_create(user=user, broadcast=broadcast)
+
+
+def mark_all_read(user):
+    """Record receipts for all unread broadcasts of `user`; returns how many"""
+    receipts = [
+        BroadcastReceipt(user=user, broadcast_id=broadcast_id)
+        for broadcast_id in unread_broadcasts(user).values_list('pk', flat=True).iterator()
+    ]
+    BroadcastReceipt.objects.bulk_create(receipts, batch_size=1000, ignore_conflicts=True)
+    return len(receipts)
@@ -67,4 +67,57 @@ class Notification(models.Model):
     class Meta:
         verbose_name = "Notification"
         verbose_name_plural = "Notifications"
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+
+class BroadcastNotification(models.Model):
+    """
+    One notification addressed to everyone with a role (or in a group),
+    instead of one Notification row per recipient. Read state is kept per
+    user in BroadcastReceipt, created when the user reads it. See
+    notifications/broadcasts.py.
+    """
+    
+    # Audience: users with this role, or members of this group
+    role = models.CharField(max_length=20, blank=True)
+    group = models.ForeignKey('auth.Group', on_delete=models.CASCADE, null=True, blank=True, related_name='broadcast_notifications')
+    exclude_sender = models.BooleanField(default=False, help_text="Not shown to the sender even if they are in the audience")
+    
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    notification_type = models.CharField(max_length=20, choices=Notification.NOTIFICATION_TYPE_CHOICES)
+    priority = models.CharField(max_length=10, choices=Notification.PRIORITY_CHOICES, default='normal')
+    
+    # Related Objects (optional)
+    related_application = models.ForeignKey('applications.TitleApplication', on_delete=models.SET_NULL, blank=True, null=True, related_name='broadcast_notifications')
+    related_parcel = models.ForeignKey('land_management.LandParcel', on_delete=models.SET_NULL, blank=True, null=True, related_name='broadcast_notifications')
+    related_dispute = models.ForeignKey('disputes.Dispute', on_delete=models.SET_NULL, blank=True, null=True, related_name='broadcast_notifications')
+    related_transfer = models.ForeignKey('land_management.OwnershipTransfer', on_delete=models.SET_NULL, blank=True, null=True, related_name='broadcast_notifications')
+    
+    sender = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='sent_broadcast_notifications')
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Broadcast to {self.role or self.group}: {self.title}"
+    
+    class Meta:
+        verbose_name = "Broadcast Notification"
+        verbose_name_plural = "Broadcast Notifications"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['role', 'created_at'], name='broadcast_role_created_idx'),
+            models.Index(fields=['group', 'created_at'], name='broadcast_group_created_idx'),
+        ]
+
+
+class BroadcastReceipt(models.Model):
+    """A user has read a broadcast notification"""
+    
+    broadcast = models.ForeignKey(BroadcastNotification, on_delete=models.CASCADE, related_name='receipts')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='broadcast_receipts')
+    read_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'broadcast'], name='broadcast_receipt_unique'),
+        ]
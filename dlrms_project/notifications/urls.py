@@ -7,5 +7,6 @@ app_name = 'notifications'
 urlpatterns = [
     path('', views.NotificationListView.as_view(), name='notification_list'),
     path('<int:pk>/mark-read/', views.mark_notification_read, name='mark_read'),
+    path('broadcast/<int:pk>/mark-read/', views.mark_broadcast_read, name='mark_broadcast_read'),
     path('mark-all-read/', views.mark_all_notifications_read, name='mark_all_read'),
 ]
\ No newline at end of file
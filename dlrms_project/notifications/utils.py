@@ -1,9 +1,51 @@
-from django.core.mail import send_mail
+from django.core.mail import EmailMultiAlternatives, get_connection, send_mail
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
 from django.utils import timezone
 
+EMAIL_TEMPLATES = {
+    'application_status': 'notifications/emails/application_status.html',
+    'transfer_status': 'notifications/emails/transfer_status.html',
+    'document_uploaded': 'notifications/emails/document_uploaded.html',
+    'approval_required': 'notifications/emails/approval_required.html',
+    'deadline_reminder': 'notifications/emails/deadline_reminder.html',
+    'system_alert': 'notifications/emails/system_alert.html',
+}
+
+
+def _email_parts(notification):
+    """
+    Template and subject (with priority indicator) of the email for a direct
+    or broadcast notification
+    """
+    template_name = EMAIL_TEMPLATES.get(
+        notification.notification_type,
+        'notifications/emails/default_notification.html'
+    )
+    
+    priority_prefix = ''
+    if notification.priority == 'urgent':
+        priority_prefix = '[URGENT] '
+    elif notification.priority == 'high':
+        priority_prefix = '[IMPORTANT] '
+    
+    return template_name, f"{priority_prefix}{notification.title}"
+
+
+def _render_email(template_name, recipient, notification):
+    """HTML and plain text bodies of a notification email to `recipient`"""
+    context = {
+        'recipient_name': recipient.get_full_name(),
+        'notification': notification,
+        'site_name': 'DLRMS',
+        'site_url': getattr(settings, 'SITE_URL', 'http://127.0.0.1:8000'),
+        'current_year': timezone.now().year,
+    }
+    html_message = render_to_string(template_name, context)
+    return html_message, strip_tags(html_message)
+
+
 def send_notification_email(notification):
     """
     Send email for a notification
@@ -13,42 +55,8 @@ def send_notification_email(notification):
         if not notification.recipient.email:
             return False
         
-        # Prepare email context
-        context = {
-            'recipient_name': notification.recipient.get_full_name(),
-            'notification': notification,
-            'site_name': 'DLRMS',
-            'site_url': getattr(settings, 'SITE_URL', 'http://127.0.0.1:8000'),
-            'current_year': timezone.now().year,
-        }
-        
-        # Determine template based on notification type
-        template_map = {
-            'application_status': 'notifications/emails/application_status.html',
-            'transfer_status': 'notifications/emails/transfer_status.html',
-            'document_uploaded': 'notifications/emails/document_uploaded.html',
-            'approval_required': 'notifications/emails/approval_required.html',
-            'deadline_reminder': 'notifications/emails/deadline_reminder.html',
-            'system_alert': 'notifications/emails/system_alert.html',
-        }
-        
-        template_name = template_map.get(
-            notification.notification_type, 
-            'notifications/emails/default_notification.html'
-        )
-        
-        # Render email content
-        html_message = render_to_string(template_name, context)
-        plain_message = strip_tags(html_message)
-        
-        # Prepare subject with priority indicator
-        priority_prefix = ''
-        if notification.priority == 'urgent':
-            priority_prefix = '[URGENT] '
-        elif notification.priority == 'high':
-            priority_prefix = '[IMPORTANT] '
-        
-        subject = f"{priority_prefix}{notification.title}"
+        template_name, subject = _email_parts(notification)
+        html_message, plain_message = _render_email(template_name, notification.recipient, notification)
         
         # Send email
         send_mail(
@@ -70,3 +78,36 @@ def send_notification_email(notification):
     except Exception as e:
         print(f"Error sending email for notification {notification.id}: {str(e)}")
         return False
+
+
+def send_broadcast_emails(broadcasts):
+    """
+    Email broadcast notifications to each of their recipients, as
+    send_notification_email() does for a direct notification. All messages
+    go over one mail server connection. Returns the number sent.
+    """
+    from .broadcasts import recipients
+
+    sent = 0
+    try:
+        with get_connection() as connection:
+            for broadcast in broadcasts:
+                template_name, subject = _email_parts(broadcast)
+                for recipient in recipients(broadcast).exclude(email=''):
+                    try:
+                        html_message, plain_message = _render_email(template_name, recipient, broadcast)
+                        email = EmailMultiAlternatives(
+                            subject=subject,
+                            body=plain_message,
+                            from_email=settings.DEFAULT_FROM_EMAIL,
+                            to=[recipient.email],
+                            connection=connection,
+                        )
+                        email.attach_alternative(html_message, 'text/html')
+                        email.send()
+                        sent += 1
+                    except Exception as e:
+                        print(f"Error sending email for broadcast {broadcast.id} to {recipient.email}: {str(e)}")
+    except Exception as e:
+        print(f"Error sending broadcast emails: {str(e)}")
+    return sent
@@ -7,6 +7,7 @@ from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
 from .models import Notification
+from . import broadcasts
 
 class NotificationListView(LoginRequiredMixin, ListView):
     model = Notification
@@ -15,21 +16,16 @@ class NotificationListView(LoginRequiredMixin, ListView):
     paginate_by = 20
     
     def get_queryset(self):
-        return Notification.objects.filter(
-            recipient=self.request.user
-        ).select_related(
-            'related_transfer',
-            'related_application',
-            'related_parcel',
-            'related_dispute'
-        ).order_by('-created_at')
+        # Direct and broadcast notifications, paginated together in the database
+        return broadcasts.merged_notifications(self.request.user)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['unread_count'] = Notification.objects.filter(
-            recipient=self.request.user,
-            is_read=False
-        ).count()
+        # Load full objects for the current page only
+        context['notifications'] = context['object_list'] = broadcasts.hydrate(
+            self.request.user, list(context['object_list'])
+        )
+        context['unread_count'] = broadcasts.unread_count(self.request.user)
         return context
 
 @login_required
@@ -43,6 +39,13 @@ def mark_notification_read(request, pk):
     notification.mark_as_read()
     return JsonResponse({'success': True})
 
+@login_required
+@require_POST
+def mark_broadcast_read(request, pk):
+    broadcast = get_object_or_404(broadcasts.broadcasts_for(request.user), pk=pk)
+    broadcasts.mark_read(request.user, broadcast)
+    return JsonResponse({'success': True})
+
 @login_required
 @require_POST
 def mark_all_notifications_read(request):
@@ -53,4 +56,5 @@ def mark_all_notifications_read(request):
         is_read=True,
         read_at=timezone.now()
     )
+    broadcasts.mark_all_read(request.user)
     return JsonResponse({'success': True})
\ No newline at end of file
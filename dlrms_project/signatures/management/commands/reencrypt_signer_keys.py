@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from signatures import pki
+
+
+class Command(BaseCommand):
+    help = 'Re-encrypt signer private keys under the current SIGNER_KEY_ENCRYPTION_KEY'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--old-password',
+            help='Password the keys are encrypted with now (default: the one derived from SECRET_KEY)',
+        )
+    
+    def handle(self, *args, **options):
+        old_password = options['old_password'].encode() if options['old_password'] else pki.derived_password()
+        changed, current, unreadable = pki.reencrypt_keys(old_password)
+        
+        self.stdout.write(f'{changed} keys re-encrypted, {current} already current')
+        if unreadable:
+            raise CommandError(f'{unreadable} keys could not be decrypted with the old password')
+        self.stdout.write(self.style.SUCCESS('All signer keys use SIGNER_KEY_ENCRYPTION_KEY'))
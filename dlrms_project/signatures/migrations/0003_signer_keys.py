@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('signatures', '0002_alter_digitalsignature_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='digitalsignature',
+            name='signature_value',
+            field=models.TextField(blank=True, help_text='Base64 Ed25519 signature'),
+        ),
+        migrations.CreateModel(
+            name='SignerKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key_id', models.CharField(help_text='First bytes of the SHA-256 of the public key (hex)', max_length=16, unique=True)),
+                ('public_key', models.TextField(help_text='PEM encoded public key')),
+                ('encrypted_private_key', models.TextField(help_text='PEM encoded private key, encrypted')),
+                ('is_active', models.BooleanField(default=True, help_text="New signatures use the user's active key")),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('retired_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='signer_keys', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Signer Key',
+                'verbose_name_plural': 'Signer Keys',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='digitalsignature',
+            name='signer_key',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='signatures', to='signatures.signerkey'),
+        ),
+        migrations.AddConstraint(
+            model_name='signerkey',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('user',), name='signerkey_one_active_per_user'),
+        ),
+    ]
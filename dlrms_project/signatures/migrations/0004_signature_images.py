@@ -0,0 +1,88 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:46
+
+import base64
+import binascii
+import hashlib
+
+from django.core.files.base import ContentFile
+from django.db import migrations, models
+import django.db.models.deletion
+
+EXTENSIONS = {'image/png': 'png', 'image/jpeg': 'jpg', 'image/gif': 'gif', 'image/webp': 'webp'}
+
+
+def move_signature_images(apps, schema_editor):
+    # Each distinct image is written once; signatures sharing it point at the same file
+    DigitalSignature = apps.get_model('signatures', 'DigitalSignature')
+    SignatureImage = apps.get_model('signatures', 'SignatureImage')
+
+    images = {}
+    pending = []
+    rows = DigitalSignature.objects.exclude(signature_image__isnull=True).exclude(signature_image='')
+    for pk, data_url in rows.values_list('id', 'signature_image').iterator(chunk_size=500):
+        if not data_url.startswith('data:image'):
+            continue
+        try:
+            header, data = data_url.split(',', 1)
+            content = base64.b64decode(data)
+        except (ValueError, binascii.Error):
+            continue
+        content_type = header[len('data:'):].split(';')[0]
+
+        sha256 = hashlib.sha256(content).hexdigest()
+        if sha256 not in images:
+            image = SignatureImage.objects.filter(sha256=sha256).first()
+            if image is None:
+                image = SignatureImage(sha256=sha256, content_type=content_type, size=len(content))
+                image.image.save(f'{sha256}.{EXTENSIONS.get(content_type, "bin")}', ContentFile(content), save=False)
+                image.save()
+            images[sha256] = image.pk
+
+        pending.append(DigitalSignature(id=pk, image_id=images[sha256]))
+        if len(pending) >= 500:
+            DigitalSignature.objects.bulk_update(pending, ['image'])
+            pending = []
+    if pending:
+        DigitalSignature.objects.bulk_update(pending, ['image'])
+
+
+def restore_signature_images(apps, schema_editor):
+    DigitalSignature = apps.get_model('signatures', 'DigitalSignature')
+    SignatureImage = apps.get_model('signatures', 'SignatureImage')
+
+    for image in SignatureImage.objects.all().iterator():
+        with image.image.open('rb') as f:
+            data_url = f'data:{image.content_type};base64,{base64.b64encode(f.read()).decode("ascii")}'
+        DigitalSignature.objects.filter(image_id=image.pk).update(signature_image=data_url)
+        image.image.delete(save=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('signatures', '0003_signer_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SignatureImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('image', models.FileField(upload_to='signatures/images/')),
+                ('content_type', models.CharField(default='image/png', max_length=50)),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Signature Image',
+                'verbose_name_plural': 'Signature Images',
+            },
+        ),
+        migrations.AddField(
+            model_name='digitalsignature',
+            name='image',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='signatures', to='signatures.signatureimage'),
+        ),
+        migrations.RunPython(move_signature_images, restore_signature_images),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:46
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('signatures', '0004_signature_images'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='digitalsignature',
+            name='signature_image',
+        ),
+    ]
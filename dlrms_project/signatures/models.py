@@ -1,5 +1,10 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Q
 from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+import base64
+import binascii
+import hashlib
 import uuid
 
 User = get_user_model()
@@ -46,13 +51,17 @@ class DigitalSignature(models.Model):
     certificate_valid_from = models.DateTimeField(blank=True, null=True)
     certificate_valid_until = models.DateTimeField(blank=True, null=True)
     
+    # Ed25519 signature over the document hash (see signatures/pki.py)
+    signer_key = models.ForeignKey('SignerKey', on_delete=models.PROTECT, blank=True, null=True, related_name='signatures')
+    signature_value = models.TextField(blank=True, help_text="Base64 Ed25519 signature")
+    
     # Verification
     is_verified = models.BooleanField(default=False)
     verification_method = models.CharField(max_length=100, blank=True, null=True)
     verification_timestamp = models.DateTimeField(blank=True, null=True)
     
     # Additional metadata for signature
-    signature_image = models.TextField(blank=True, null=True, help_text="Base64 encoded signature image")
+    image = models.ForeignKey('SignatureImage', on_delete=models.PROTECT, blank=True, null=True, related_name='signatures')
     signature_metadata = models.JSONField(default=dict, blank=True, help_text="Additional signature metadata")
     
     # Timestamps
@@ -65,4 +74,81 @@ class DigitalSignature(models.Model):
     class Meta:
         verbose_name = "Digital Signature"
         verbose_name_plural = "Digital Signatures"
-        ordering = ['-signed_at']
\ No newline at end of file
+        ordering = ['-signed_at']
+
+
+class SignatureImage(models.Model):
+    """A drawn signature image, stored once per distinct image and shared by signatures"""
+    
+    EXTENSIONS = {'image/png': 'png', 'image/jpeg': 'jpg', 'image/gif': 'gif', 'image/webp': 'webp'}
+    
+    sha256 = models.CharField(max_length=64, unique=True)
+    image = models.FileField(upload_to='signatures/images/')
+    content_type = models.CharField(max_length=50, default='image/png')
+    size = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Signature image {self.sha256[:12]}"
+    
+    @classmethod
+    def from_data_url(cls, data_url):
+        """
+        The SignatureImage holding a base64 data URL (data:image/png;base64,...),
+        stored on first use. Returns None if the value is not an image data URL.
+        """
+        if not data_url or not data_url.startswith('data:image'):
+            return None
+        try:
+            header, data = data_url.split(',', 1)
+            content = base64.b64decode(data)
+        except (ValueError, binascii.Error):
+            return None
+        content_type = header[len('data:'):].split(';')[0]
+        
+        sha256 = hashlib.sha256(content).hexdigest()
+        existing = cls.objects.filter(sha256=sha256).first()
+        if existing:
+            return existing
+        
+        image = cls(sha256=sha256, content_type=content_type, size=len(content))
+        image.image.save(f'{sha256}.{cls.EXTENSIONS.get(content_type, "bin")}', ContentFile(content), save=False)
+        try:
+            with transaction.atomic():
+                image.save()
+        except IntegrityError:
+            # Stored concurrently by another request
+            image.image.delete(save=False)
+            return cls.objects.get(sha256=sha256)
+        return image
+    
+    def data_url(self):
+        with self.image.open('rb') as f:
+            return f'data:{self.content_type};base64,{base64.b64encode(f.read()).decode("ascii")}'
+    
+    class Meta:
+        verbose_name = "Signature Image"
+        verbose_name_plural = "Signature Images"
+
+
+class SignerKey(models.Model):
+    """Ed25519 key pair a user signs documents with (see signatures/pki.py)"""
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='signer_keys')
+    key_id = models.CharField(max_length=16, unique=True, help_text="First bytes of the SHA-256 of the public key (hex)")
+    public_key = models.TextField(help_text="PEM encoded public key")
+    encrypted_private_key = models.TextField(help_text="PEM encoded private key, encrypted")
+    is_active = models.BooleanField(default=True, help_text="New signatures use the user's active key")
+    created_at = models.DateTimeField(auto_now_add=True)
+    retired_at = models.DateTimeField(blank=True, null=True)
+    
+    def __str__(self):
+        return f"Signing key {self.key_id} of {self.user.username}"
+    
+    class Meta:
+        verbose_name = "Signer Key"
+        verbose_name_plural = "Signer Keys"
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['user'], condition=Q(is_active=True), name='signerkey_one_active_per_user'),
+        ]
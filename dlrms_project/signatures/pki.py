@@ -0,0 +1,245 @@
+# signatures/pki.py
+"""
+Ed25519 signing and verification of DigitalSignature records.
+
+Every signer gets a key pair (SignerKey) the first time they sign. The
+private key is stored PEM encoded and encrypted with SIGNER_KEY_ENCRYPTION_KEY,
+so keys are held by the registry on the signer's behalf and used only when
+they sign, or when a document they signed is re-rendered and its hash
+changes. SIGNER_KEY_ENCRYPTION_KEY is required when DEBUG is off; development
+setups fall back to a password derived from SECRET_KEY. Keys encrypted with
+that fallback are moved to the configured password with the
+reencrypt_signer_keys command.
+
+A signature covers the signature id and the document hash:
+
+    message = b'dlrms-signature:v1:' + signature_id + b':' + document_hash
+
+and is stored base64 encoded in DigitalSignature.signature_value. Anyone can
+check it with the public key in SignerKey.public_key.
+
+verify_many() checks any number of signatures in one call: the outcome for a
+(signature_id, document_hash) pair never changes, so it is cached and repeat
+checks (e.g. every view of a certificate with several signers) cost one cache
+round trip. Signatures made before this scheme have no signature_value and
+verify as None ('legacy' in verification_status()): nobody attested to a hash
+for them, so they stay unsigned rather than being signed after the fact.
+"""
+import base64
+import binascii
+import hashlib
+import threading
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import SignerKey
+
+ALGORITHM = 'Ed25519'
+VERIFICATION_METHOD = 'PKI (Ed25519)'
+# Fields sign() changes, for save(update_fields=...) and bulk_update()
+SIGNED_FIELDS = ['signer_key', 'signature_value', 'is_verified', 'verification_method', 'verification_timestamp']
+
+_public_keys = {}
+_lock = threading.Lock()
+
+
+def derived_password():
+    """The development fallback password, derived from SECRET_KEY"""
+    return hashlib.sha256(f'signer-key-encryption:{settings.SECRET_KEY}'.encode()).hexdigest().encode()
+
+
+def _encryption_password():
+    password = getattr(settings, 'SIGNER_KEY_ENCRYPTION_KEY', '')
+    if password:
+        return password.encode()
+    if settings.DEBUG:
+        return derived_password()
+    # A SECRET_KEY-derived password would expose every key to anyone who can read SECRET_KEY
+    # (or its public default) and the database, and would lose them all when SECRET_KEY is rotated
+    raise ImproperlyConfigured('SIGNER_KEY_ENCRYPTION_KEY must be set when DEBUG is off')
+
+
+def _cache_key(signature_id, document_hash):
+    return f'signatures:verify:{signature_id}:{document_hash}'
+
+
+def _cache_timeout():
+    return getattr(settings, 'SIGNATURE_VERIFICATION_CACHE_SECONDS', 86400)
+
+
+def signing_message(signature_id, document_hash):
+    return f'dlrms-signature:v1:{signature_id}:{document_hash}'.encode()
+
+
+def create_signer_key(user):
+    """Generate a key pair for `user` and make it their active key"""
+    private_key = Ed25519PrivateKey.generate()
+    public_key = private_key.public_key()
+    raw = public_key.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+
+    with transaction.atomic():
+        SignerKey.objects.filter(user=user, is_active=True).update(is_active=False, retired_at=timezone.now())
+        return SignerKey.objects.create(
+            user=user,
+            key_id=hashlib.sha256(raw).hexdigest()[:16],
+            public_key=public_key.public_bytes(
+                serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+            ).decode('ascii'),
+            encrypted_private_key=private_key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.BestAvailableEncryption(_encryption_password())
+            ).decode('ascii'),
+        )
+
+
+def signer_key_for(user):
+    """The user's active key, created on first use"""
+    key = SignerKey.objects.filter(user=user, is_active=True).first()
+    if key is not None:
+        return key
+    try:
+        return create_signer_key(user)
+    except IntegrityError:
+        # Created concurrently by another request
+        return SignerKey.objects.get(user=user, is_active=True)
+
+
+def _private_key(signer_key, password=None):
+    return serialization.load_pem_private_key(
+        signer_key.encrypted_private_key.encode(), password=password or _encryption_password()
+    )
+
+
+def reencrypt_keys(old_password):
+    """
+    Re-encrypt the signer keys readable with `old_password` under the current
+    SIGNER_KEY_ENCRYPTION_KEY. Returns (re-encrypted, already current,
+    unreadable) counts.
+    """
+    password = _encryption_password()
+    changed, current, unreadable = [], 0, 0
+    for signer_key in SignerKey.objects.only('encrypted_private_key').iterator():
+        try:
+            _private_key(signer_key, password)
+        except (ValueError, TypeError):
+            pass
+        else:
+            current += 1
+            continue
+        try:
+            private_key = _private_key(signer_key, old_password)
+        except (ValueError, TypeError):
+            unreadable += 1
+            continue
+        signer_key.encrypted_private_key = private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.BestAvailableEncryption(password)
+        ).decode('ascii')
+        changed.append(signer_key)
+    SignerKey.objects.bulk_update(changed, ['encrypted_private_key'], batch_size=500)
+    return len(changed), current, unreadable
+
+
+def _public_key(signer_key):
+    with _lock:
+        key = _public_keys.get(signer_key.pk)
+    if key is None:
+        key = serialization.load_pem_public_key(signer_key.public_key.encode())
+        with _lock:
+            _public_keys[signer_key.pk] = key
+    return key
+
+
+def sign(signature, signer_key=None, private_key=None):
+    """
+    Sign `signature.document_hash` with the signer's key. Sets SIGNED_FIELDS
+    on the instance without saving it.
+    """
+    signer_key = signer_key or signer_key_for(signature.signer)
+    private_key = private_key or _private_key(signer_key)
+    value = private_key.sign(signing_message(signature.signature_id, signature.document_hash))
+
+    signature.signer_key = signer_key
+    signature.signature_value = base64.b64encode(value).decode('ascii')
+    signature.is_verified = True
+    signature.verification_method = VERIFICATION_METHOD
+    signature.verification_timestamp = timezone.now()
+    return signature
+
+
+def sign_many(signatures):
+    """Sign several signatures, loading each signer's key once"""
+    keys = {}
+    for signature in signatures:
+        if signature.signer_id not in keys:
+            signer_key = signer_key_for(signature.signer)
+            keys[signature.signer_id] = (signer_key, _private_key(signer_key))
+        sign(signature, *keys[signature.signer_id])
+    return signatures
+
+
+def _check(signature, signer_key):
+    try:
+        _public_key(signer_key).verify(
+            base64.b64decode(signature.signature_value),
+            signing_message(signature.signature_id, signature.document_hash)
+        )
+    except (InvalidSignature, binascii.Error, ValueError):
+        return False
+    return True
+
+
+def verify_many(signatures):
+    """
+    Verify signatures in one pass.
+
+    Returns {signature.pk: result} where result is True (valid and signed),
+    False (altered, wrong key, or status not 'signed') or None (no
+    cryptographic signature). Public keys of uncached signatures are loaded
+    with one query.
+    """
+    results = {}
+    pending = {}
+    for signature in signatures:
+        if not signature.signature_value or not signature.signer_key_id:
+            results[signature.pk] = None
+        else:
+            pending[_cache_key(signature.signature_id, signature.document_hash)] = signature
+
+    cached = cache.get_many(list(pending)) if pending else {}
+    unchecked = [signature for key, signature in pending.items() if key not in cached]
+    if unchecked:
+        keys = SignerKey.objects.only('public_key').in_bulk({signature.signer_key_id for signature in unchecked})
+        checked = {}
+        for signature in unchecked:
+            signer_key = keys.get(signature.signer_key_id)
+            checked[_cache_key(signature.signature_id, signature.document_hash)] = (
+                signer_key is not None and _check(signature, signer_key)
+            )
+        cache.set_many(checked, _cache_timeout())
+        cached.update(checked)
+
+    for key, signature in pending.items():
+        # Revoking a signature does not change its bytes, so status is applied outside the cache
+        results[signature.pk] = cached[key] and signature.status == 'signed'
+    return results
+
+
+def verify_signature(signature):
+    return verify_many([signature])[signature.pk]
+
+
+def verification_status(result):
+    """Name a verify_many() result for display: 'verified', 'invalid' or 'legacy'"""
+    if result is None:
+        return 'legacy'
+    return 'verified' if result else 'invalid'